@@ -0,0 +1,95 @@
+"""
+Стоимость сборки Comment из строк БД: время и память на комментарий.
+"до" - обычный dataclass с валидацией в __post_init__ (как было),
+"после" - Comment со __slots__ и доверенным Comment.from_record.
+
+    python -m benchmarks.comment_hydration [--rows 100000]
+"""
+import argparse
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from src.domain.entities.comment import Comment
+
+
+@dataclass
+class LegacyComment:
+    id: str
+    entity_type: str
+    entity_id: str
+    author_id: str
+    text: str
+    created_at: datetime
+    updated_at: datetime
+
+    def __post_init__(self):
+        if not self.text.strip():
+            raise ValueError("Comment text cannot be empty")
+
+
+def legacy_from_row(row) -> LegacyComment:
+    return LegacyComment(
+        id=row['id'],
+        entity_type=row['entity_type'],
+        entity_id=row['entity_id'],
+        author_id=row['author_id'],
+        text=row['text'],
+        created_at=row['created_at'],
+        updated_at=row['updated_at'],
+    )
+
+
+def make_rows(count: int):
+    now = datetime.now()
+    ids = [uuid4() for _ in range(count)]
+    return [
+        {
+            "id": ids[i],
+            "entity_type": "post",
+            "entity_id": "42",
+            "author_id": f"user-{i}",
+            "text": "Комментарий средней длины, как в живых тредах. " * 3,
+            "created_at": now - timedelta(seconds=i),
+            "updated_at": now - timedelta(seconds=i),
+            "version": 1,
+            "parent_id": None,
+            "path": ids[i].hex,
+        }
+        for i in range(count)
+    ]
+
+
+def measure(build, rows):
+    start = time.perf_counter()
+    build(rows)
+    elapsed = time.perf_counter() - start
+
+    # Память считается отдельно: tracemalloc сам замедляет выделения
+    tracemalloc.start()
+    objects = build(rows)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return elapsed, size
+
+
+def main(count: int):
+    rows = make_rows(count)
+    results = {
+        "before (dataclass + validation)": measure(lambda rs: [legacy_from_row(r) for r in rs], rows),
+        "after (slots + from_record)": measure(lambda rs: [Comment.from_record(r) for r in rs], rows),
+    }
+
+    print(f"rows: {count}")
+    for name, (elapsed, size) in results.items():
+        print(f"{name:<34} {elapsed / count * 1e9:8.0f} ns/row {size / count:8.0f} bytes/row")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+    main(args.rows)
@@ -0,0 +1,77 @@
+"""
+Сравнение сериализации списка комментариев:
+стандартный путь FastAPI (response_model -> валидация -> jsonable_encoder -> JSONResponse)
+против быстрого пути src.presentation.api.responses.
+
+    python -m benchmarks.comment_serialization [--size 100] [--rounds 2000]
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+from typing import List
+from uuid import uuid4
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from src.domain.entities.comment import Comment
+from src.presentation.api.responses import comments_response
+from src.presentation.schemas.comment_schemas import CommentOutSchema
+
+
+def make_comments(size: int) -> List[Comment]:
+    now = datetime.now()
+    return [
+        Comment(
+            id=uuid4(),
+            entity_type="post",
+            entity_id="42",
+            author_id=f"user-{i}",
+            text="Комментарий средней длины, как в живых тредах. " * 3,
+            created_at=now - timedelta(seconds=i),
+            updated_at=now - timedelta(seconds=i),
+        )
+        for i in range(size)
+    ]
+
+
+async def fastapi_path(field, comments: List[Comment]) -> bytes:
+    content = await serialize_response(field=field, response_content=comments, is_coroutine=True)
+    return JSONResponse(content).body
+
+
+def fast_path(comments: List[Comment]) -> bytes:
+    return comments_response(comments).body
+
+
+async def main(size: int, rounds: int):
+    comments = make_comments(size)
+    field = create_response_field(name="response", type_=List[CommentOutSchema])
+
+    assert json.loads(await fastapi_path(field, comments)) == json.loads(fast_path(comments))
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await fastapi_path(field, comments)
+    baseline = (time.perf_counter() - start) / rounds
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fast_path(comments)
+    fast = (time.perf_counter() - start) / rounds
+
+    print(f"comments per response: {size}, rounds: {rounds}")
+    print(f"FastAPI response_model: {baseline * 1e6:9.1f} us/response")
+    print(f"fast path:              {fast * 1e6:9.1f} us/response")
+    print(f"speedup:                {baseline / fast:9.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.size, args.rounds))
@@ -0,0 +1,35 @@
+import argparse
+import asyncio
+
+from src.application.use_cases.user_use_cases import ImportUsersUseCase
+from src.infrastructure.config import settings
+from src.infrastructure.database.connection import db_connection
+from src.infrastructure.repositories.postgres_user_repository import PostgresUserRepository
+from src.presentation.csv_stream import iter_csv_rows, iter_file_chunks
+
+
+async def main(path: str):
+    await db_connection.connect()
+    use_case = ImportUsersUseCase(
+        PostgresUserRepository(db_connection),
+        max_reported_issues=settings.user_import_max_reported_issues,
+    )
+    try:
+        with open(path, "rb") as file:
+            result = await use_case.execute(iter_csv_rows(iter_file_chunks(file), header=("email", "name")))
+    finally:
+        await db_connection.disconnect()
+
+    for issue in result.issues:
+        print(f"line {issue.line}: {issue.email} - {issue.reason}")
+    print(
+        f"\n✅ Imported {result.created} of {result.total} | "
+        f"conflicts: {result.conflicts} | invalid: {result.invalid}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import users from a CSV file (email,name)")
+    parser.add_argument("path")
+    args = parser.parse_args()
+    asyncio.run(main(args.path))
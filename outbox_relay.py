@@ -0,0 +1,33 @@
+import asyncio
+import logging
+
+from src.infrastructure.config import settings
+from src.infrastructure.database.connection import db_connection
+from src.infrastructure.messaging.kafka_producer import create_event_producer
+from src.infrastructure.messaging.outbox_relay import OutboxRelay
+from src.infrastructure.repositories.postgres_outbox_repository import PostgresOutboxRepository
+
+
+async def main():
+    await db_connection.connect()
+    producer = create_event_producer()
+    relay = OutboxRelay(
+        PostgresOutboxRepository(db_connection),
+        producer,
+        batch_size=settings.outbox_batch_size,
+        poll_interval=settings.outbox_poll_interval_seconds,
+    )
+    print("Relaying outbox -> Kafka")
+    try:
+        await relay.run()
+    finally:
+        producer.close()
+        await db_connection.disconnect()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("Stopped")
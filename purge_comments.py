@@ -0,0 +1,31 @@
+import asyncio
+import logging
+
+from src.infrastructure.config import settings
+from src.infrastructure.database.connection import db_connection
+from src.infrastructure.repositories.comment_purger import CommentPurger
+from src.infrastructure.repositories.postgres_comment_repository import PostgresCommentRepository
+
+
+async def main():
+    await db_connection.connect()
+    purger = CommentPurger(
+        PostgresCommentRepository(db_connection),
+        retention_seconds=settings.comment_purge_retention_seconds,
+        batch_size=settings.comment_purge_batch_size,
+        batch_pause=settings.comment_purge_batch_pause_seconds,
+        poll_interval=settings.comment_purge_interval_seconds,
+    )
+    print("Purging deleted comments")
+    try:
+        await purger.run()
+    finally:
+        await db_connection.disconnect()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("Stopped")
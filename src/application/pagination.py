@@ -0,0 +1,57 @@
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+from uuid import UUID
+
+from src.application.timestamps import to_naive_utc
+from src.domain.exceptions import InvalidCursor
+
+
+def encode_comment_cursor(created_at: datetime, comment_id) -> str:
+    """
+    Упаковать позицию (created_at, id) последнего комментария страницы в непрозрачный курсор
+    """
+    raw = json.dumps([created_at.isoformat(), str(comment_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_comment_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    Распаковать курсор, выданный encode_comment_cursor
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, comment_id = json.loads(base64.urlsafe_b64decode(padded))
+        return _decode_position(created_at, comment_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def encode_search_cursor(rank: float, created_at: datetime, comment_id) -> str:
+    """
+    Позиция (rank, created_at, id) последнего результата страницы поиска
+    """
+    raw = json.dumps([rank, created_at.isoformat(), str(comment_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_search_cursor(cursor: str) -> Tuple[float, datetime, str]:
+    """
+    Распаковать курсор, выданный encode_search_cursor
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        rank, created_at, comment_id = json.loads(base64.urlsafe_b64decode(padded))
+        if isinstance(rank, bool) or not isinstance(rank, (int, float)):
+            raise TypeError("Cursor rank must be a number")
+        return (float(rank), *_decode_position(created_at, comment_id))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def _decode_position(created_at, comment_id) -> Tuple[datetime, str]:
+    # json.loads отдаёт любые типы: числа вместо строк - такой же битый курсор
+    if not isinstance(created_at, str) or not isinstance(comment_id, str):
+        raise TypeError("Cursor position must be a pair of strings")
+    return to_naive_utc(datetime.fromisoformat(created_at)), str(UUID(comment_id))
@@ -0,0 +1,12 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    Колонки created_at/updated_at - timestamp без зоны и хранят UTC.
+    Время со смещением приводится к UTC и теряет tzinfo, наивное остаётся как есть
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
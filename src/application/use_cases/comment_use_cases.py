@@ -1,63 +1,159 @@
+import hashlib
 import logging
+from dataclasses import dataclass
 from datetime import datetime
-from uuid import uuid4
-from typing import List
+from uuid import UUID
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from src.domain.entities.comment import Comment
-from src.domain.exceptions import EntityNotFound, CommentNotFound, CommentValidationError
-from src.infrastructure.messaging.kafka_producer import KafkaEventProducer
-from src.infrastructure.repositories.postgres_comment_repository import PostgresCommentRepository
+from src.application.pagination import (
+    decode_comment_cursor,
+    decode_search_cursor,
+    encode_comment_cursor,
+    encode_search_cursor,
+)
+from src.application.timestamps import to_naive_utc
+from src.domain.entities.comment import Comment, CommentsVersion
+from src.domain.ids import uuid7
+from src.domain.exceptions import (
+    EntityNotFound,
+    CommentNotFound,
+    CommentDeleted,
+    CommentValidationError,
+    CommentVersionConflict,
+    ParentCommentNotFound,
+    IdempotencyKeyConflict,
+    IdempotencyKeyReused,
+)
+from src.infrastructure.cache.comment_page_cache import CommentPageCache, estimate_comments_size
+from src.infrastructure.cache.idempotency_cache import IdempotencyCache
+from src.infrastructure.repositories.postgres_comment_repository import IdempotencyRecord, PostgresCommentRepository
+from src.infrastructure.repositories.postgres_outbox_repository import OutboxMessage
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+COMMENT_CHANGED_TOPIC = "comment.changed"
+# Ограничение колонок entity_type / entity_id / author_id в таблице comments
+MAX_KEY_LENGTH = 255
+# Длинные запросы дают огромные tsquery и дорогой поиск
+MAX_SEARCH_QUERY_LENGTH = 256
+# Наибольший уровень ответа: path - varchar(1024), по 32 символа на уровень
+MAX_REPLY_DEPTH = 31
+# Сколько строк (корни и ответы) может быть в одной странице веток
+MAX_THREAD_PAGE_ROWS = 5000
+# Обязательные строковые поля элемента массового создания
+BULK_REQUIRED_FIELDS = ("entity_type", "entity_id", "author_id", "text")
+# Сколько раз создание пробует занять ключ идемпотентности, освобождённый из-под удалённого комментария
+IDEMPOTENCY_CLAIM_ATTEMPTS = 2
+
+
+def build_comment_changed_event(action: str, comment: Comment) -> dict:
+    return {
+        "event_name": "comment.changed",
+        "action": action,
+        "comment": {
+            "id": str(comment.id),
+            "entity_type": comment.entity_type,
+            "entity_id": comment.entity_id,
+            "author_id": comment.author_id,
+            "text": comment.text,
+            "created_at": comment.created_at.isoformat() if comment.created_at else None,
+            "updated_at": comment.updated_at.isoformat() if comment.updated_at else None,
+            "version": comment.version,
+            "parent_id": str(comment.parent_id) if comment.parent_id else None,
+        },
+        # Время изменения; published_at проставляет OutboxRelay при отправке
+        "occurred_at": datetime.utcnow().isoformat(),
+    }
+
+
+def comment_changed_message(action: str, comment: Comment) -> OutboxMessage:
+    return OutboxMessage(
+        topic=COMMENT_CHANGED_TOPIC,
+        key=str(comment.id),
+        payload=build_comment_changed_event(action, comment),
+    )
+
 
 class CreateCommentUseCase:
-    def __init__(self, repo: PostgresCommentRepository, producer: KafkaEventProducer):
+    # repo - PostgresCommentRepository или CommentWriteBatcher перед ним
+    def __init__(
+            self,
+            repo: PostgresCommentRepository,
+            cache: Optional[CommentPageCache] = None,
+            idempotency_cache: Optional[IdempotencyCache] = None,
+    ):
         self.repo = repo
-        self.producer = producer
+        self.cache = cache
+        self.idempotency_cache = idempotency_cache
 
-    async def execute(self, entity_type: str, entity_id: str, author_id: str, text: str) -> Comment:
+    async def execute(
+            self,
+            entity_type: str,
+            entity_id: str,
+            author_id: str,
+            text: str,
+            idempotency_key: Optional[str] = None,
+            parent_id: Optional[str] = None,
+    ) -> Comment:
         """
-        Создать комментарий для сущности
+        Создать комментарий для сущности; с parent_id - ответ на её комментарий.
+        Повтор с тем же idempotency_key возвращает ранее созданный комментарий без новой записи и события.
         """
         if not text.strip():
             raise CommentValidationError("Comment text cannot be empty")
 
+        request_hash = None
+        if idempotency_key is not None:
+            # parent_id входит в хэш, только если задан: хэши запросов без него совпадают с ранее сохранёнными
+            fields = (entity_type, entity_id, author_id, text) + ((parent_id,) if parent_id else ())
+            request_hash = hashlib.blake2b("\x00".join(fields).encode(), digest_size=16).hexdigest()
+            existing = await self._find_by_idempotency_key(author_id, idempotency_key, request_hash)
+            if existing:
+                return existing
+
+        parent = await self._get_parent(parent_id, entity_type, entity_id) if parent_id else None
         now = datetime.now()
+        # Ответ не старше родителя - на этом держится отсечение секций при чтении веток
+        created_at = max(now, parent.created_at) if parent else now
+        comment_id = uuid7(now)
         comment = Comment(
-            id=str(uuid4()),
+            id=comment_id,
             entity_type=entity_type,
             entity_id=entity_id,
             author_id=author_id,
             text=text,
-            created_at=now,
-            updated_at=now
+            created_at=created_at,
+            updated_at=created_at,
+            parent_id=parent.id if parent else None,
+            path=parent.reply_path(comment_id) if parent else "",
         )
 
-        saved_comment = await self.repo.create(comment)
-
-        event = {
-            "event_name": "comment.changed",
-            "action": "created",
-            "comment": {
-                "id": str(saved_comment.id),
-                "entity_type": saved_comment.entity_type,
-                "entity_id": saved_comment.entity_id,
-                "author_id": saved_comment.author_id,
-                "text": saved_comment.text,
-                "created_at": saved_comment.created_at.isoformat() if saved_comment.created_at else None,
-                "updated_at": saved_comment.updated_at.isoformat() if saved_comment.updated_at else None,
-            },
-            "published_at": datetime.utcnow().isoformat(),
-        }
-
-        self.producer.publish(
-            topic="comment.changed",
-            key=str(saved_comment.id),
-            event=event,
-        )
+        # Событие пишется в outbox в той же транзакции, в Kafka его доставит OutboxRelay
+        for _ in range(IDEMPOTENCY_CLAIM_ATTEMPTS):
+            saved_comment = await self.repo.create(
+                comment,
+                events=[comment_changed_message("created", comment)],
+                idempotency_key=idempotency_key,
+                request_hash=request_hash,
+            )
+            if saved_comment is not None:
+                break
+            # Параллельный запрос с тем же ключом успел первым
+            existing = await self._find_by_idempotency_key(author_id, idempotency_key, request_hash)
+            if existing is not None:
+                return existing
+            # Ключ держал физически удалённый комментарий и теперь освобождён - занимаем его заново
+        else:
+            raise IdempotencyKeyConflict(idempotency_key)
+        if idempotency_key is not None and self.idempotency_cache:
+            self.idempotency_cache.put(
+                (author_id, idempotency_key),
+                IdempotencyRecord(comment_id=str(saved_comment.id), request_hash=request_hash, comment=saved_comment),
+            )
+        if self.cache:
+            self.cache.invalidate(entity_type, entity_id)
 
         # Логирование
         logger.info(
@@ -66,10 +162,147 @@ class CreateCommentUseCase:
 
         return saved_comment
 
+    async def _get_parent(self, parent_id: str, entity_type: str, entity_id: str) -> Comment:
+        try:
+            UUID(parent_id)
+        except ValueError:
+            raise CommentValidationError(f"Invalid parent_id: {parent_id}")
+        parent = await self.repo.get_by_id(parent_id)
+        if parent is None or (parent.entity_type, parent.entity_id) != (entity_type, entity_id):
+            raise ParentCommentNotFound(parent_id, entity_type, entity_id)
+        if parent.depth >= MAX_REPLY_DEPTH:
+            raise CommentValidationError(f"Replies cannot be nested deeper than {MAX_REPLY_DEPTH} levels")
+        return parent
+
+    async def _find_by_idempotency_key(self, author_id: str, key: str, request_hash: str) -> Optional[Comment]:
+        """
+        Комментарий, ранее созданный с этим ключом автора. Повтор запроса после удаления комментария
+        получает CommentDeleted: ключ остаётся занятым, чтобы запоздавший повтор не воскресил комментарий.
+        Ключ комментария, удалённого физически, считается истёкшим - возвращается None
+        """
+        record = self.idempotency_cache.get((author_id, key)) if self.idempotency_cache else None
+        if record is not None:
+            # Кэш хранит только привязку ключа: удаление могло случиться на любой реплике
+            comment = await self.repo.get_by_id(record.comment_id)
+            if comment is None:
+                record = None
+        if record is None:
+            record = await self.repo.get_by_idempotency_key(author_id, key)
+            if record is None:
+                return None
+            if record.comment is None:
+                await self.repo.release_idempotency_key(author_id, key, record.comment_id)
+                return None
+            comment = record.comment
+            if self.idempotency_cache and not record.deleted:
+                self.idempotency_cache.put((author_id, key), record)
+        if record.request_hash != request_hash:
+            raise IdempotencyKeyReused(key)
+        if record.deleted:
+            raise CommentDeleted(record.comment_id)
+        return comment
+
+
+@dataclass
+class BulkCreateError:
+    index: int
+    error: str
+
+
+@dataclass
+class BulkCreateResult:
+    created: List[Comment]
+    errors: List[BulkCreateError]
+
+
+class BulkCreateCommentsUseCase:
+    def __init__(self, repo: PostgresCommentRepository, cache: Optional[CommentPageCache] = None):
+        self.repo = repo
+        self.cache = cache
+
+    async def execute(self, items: List[Any]) -> BulkCreateResult:
+        """
+        Создать пачку комментариев одной транзакцией.
+        Элементы приходят без проверки формы: невалидные - не объект, без обязательного поля,
+        с полем не того типа или нарушающие правила - пропускаются и попадают в errors
+        со своим индексом, остальные сохраняются вместе со своими событиями в outbox.
+        """
+        now = datetime.now()
+        comments = []
+        errors = []
+        for index, item in enumerate(items):
+            error = self._validate(item)
+            if error:
+                errors.append(BulkCreateError(index=index, error=error))
+                continue
+            comments.append(Comment(
+                id=uuid7(now),
+                entity_type=item["entity_type"],
+                entity_id=item["entity_id"],
+                author_id=item["author_id"],
+                text=item["text"],
+                created_at=now,
+                updated_at=now,
+            ))
+
+        if comments:
+            await self.repo.create_many(
+                comments, events=[comment_changed_message("created", c) for c in comments]
+            )
+            if self.cache:
+                for entity_type, entity_id in {(c.entity_type, c.entity_id) for c in comments}:
+                    self.cache.invalidate(entity_type, entity_id)
+
+        logger.info(f"Comments bulk created | created={len(comments)} | rejected={len(errors)}")
+        return BulkCreateResult(created=comments, errors=errors)
+
+    @staticmethod
+    def _validate(item: Any) -> Optional[str]:
+        if not isinstance(item, dict):
+            return "Item must be an object"
+        for field in BULK_REQUIRED_FIELDS:
+            if field not in item:
+                return f"{field} is required"
+            if not isinstance(item[field], str):
+                return f"{field} must be a string"
+        if not item["text"].strip():
+            return "Comment text cannot be empty"
+        if item.get("parent_id"):
+            return "Replies cannot be bulk created"
+        for field in ("entity_type", "entity_id", "author_id"):
+            if not item[field]:
+                return f"{field} cannot be empty"
+            if len(item[field]) > MAX_KEY_LENGTH:
+                return f"{field} is longer than {MAX_KEY_LENGTH} characters"
+        # NUL недопустим в text-колонках PostgreSQL и обрывает COPY всей пачки
+        for field in ("entity_type", "entity_id", "author_id", "text"):
+            if "\x00" in item[field]:
+                return f"{field} cannot contain NUL characters"
+        return None
+
+
+@dataclass
+class CommentPage:
+    items: List[Comment]
+    next_cursor: Optional[str] = None
+    # Версия comment_counts, при которой страница была прочитана
+    version: Optional[CommentsVersion] = None
+    # Ветки не поместились в ограничение строк, и часть ответов отброшена
+    truncated: bool = False
+
+
+def _same_revision(cached: Optional[CommentsVersion], current: Optional[CommentsVersion]) -> bool:
+    return current is None or (cached is not None and cached.revision == current.revision)
+
+
+def _revision(version: Optional[CommentsVersion]) -> Optional[int]:
+    return version.revision if version else None
+
 
 class GetCommentsUseCase:
-    def __init__(self, repo: PostgresCommentRepository):
+    def __init__(self, repo: PostgresCommentRepository, cache: Optional[CommentPageCache] = None):
         self.repo = repo
+        self.cache = cache
 
     async def execute(
             self,
@@ -77,74 +310,325 @@ class GetCommentsUseCase:
             entity_id: str,
             page: int = 1,
             limit: int = 10,
-            sort: str = "desc"
-    ) -> List[Comment]:
+            sort: str = "desc",
+            cursor: Optional[str] = None,
+            version: Optional[CommentsVersion] = None,
+            depth: Optional[int] = None,
+            replies_limit: int = 3,
+    ) -> CommentPage:
         """
-        Получить список комментариев для сущности с постраничной навигацией и сортировкой
+        Получить страницу комментариев сущности.
+        Если передан cursor, страница читается после позиции курсора (page игнорируется),
+        иначе - по номеру страницы. next_cursor указывает на следующую страницу в обоих режимах.
+        С depth страница состоит из корневых комментариев, и за каждым идут его первые
+        replies_limit ответов на каждом уровне до depth - в порядке обхода в глубину.
+        Первые страницы берутся из кэша, если он подключён. version - версия комментариев
+        сущности из get_version: закэшированная страница другой ревизии не отдаётся.
+        Прочитанная страница кэшируется, только если после чтения версия всё ещё равна version,
+        иначе в кэш попали бы строки новее ревизии, которой они помечены.
         """
-        comments = await self.repo.get_by_entity(entity_type, entity_id)
+        if self.cache and page == 1 and not cursor:
+            key = self._page_key(entity_type, entity_id, sort, limit, depth, replies_limit)
+            cached = self.cache.get(key)
+            if cached is not None and _same_revision(cached.version, version):
+                return cached
+            generation = self.cache.generation(entity_type, entity_id)
+            result = await self._load(entity_type, entity_id, page, limit, sort, cursor, depth, replies_limit)
+            result.version = version
+            current = await self.repo.get_version(entity_type, entity_id)
+            if _revision(current) == _revision(version):
+                self.cache.put(key, result, estimate_comments_size(result.items), generation)
+            return result
+        result = await self._load(entity_type, entity_id, page, limit, sort, cursor, depth, replies_limit)
+        result.version = version
+        return result
+
+    async def get_thread(
+            self,
+            comment_id: str,
+            depth: Optional[int] = None,
+            replies_limit: Optional[int] = None,
+            limit: int = 1000,
+    ) -> CommentPage:
+        """
+        Комментарий и его ветка одним запросом, в порядке обхода в глубину:
+        до depth уровней вниз (None - все) и по replies_limit ответов на уровне (None - все).
+        Ветка больше limit строк усекается, truncated это показывает
+        """
+        try:
+            UUID(comment_id)
+        except ValueError:
+            raise CommentValidationError(f"Invalid comment_id: {comment_id}")
+        # Лишняя строка показывает, что ветка не поместилась в limit
+        comments = await self.repo.get_subtree(comment_id, depth=depth, replies_limit=replies_limit, limit=limit + 1)
         if not comments:
-            raise EntityNotFound(f"No comments found for entity {entity_type} with id {entity_id}")
+            raise CommentNotFound(f"Comment {comment_id} not found")
+        return CommentPage(items=comments[:limit], truncated=len(comments) > limit)
+
+    async def get_version(
+            self,
+            entity_type: str,
+            entity_id: str,
+            page: int = 1,
+            limit: int = 10,
+            sort: str = "desc",
+            cursor: Optional[str] = None,
+            depth: Optional[int] = None,
+            replies_limit: int = 3,
+    ) -> Optional[CommentsVersion]:
+        """
+        Дешёвый валидатор для условных запросов, без чтения самих комментариев.
+        Некорректный курсор отклоняется здесь же, до сравнения валидаторов.
+        Для закэшированной первой страницы отдаётся версия, с которой она была прочитана:
+        кэш и так инвалидируется при каждой записи, а лишний поход в БД свёл бы его на нет
+        """
+        if cursor:
+            decode_comment_cursor(cursor)
+        elif self.cache and page == 1:
+            cached = self.cache.peek(self._page_key(entity_type, entity_id, sort, limit, depth, replies_limit))
+            if cached is not None and cached.version is not None:
+                return cached.version
+        return await self.repo.get_version(entity_type, entity_id)
+
+    @staticmethod
+    def _page_key(
+            entity_type: str, entity_id: str, sort: str, limit: int, depth: Optional[int], replies_limit: int,
+    ) -> tuple:
+        key = (entity_type, entity_id, sort, limit)
+        if depth is not None:
+            key += (depth, replies_limit)
+        return key
+
+    async def _load(
+            self,
+            entity_type: str,
+            entity_id: str,
+            page: int,
+            limit: int,
+            sort: str,
+            cursor: Optional[str],
+            depth: Optional[int] = None,
+            replies_limit: int = 3,
+    ) -> CommentPage:
+        after = decode_comment_cursor(cursor) if cursor else None
+        offset = 0 if after else (page - 1) * limit
+        truncated = False
+        # Лишняя строка (в режиме веток - лишний корень) показывает, есть ли следующая
+        # страница, без отдельного запроса
+        if depth is None:
+            comments = await self.repo.get_by_entity(
+                entity_type, entity_id, limit=limit + 1, offset=offset, sort=sort, after=after
+            )
+            positions = range(len(comments))
+        else:
+            comments = await self.repo.get_threads(
+                entity_type, entity_id, limit=limit + 1, offset=offset, sort=sort, after=after,
+                depth=depth, replies_limit=replies_limit, max_rows=MAX_THREAD_PAGE_ROWS + 1,
+            )
+            truncated = len(comments) > MAX_THREAD_PAGE_ROWS
+            if truncated:
+                # Усечение отбрасывает самые глубокие ответы - у оставшихся есть родители
+                # (см. _tree_query), так что лишнюю строку можно убрать без потери структуры
+                deepest = max(range(len(comments)), key=lambda i: comments[i].depth)
+                comments = comments[:deepest] + comments[deepest + 1:]
+            positions = [i for i, comment in enumerate(comments) if comment.parent_id is None]
+        # Пустая страница ещё не значит, что у сущности нет комментариев
+        if not comments and not await self.repo.exists_for_entity(entity_type, entity_id):
+            raise EntityNotFound(entity_type, entity_id)
+
+        next_cursor = None
+        if len(positions) > limit:
+            last = comments[positions[limit - 1]]
+            comments = comments[:positions[limit]]
+            next_cursor = encode_comment_cursor(last.created_at, last.id)
+        return CommentPage(items=comments, next_cursor=next_cursor, truncated=truncated)
+
+
+class GetCommentsBatchUseCase:
+    def __init__(self, repo: PostgresCommentRepository):
+        self.repo = repo
+
+    async def execute(
+            self,
+            keys: List[Tuple[str, str]],
+            limit: int = 10,
+            sort: str = "desc",
+    ) -> Dict[Tuple[str, str], CommentPage]:
+        """
+        Получить первые страницы комментариев сразу для нескольких сущностей
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        pages = await self.repo.get_first_pages(keys, limit=limit + 1, sort=sort)
 
-        reverse = True if sort == "desc" else False
-        comments_sorted = sorted(comments, key=lambda c: c.created_at, reverse=reverse)
+        result = {}
+        for key, comments in pages.items():
+            next_cursor = None
+            if len(comments) > limit:
+                comments = comments[:limit]
+                next_cursor = encode_comment_cursor(comments[-1].created_at, comments[-1].id)
+            result[key] = CommentPage(items=comments, next_cursor=next_cursor)
+        return result
 
-        start = (page - 1) * limit
-        end = start + limit
-        return comments_sorted[start:end]
+
+class ExportCommentsUseCase:
+    def __init__(self, repo: PostgresCommentRepository, chunk_size: int = 1000):
+        self.repo = repo
+        self.chunk_size = chunk_size
+
+    def execute(self, entity_type: str, since: Optional[datetime] = None) -> AsyncIterator[List[Comment]]:
+        """
+        Выгрузить все комментарии сущностей заданного типа потоком пачек
+        """
+        return self.repo.iter_by_entity_type(entity_type, since=to_naive_utc(since), chunk_size=self.chunk_size)
+
+
+class SearchCommentsUseCase:
+    def __init__(self, repo: PostgresCommentRepository):
+        self.repo = repo
+
+    async def execute(
+            self,
+            query: str,
+            limit: int = 20,
+            entity_type: Optional[str] = None,
+            author_id: Optional[str] = None,
+            created_from: Optional[datetime] = None,
+            created_to: Optional[datetime] = None,
+            cursor: Optional[str] = None,
+    ) -> CommentPage:
+        """
+        Найти комментарии по тексту, самые релевантные первыми.
+        next_cursor указывает на следующую страницу результатов.
+        """
+        query = query.strip()
+        if not query:
+            raise CommentValidationError("Search query cannot be empty")
+        if len(query) > MAX_SEARCH_QUERY_LENGTH:
+            raise CommentValidationError(f"Search query is longer than {MAX_SEARCH_QUERY_LENGTH} characters")
+        after = decode_search_cursor(cursor) if cursor else None
+
+        found = await self.repo.search(
+            query,
+            limit=limit + 1,
+            entity_type=entity_type,
+            author_id=author_id,
+            created_from=to_naive_utc(created_from),
+            created_to=to_naive_utc(created_to),
+            after=after,
+        )
+        next_cursor = None
+        if len(found) > limit:
+            found = found[:limit]
+            last, rank = found[-1]
+            next_cursor = encode_search_cursor(rank, last.created_at, last.id)
+        return CommentPage(items=[comment for comment, _ in found], next_cursor=next_cursor)
+
+
+class GetCommentCountsUseCase:
+    def __init__(self, repo: PostgresCommentRepository):
+        self.repo = repo
+
+    async def execute(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], int]:
+        """
+        Получить количество комментариев для набора сущностей
+        """
+        if not keys:
+            return {}
+        return await self.repo.get_counts(list(dict.fromkeys(keys)))
 
 
 class UpdateCommentUseCase:
-    def __init__(self, repo: PostgresCommentRepository, producer: KafkaEventProducer):
+    def __init__(self, repo: PostgresCommentRepository, cache: Optional[CommentPageCache] = None):
         self.repo = repo
-        self.producer = producer
+        self.cache = cache
 
     async def execute(
             self,
             comment_id: str,
             entity_type: str,
             entity_id: str,
-            new_text: str
+            new_text: str,
+            version: Optional[int] = None,
     ) -> Comment:
         """
-        Обновить текст комментария
+        Обновить текст комментария. Если передана version, изменение применяется
+        только к этой версии комментария - иначе CommentVersionConflict
         """
         if not new_text.strip():
             raise CommentValidationError("Comment text cannot be empty")
+        try:
+            UUID(str(comment_id))
+        except ValueError:
+            raise CommentNotFound(comment_id)
 
-        comment = await self.repo.get_by_id(comment_id)
-        if not comment:
-            raise CommentNotFound(f"Comment with id {comment_id} not found")
-
-        # Метод update_text теперь в сущности
-        comment.update_text(new_text)
-
-        updated_comment = await self.repo.update(comment)
-
-        event = {
-            "event_name": "comment.changed",
-            "action": "updated",
-            "comment": {
-                "id": str(updated_comment.id),
-                "entity_type": updated_comment.entity_type,
-                "entity_id": updated_comment.entity_id,
-                "author_id": updated_comment.author_id,
-                "text": updated_comment.text,
-                "created_at": updated_comment.created_at.isoformat() if updated_comment.created_at else None,
-                "updated_at": updated_comment.updated_at.isoformat() if updated_comment.updated_at else None,
+        now = datetime.utcnow()
+        # Поле comment события заполняет репозиторий из обновлённой строки
+        event = OutboxMessage(
+            topic=COMMENT_CHANGED_TOPIC,
+            key=str(comment_id),
+            payload={
+                "event_name": "comment.changed",
+                "action": "updated",
+                "occurred_at": now.isoformat(),
             },
-            "published_at": datetime.utcnow().isoformat(),
-        }
-
-        self.producer.publish(
-            topic="comment.changed",
-            key=str(updated_comment.id),
-            event=event,
         )
+        comment, applied = await self.repo.update_text(
+            comment_id, entity_type, entity_id, new_text, now, expected_version=version, event=event
+        )
+        if comment is None:
+            raise CommentNotFound(comment_id)
+        if not applied:
+            raise CommentVersionConflict(comment_id, version, comment.version)
+
+        if self.cache:
+            self.cache.invalidate(entity_type, entity_id)
 
         # Логирование
         logger.info(
-            f"Comment updated | id={comment.id} | entity={entity_type}:{entity_id} | author={comment.author_id} | time={comment.updated_at.isoformat()}"
+            f"Comment updated | id={comment.id} | entity={entity_type}:{entity_id} | author={comment.author_id} | version={comment.version} | time={comment.updated_at.isoformat()}"
         )
 
-        return updated_comment
+        return comment
+
+
+class DeleteCommentUseCase:
+    def __init__(self, repo: PostgresCommentRepository, cache: Optional[CommentPageCache] = None):
+        self.repo = repo
+        self.cache = cache
+
+    async def execute(self, comment_id: str) -> int:
+        """
+        Мягко удалить комментарий вместе с ответами на него.
+        На каждый удалённый комментарий в outbox пишется событие deleted.
+        Возвращает число удалённых комментариев.
+        """
+        try:
+            UUID(str(comment_id))
+        except ValueError:
+            raise CommentNotFound(comment_id)
+
+        now = datetime.utcnow()
+        # Поле comment событий заполняет репозиторий из удалённых строк
+        event = OutboxMessage(
+            topic=COMMENT_CHANGED_TOPIC,
+            key=str(comment_id),
+            payload={
+                "event_name": "comment.changed",
+                "action": "deleted",
+                "occurred_at": now.isoformat(),
+            },
+        )
+        result = await self.repo.soft_delete(comment_id, now, event)
+        if result is None:
+            raise CommentNotFound(comment_id)
+        entity_type, entity_id, deleted = result
+
+        if self.cache:
+            self.cache.invalidate(entity_type, entity_id)
+
+        logger.info(
+            f"Comment deleted | id={comment_id} | entity={entity_type}:{entity_id} | with_replies={deleted - 1} | time={now.isoformat()}"
+        )
+        return deleted
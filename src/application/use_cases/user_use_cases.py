@@ -1,7 +1,9 @@
 import asyncio
+import re
+from dataclasses import dataclass
 from datetime import datetime
 from uuid import uuid4
-from typing import List, Dict, Optional
+from typing import AsyncIterable, AsyncIterator, List, Dict, Optional, Sequence, Tuple
 
 from src.domain.entities.user import User
 from src.domain.exceptions import EntityAlreadyExists, EntityNotFound, ValidationError
@@ -15,12 +17,98 @@ class CreateUserUseCase:
     async def execute(self, email: str, name: str) -> User:
         if not email or not name:
             raise ValidationError("Email and name are required")
-        existing_user = await self.user_repository.get_by_email(email)
-        if existing_user:
-            raise EntityAlreadyExists(f"User with email {email} already exists")
 
+        # Проверка уникальности - в том же insert (on conflict do nothing)
         user = User(id=None, email=email, name=name)
-        return await self.user_repository.create(user)
+        created = await self.user_repository.create(user)
+        if created is None:
+            raise EntityAlreadyExists(f"User with email {email} already exists")
+        return created
+
+
+# Ограничение колонок email / name в таблице users
+MAX_USER_FIELD_LENGTH = 255
+MAX_USERS_PAGE_SIZE = 1000
+_EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+
+@dataclass
+class UserImportIssue:
+    line: int
+    email: str
+    reason: str
+
+
+@dataclass
+class UserImportResult:
+    total: int
+    created: int
+    conflicts: int
+    invalid: int
+    # Первые max_reported_issues невалидных и конфликтующих строк
+    issues: List[UserImportIssue]
+
+
+class ImportUsersUseCase:
+    """
+    Массовый импорт пользователей: строки проверяются на лету и потоком уходят в репозиторий,
+    существующие email и повторы внутри импорта возвращаются как конфликты
+    """
+
+    def __init__(self, user_repository: UserRepository, max_reported_issues: int = 1000):
+        self.user_repository = user_repository
+        self.max_reported_issues = max_reported_issues
+
+    async def execute(self, rows: AsyncIterable[Tuple[int, Optional[Sequence[str]]]]) -> UserImportResult:
+        """
+        rows - пары (номер строки, [email, name]); None вместо полей - строка, которую не удалось разобрать.
+        email сохраняется как есть, как и в create
+        """
+        invalid: List[UserImportIssue] = []
+        counters = {"total": 0, "invalid": 0}
+
+        async def valid_rows() -> AsyncIterator[Tuple[int, str, str]]:
+            async for line, row in rows:
+                counters["total"] += 1
+                email = row[0].strip() if row else ""
+                error = self._validate(row)
+                if error:
+                    counters["invalid"] += 1
+                    if len(invalid) < self.max_reported_issues:
+                        invalid.append(UserImportIssue(line=line, email=email, reason=error))
+                    continue
+                yield line, email, row[1].strip()
+
+        created, conflicts, reported = await self.user_repository.import_many(
+            valid_rows(), max_reported_conflicts=self.max_reported_issues
+        )
+        issues = invalid + [
+            UserImportIssue(line=line, email=email, reason=reason) for line, email, reason in reported
+        ]
+        issues.sort(key=lambda issue: issue.line)
+        return UserImportResult(
+            total=counters["total"],
+            created=created,
+            conflicts=conflicts,
+            invalid=counters["invalid"],
+            issues=issues[:self.max_reported_issues],
+        )
+
+    @staticmethod
+    def _validate(row: Optional[Sequence[str]]) -> Optional[str]:
+        if row is None:
+            return "Malformed CSV line"
+        if len(row) != 2:
+            return "Expected 2 columns: email,name"
+        email, name = row[0].strip(), row[1].strip()
+        # NUL недопустим в text-колонках PostgreSQL и обрывает COPY всего импорта
+        if "\x00" in email or "\x00" in name:
+            return "Line contains NUL characters"
+        if not _EMAIL_PATTERN.match(email) or len(email) > MAX_USER_FIELD_LENGTH:
+            return "Invalid email"
+        if not name or len(name) > MAX_USER_FIELD_LENGTH:
+            return "Name is required and must be at most 255 characters"
+        return None
 
 
 class GetUserUseCase:
@@ -30,7 +118,7 @@ class GetUserUseCase:
     async def execute(self, user_id: int) -> User:
         user = await self.user_repository.get_by_id(user_id)
         if not user:
-            raise EntityNotFound(f"User with id {user_id} not found")
+            raise EntityNotFound("user", user_id)
         return user
 
 
@@ -38,8 +126,27 @@ class GetAllUsersUseCase:
     def __init__(self, user_repository: UserRepository):
         self.user_repository = user_repository
 
-    async def execute(self, limit: int = 100, offset: int = 0) -> List[User]:
-        return await self.user_repository.get_all(limit=limit, offset=offset)
+    async def execute(self, limit: int = 100, offset: int = 0, after_id: Optional[int] = None) -> List[User]:
+        """
+        Страница пользователей по возрастанию id. Для обхода всех страниц передавай
+        after_id = id последнего пользователя предыдущей страницы: offset с ростом
+        глубины становится всё дороже
+        """
+        if limit < 1 or limit > MAX_USERS_PAGE_SIZE:
+            raise ValidationError(f"limit must be between 1 and {MAX_USERS_PAGE_SIZE}")
+        return await self.user_repository.get_all(limit=limit, offset=offset, after_id=after_id)
+
+
+class ExportUsersUseCase:
+    def __init__(self, user_repository: UserRepository, chunk_size: int = 1000):
+        self.user_repository = user_repository
+        self.chunk_size = chunk_size
+
+    def execute(self) -> AsyncIterator[List[User]]:
+        """
+        Выгрузить всех пользователей потоком пачек
+        """
+        return self.user_repository.iter_all(chunk_size=self.chunk_size)
 
 
 class UpdateUserUseCase:
@@ -49,7 +156,7 @@ class UpdateUserUseCase:
     async def execute(self, user_id: int, email: Optional[str] = None, name: Optional[str] = None) -> User:
         existing_user = await self.user_repository.get_by_id(user_id)
         if not existing_user:
-            raise EntityNotFound(f"User with id {user_id} not found")
+            raise EntityNotFound("user", user_id)
 
         if email:
             existing_user.email = email
@@ -58,7 +165,7 @@ class UpdateUserUseCase:
 
         updated_user = await self.user_repository.update(existing_user)
         if not updated_user:
-            raise EntityNotFound(f"User with id {user_id} not found")
+            raise EntityNotFound("user", user_id)
         return updated_user
 
 
@@ -69,7 +176,7 @@ class DeleteUserUseCase:
     async def execute(self, user_id: int) -> bool:
         result = await self.user_repository.delete(user_id)
         if not result:
-            raise EntityNotFound(f"User with id {user_id} not found")
+            raise EntityNotFound("user", user_id)
         return result
 
 
@@ -1,20 +1,66 @@
 # src/domain/entities/comment.py
 from dataclasses import dataclass, field
 from datetime import datetime
+from typing import Optional
+from uuid import UUID
 
-@dataclass
+# Длина сегмента материализованного пути: id комментария без дефисов
+PATH_SEGMENT_LENGTH = 32
+
+@dataclass(slots=True)
 class Comment:
-    id: str
+    id: UUID
     entity_type: str
     entity_id: str
     author_id: str
     text: str
     created_at: datetime
     updated_at: datetime
+    # Увеличивается при каждом изменении - для оптимистичной блокировки
+    version: int = 1
+    # Комментарий, на который это ответ; None - корневой комментарий ветки
+    parent_id: Optional[UUID] = None
+    # Материализованный путь: сегменты id от корня ветки до самого комментария
+    path: str = ""
 
     def __post_init__(self):
         # Валидация текста при создании
         self._validate_text(self.text)
+        if not self.path:
+            self.path = self.path_segment(self.id)
+
+    @classmethod
+    def from_record(cls, record) -> "Comment":
+        """
+        Собрать комментарий из строки БД без повторной валидации:
+        данные уже прошли её при записи
+        """
+        comment = object.__new__(cls)
+        comment.id = record['id']
+        comment.entity_type = record['entity_type']
+        comment.entity_id = record['entity_id']
+        comment.author_id = record['author_id']
+        comment.text = record['text']
+        comment.created_at = record['created_at']
+        comment.updated_at = record['updated_at']
+        comment.version = record['version']
+        comment.parent_id = record['parent_id']
+        comment.path = record['path']
+        return comment
+
+    @property
+    def depth(self) -> int:
+        """
+        Уровень вложенности: 0 у корневого комментария
+        """
+        return len(self.path) // PATH_SEGMENT_LENGTH - 1
+
+    def reply_path(self, reply_id) -> str:
+        return self.path + self.path_segment(reply_id)
+
+    @staticmethod
+    def path_segment(comment_id) -> str:
+        return str(comment_id).replace("-", "")
 
     def update_text(self, new_text: str):
         """
@@ -28,3 +74,13 @@ class Comment:
     def _validate_text(text: str):
         if not text.strip():
             raise ValueError("Comment text cannot be empty")
+
+
+@dataclass
+class CommentsVersion:
+    """
+    Версия набора комментариев сущности: меняется при каждом создании или изменении комментария
+    """
+    count: int
+    revision: int
+    last_modified_at: datetime
@@ -18,6 +18,52 @@ class CommentNotFound(DomainException):
         super().__init__(f'Комментарий не найден: {comment_id}')
 
 
+class ParentCommentNotFound(DomainException):
+    """Reply target does not exist or belongs to another entity"""
+
+    def __init__(self, parent_id, entity_type: str, entity_id: str):
+        self.parent_id = parent_id
+        self.entity_type = entity_type
+        self.entity_id = entity_id
+        super().__init__(f'Родительский комментарий {parent_id} не найден у {entity_type}:{entity_id}')
+
+
+class CommentDeleted(DomainException):
+    """Comment existed but has been deleted"""
+
+    def __init__(self, comment_id):
+        self.comment_id = comment_id
+        super().__init__(f'Комментарий удалён: {comment_id}')
+
+
+class CommentVersionConflict(DomainException):
+    """Comment was changed by someone else since the client read it"""
+
+    def __init__(self, comment_id, expected_version: int, actual_version: int):
+        self.comment_id = comment_id
+        self.expected_version = expected_version
+        self.actual_version = actual_version
+        super().__init__(
+            f'Комментарий {comment_id} изменён: ожидалась версия {expected_version}, текущая {actual_version}'
+        )
+
+
+class IdempotencyKeyReused(DomainException):
+    """Idempotency key was already used for a different request"""
+
+    def __init__(self, key: str):
+        self.key = key
+        super().__init__(f'Ключ идемпотентности {key} уже использован для другого запроса')
+
+
+class IdempotencyKeyConflict(DomainException):
+    """Idempotency key is held by a concurrent request whose result is not visible yet"""
+
+    def __init__(self, key: str):
+        self.key = key
+        super().__init__(f'Ключ идемпотентности {key} занят параллельным запросом, повторите запрос')
+
+
 class EntityAlreadyExists(DomainException):
     pass
 
@@ -28,3 +74,8 @@ class ValidationError(DomainException):
 
 class CommentValidationError(DomainException):
     pass
+
+
+class InvalidCursor(DomainException):
+    """Cursor is malformed or was not issued by this service"""
+    pass
@@ -0,0 +1,42 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from uuid import UUID
+
+_EPOCH = datetime(1970, 1, 1)
+_MS = timedelta(milliseconds=1)
+
+
+def uuid7(at: datetime) -> UUID:
+    """
+    UUID версии 7 (RFC 9562): старшие 48 бит - миллисекунды Unix-времени at,
+    следующие 12 - доля миллисекунды (микросекунды), поэтому id упорядочены
+    как created_at. Наивное время считается UTC. Из такого id можно восстановить
+    время создания - по нему репозиторий выбирает секцию таблицы comments.
+    """
+    if at.tzinfo is not None:
+        at = at.astimezone(timezone.utc).replace(tzinfo=None)
+    ms, rest = divmod(at - _EPOCH, _MS)
+    sub_ms = rest.microseconds * 4096 // 1000
+    rand = int.from_bytes(os.urandom(8), "big")
+    value = (
+        (ms & 0xFFFF_FFFF_FFFF) << 80
+        | 0x7 << 76
+        | sub_ms << 64
+        | 0b10 << 62
+        | rand & 0x3FFF_FFFF_FFFF_FFFF
+    )
+    return UUID(int=value)
+
+
+def uuid7_time(value) -> Optional[datetime]:
+    """
+    Время, зашитое в UUIDv7, с точностью до миллисекунды; None для других версий UUID
+    """
+    try:
+        uuid = value if isinstance(value, UUID) else UUID(str(value))
+    except ValueError:
+        return None
+    if uuid.version != 7:
+        return None
+    return _EPOCH + (uuid.int >> 80) * _MS
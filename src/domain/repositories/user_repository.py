@@ -1,12 +1,23 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from typing import AsyncIterable, AsyncIterator, List, Optional, Tuple
 
 from src.domain.entities.user import User
 
 
 class UserRepository(ABC):
     @abstractmethod
-    async def create(self, user: User) -> User:
+    async def create(self, user: User) -> Optional[User]:
+        """Вернуть None, если пользователь с таким email уже есть"""
+        pass
+
+    @abstractmethod
+    async def import_many(
+            self, rows: AsyncIterable[Tuple[int, str, str]], max_reported_conflicts: int
+    ) -> Tuple[int, int, List[Tuple[int, str, str]]]:
+        """
+        Импорт строк (номер строки, email, name). Возвращает число созданных,
+        число конфликтов и первые max_reported_conflicts конфликтов (строка, email, причина)
+        """
         pass
 
     @abstractmethod
@@ -18,7 +29,13 @@ class UserRepository(ABC):
         pass
 
     @abstractmethod
-    async def get_all(self, limit: int = 100, offset: int = 0) -> List[User]:
+    async def get_all(self, limit: int = 100, offset: int = 0, after_id: Optional[int] = None) -> List[User]:
+        """С after_id - страница пользователей с id > after_id, offset не используется"""
+        pass
+
+    @abstractmethod
+    def iter_all(self, chunk_size: int = 1000) -> AsyncIterator[List[User]]:
+        """Все пользователи по возрастанию id пачками по chunk_size"""
         pass
 
     @abstractmethod
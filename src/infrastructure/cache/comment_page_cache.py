@@ -0,0 +1,160 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Set, Tuple
+
+from src.infrastructure.config import settings
+
+# (entity_type, entity_id, sort, limit), у страниц веток ещё (depth, replies_limit)
+PageKey = Tuple[Any, ...]
+EntityKey = Tuple[str, str]
+
+# Примерные накладные расходы на объект Comment без учёта строк
+_COMMENT_OVERHEAD_BYTES = 200
+
+
+@dataclass
+class _Entry:
+    value: Any
+    size: int
+    expires_at: float
+
+
+class CommentPageCache:
+    """
+    LRU-кэш первых страниц комментариев с TTL, ограниченный числом записей и объёмом в байтах.
+    Инвалидируется целиком по сущности: локально из use case'ов записи
+    и на других репликах через топик comment.changed.
+    Потокобезопасен - инвалидация приходит из потока Kafka-консьюмера.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[PageKey, _Entry]" = OrderedDict()
+        self._keys_by_entity: Dict[EntityKey, Set[PageKey]] = {}
+        self._generations: Dict[EntityKey, int] = {}
+        self._epoch = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def generation(self, entity_type: str, entity_id: str) -> Tuple[int, int]:
+        """
+        Номер поколения сущности - берётся до чтения из БД и передаётся в put,
+        чтобы не закэшировать страницу, прочитанную до параллельной инвалидации
+        """
+        with self._lock:
+            return self._epoch, self._generations.get((entity_type, entity_id), 0)
+
+    def get(self, key: PageKey) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def peek(self, key: PageKey) -> Optional[Any]:
+        """
+        Живая запись без учёта в статистике и в порядке LRU
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= time.monotonic():
+                return None
+            return entry.value
+
+    def put(self, key: PageKey, value: Any, size: int, generation: Tuple[int, int]) -> None:
+        entity = (key[0], key[1])
+        with self._lock:
+            current = (self._epoch, self._generations.get(entity, 0))
+            if current != generation or size > self.max_bytes:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(value, size, time.monotonic() + self.ttl_seconds)
+            self._keys_by_entity.setdefault(entity, set()).add(key)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, entity_type: str, entity_id: str) -> None:
+        entity = (entity_type, entity_id)
+        with self._lock:
+            self._generations[entity] = self._generations.get(entity, 0) + 1
+            for key in self._keys_by_entity.pop(entity, set()):
+                entry = self._entries.pop(key)
+                self._bytes -= entry.size
+            self.invalidations += 1
+            # Поколения нужны только пока может идти конкурирующее чтение;
+            # сброс эпохи отклоняет все незавершённые put
+            if len(self._generations) > self.max_entries * 4:
+                self._generations.clear()
+                self._epoch += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_entity.clear()
+            self._generations.clear()
+            self._epoch += 1
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key: PageKey) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        entity = (key[0], key[1])
+        keys = self._keys_by_entity.get(entity)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_entity[entity]
+
+
+def estimate_comments_size(comments) -> int:
+    """
+    Приблизительный объём списка комментариев в памяти
+    """
+    return sum(
+        _COMMENT_OVERHEAD_BYTES
+        + sys.getsizeof(comment.text)
+        + sys.getsizeof(comment.author_id)
+        + sys.getsizeof(comment.entity_id)
+        for comment in comments
+    )
+
+
+comment_page_cache = CommentPageCache(
+    max_entries=settings.comment_cache_max_entries,
+    max_bytes=settings.comment_cache_max_bytes,
+    ttl_seconds=settings.comment_cache_ttl_seconds,
+)
@@ -0,0 +1,32 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class IdempotencyCache:
+    """
+    Локальный LRU-кэш ключей идемпотентности с TTL перед таблицей comment_idempotency_keys.
+    Снимает запрос в БД с повторов, пришедших на ту же реплику; источник истины - таблица.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
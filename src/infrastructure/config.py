@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -9,10 +11,81 @@ class Settings(BaseSettings):
     database_name: str = "postgres"
     database_user: str = "postgres"
     database_password: str = "1234"
+    # Размер пула считается на один воркер: при N воркерах к БД открывается до N * max_size соединений
+    database_pool_min_size: int = 1
+    database_pool_max_size: int = 20
+    database_pool_max_inactive_connection_lifetime: float = 300.0
+    # 0 отключает кэш подготовленных запросов (нужно за PgBouncer в режиме transaction)
+    database_statement_cache_size: int = 100
+    database_connect_timeout: float = 30.0
+    database_command_timeout: float = 60.0
+    database_acquire_timeout: float = 10.0
+    # Хук инициализации каждого соединения пула: "package.module:coroutine_function"
+    database_pool_init: Optional[str] = None
+    # Реплики для чтения через запятую: "replica1:5432,replica2"; пусто - всё читается с основного сервера
+    database_replica_hosts: str = ""
+    database_replica_health_check_interval_seconds: float = 1.0
+    database_replica_health_check_timeout: float = 1.0
     app_host: str = "0.0.0.0"
     app_port: int = 8000
     debug: bool = False
 
+    kafka_bootstrap_servers: str = "localhost:9092"
+    kafka_linger_ms: int = 5
+    kafka_batch_size: int = 64 * 1024
+    kafka_compression_type: str = "lz4"
+    # message.timeout.ms: сколько librdkafka пытается доставить сообщение, прежде чем вернуть ошибку.
+    # Relay держит блокировки захваченной пачки outbox, пока ждёт подтверждений
+    kafka_delivery_timeout_ms: int = 30_000
+
+    comment_cache_enabled: bool = True
+    comment_cache_max_entries: int = 10_000
+    comment_cache_max_bytes: int = 64 * 1024 * 1024
+    comment_cache_ttl_seconds: float = 5.0
+    comment_cache_invalidation_enabled: bool = True
+
+    comment_export_chunk_size: int = 1000
+
+    # Сколько невалидных и конфликтующих строк POST /users/import возвращает в ответе
+    user_import_max_reported_issues: int = 1000
+    # Тело импорта сначала дочитывается во временный файл (сверх этого размера - на диск),
+    # чтобы транзакция с COPY не оставалась открытой, пока медленный клиент загружает файл
+    user_import_spool_max_memory_bytes: int = 8 * 1024 * 1024
+    user_export_chunk_size: int = 1000
+
+    # Месячные секции comments: сколько месяцев создавать заранее и сколько хранить (0 - всё).
+    # Отсоединённые секции переносятся в archive-схему, пустая строка - удаляются
+    comment_partition_months_ahead: int = 3
+    comment_partition_retention_months: int = 0
+    comment_partition_archive_schema: str = "archive"
+
+    # Групповая запись одиночных POST /comments/: параллельные вставки за окно
+    # собираются в один INSERT и одну транзакцию
+    comment_write_batching_enabled: bool = False
+    comment_write_batch_window_ms: float = 2.0
+    comment_write_batch_max_size: int = 100
+
+    # Idempotency-Key для POST /comments/: ключи хранятся в БД ttl секунд,
+    # локальный кэш перед таблицей отключается comment_idempotency_cache_max_entries = 0
+    comment_idempotency_ttl_seconds: int = 24 * 60 * 60
+    comment_idempotency_cache_max_entries: int = 10_000
+    comment_idempotency_cleanup_interval_seconds: float = 60.0
+    comment_idempotency_cleanup_batch_size: int = 1000
+
+    # Физическое удаление мягко удалённых комментариев старше retention: пачками по batch_size
+    # с паузой между пачками, чтобы не создавать всплесков блокировок и WAL.
+    # Можно выключить и запускать purge_comments.py отдельно
+    comment_purge_enabled: bool = True
+    comment_purge_retention_seconds: int = 24 * 60 * 60
+    comment_purge_batch_size: int = 500
+    comment_purge_batch_pause_seconds: float = 0.5
+    comment_purge_interval_seconds: float = 60.0
+
+    # Relay outbox -> Kafka внутри приложения; можно выключить и запускать outbox_relay.py отдельно
+    outbox_relay_enabled: bool = True
+    outbox_batch_size: int = 500
+    outbox_poll_interval_seconds: float = 0.2
+
 
 settings = Settings()
 
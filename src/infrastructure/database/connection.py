@@ -1,44 +1,287 @@
+import asyncio
+import importlib
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager, suppress
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
 import asyncpg
-from typing import Optional
 
-from src.infrastructure.config import settings
+from src.infrastructure.config import Settings, settings
+from src.infrastructure.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин времени ожидания соединения из пула, мс
+_ACQUIRE_WAIT_BOUNDS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000)
+# pg_last_wal_replay_lsn() возвращает NULL на сервере не в режиме восстановления - он отстать не может
+_NOT_IN_RECOVERY_LSN = 2 ** 64
+
+
+def parse_lsn(value: str) -> int:
+    """
+    LSN PostgreSQL вида "16/B374D848" в число
+    """
+    high, _, low = value.partition("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+def format_lsn(lsn: int) -> str:
+    return f"{lsn >> 32:X}/{lsn & 0xFFFFFFFF:X}"
+
+
+@dataclass
+class ReadSession:
+    """
+    Маршрутизация чтений в рамках одного запроса. Реплика выбирается при первом чтении
+    и закрепляется, чтобы все чтения запроса видели один снимок данных.
+    min_lsn - LSN последней записи клиента: реплика, не применившая его, не подходит.
+    """
+    min_lsn: int = 0
+    pool: Optional[asyncpg.Pool] = None
+
+
+read_session: ContextVar[Optional[ReadSession]] = ContextVar("read_session", default=None)
+
+
+@dataclass
+class _Replica:
+    host: str
+    port: int
+    pool: asyncpg.Pool
+    healthy: bool = False
+    replay_lsn: int = 0
+    reads: int = 0
+
+
+def _load_init_hook(path: Optional[str]) -> Optional[Callable[[asyncpg.Connection], Awaitable[None]]]:
+    """
+    Загрузить хук инициализации соединения по пути вида "package.module:function"
+    """
+    if not path:
+        return None
+    module_name, _, attr = path.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
 
 
 class DatabaseConnection:
-    def __init__(self):
+    """
+    Пулы соединений приложения: основной и, если заданы DATABASE_REPLICA_HOSTS, пулы реплик.
+    Все репозитории берут соединения через acquire(), чтобы действовал общий таймаут ожидания
+    и собиралась статистика. acquire(readonly=True) отдаёт соединение здоровой реплики
+    по кругу, если она применила LSN из текущей ReadSession, иначе основного сервера.
+    """
+
+    def __init__(self, config: Settings = settings):
+        self.config = config
         self.pool: Optional[asyncpg.Pool] = None
+        self.replicas: List[_Replica] = []
+        self.acquire_wait_ms = Histogram(_ACQUIRE_WAIT_BOUNDS_MS)
+        self.acquire_timeouts = 0
+        self.primary_reads = 0
+        self._waiters = 0
+        self._round_robin = itertools.count()
+        self._health_task: Optional[asyncio.Task] = None
     
-    async def connect(self):
-        if not self.pool:
-            self.pool = await asyncpg.create_pool(
-                host=settings.database_host,
-                port=settings.database_port,
-                database=settings.database_name,
-                user=settings.database_user,
-                password=settings.database_password,
-                min_size=1,
-                max_size=20,
-                timeout=30.0,
-                command_timeout=60.0,
-            )
+    async def connect(self, init: Optional[Callable[[asyncpg.Connection], Awaitable[None]]] = None):
+        """
+        Создать пул. init вызывается для каждого нового соединения;
+        если не передан, берётся из settings.database_pool_init.
+        Пулы реплик создаются по DATABASE_REPLICA_HOSTS, их состояние проверяется в фоне
+        """
+        if self.pool:
+            return
+        init = init or _load_init_hook(self.config.database_pool_init)
+        self.pool = await self._create_pool(self.config.database_host, self.config.database_port, init)
+        for host, port in self._replica_addresses():
+            # Соединения с репликой открываются по требованию: недоступная реплика не задерживает
+            # и не роняет старт, а проверка ниже просто отмечает её нездоровой
+            pool = await self._create_pool(host, port, init, min_size=0)
+            self.replicas.append(_Replica(host, port, pool))
+        if self.replicas:
+            await self.check_replicas()
+            self._health_task = asyncio.create_task(self._check_replicas_periodically())
     
     async def disconnect(self):
+        if self._health_task:
+            self._health_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._health_task
+            self._health_task = None
+        for replica in self.replicas:
+            await replica.pool.close()
+        self.replicas = []
         if self.pool:
             await self.pool.close()
             self.pool = None
+
+    @asynccontextmanager
+    async def acquire(
+            self, timeout: Optional[float] = None, readonly: bool = False
+    ) -> AsyncIterator[asyncpg.Connection]:
+        """
+        Взять соединение с таймаутом ожидания (по умолчанию settings.database_acquire_timeout).
+        readonly=True - запрос только читает и может уйти на реплику
+        """
+        if timeout is None:
+            timeout = self.config.database_acquire_timeout
+        pool = self._read_pool() if readonly and self.replicas else self.pool
+        self._waiters += 1
+        started = time.perf_counter()
+        try:
+            try:
+                connection = await pool.acquire(timeout=timeout)
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                if pool is self.pool:
+                    raise
+                # Реплика недоступна - до следующей проверки читаем с основного сервера
+                logger.warning("Replica connection failed, reading from primary: %r", e)
+                self._mark_unhealthy(pool)
+                pool = self.pool
+                connection = await pool.acquire(timeout=timeout)
+        except asyncio.TimeoutError:
+            self.acquire_timeouts += 1
+            raise
+        finally:
+            self._waiters -= 1
+            self.acquire_wait_ms.observe((time.perf_counter() - started) * 1000)
+        try:
+            yield connection
+        finally:
+            await pool.release(connection)
     
     async def execute(self, query: str, *args):
-        async with self.pool.acquire(timeout=10.0) as connection:
+        async with self.acquire() as connection:
             return await connection.execute(query, *args)
     
-    async def fetch(self, query: str, *args):
-        async with self.pool.acquire(timeout=10.0) as connection:
+    async def fetch(self, query: str, *args, readonly: bool = False):
+        async with self.acquire(readonly=readonly) as connection:
             return await connection.fetch(query, *args)
     
-    async def fetchrow(self, query: str, *args):
-        async with self.pool.acquire(timeout=10.0) as connection:
+    async def fetchrow(self, query: str, *args, readonly: bool = False):
+        async with self.acquire(readonly=readonly) as connection:
             return await connection.fetchrow(query, *args)
 
+    async def current_lsn(self) -> str:
+        """
+        Текущая позиция WAL основного сервера - токен сессии после записи
+        """
+        async with self.acquire() as connection:
+            return await connection.fetchval("select pg_current_wal_lsn()::text")
 
-db_connection = DatabaseConnection()
+    async def check_replicas(self) -> None:
+        """
+        Обновить здоровье и применённый LSN каждой реплики
+        """
+        for replica in self.replicas:
+            try:
+                async with replica.pool.acquire(timeout=self.config.database_replica_health_check_timeout) as connection:
+                    lsn = await connection.fetchval(
+                        "select pg_last_wal_replay_lsn()::text",
+                        timeout=self.config.database_replica_health_check_timeout,
+                    )
+            except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                if replica.healthy:
+                    logger.warning("Replica %s:%s is unhealthy: %r", replica.host, replica.port, e)
+                replica.healthy = False
+                continue
+            replica.replay_lsn = _NOT_IN_RECOVERY_LSN if lsn is None else parse_lsn(lsn)
+            replica.healthy = True
+
+    def _read_pool(self) -> asyncpg.Pool:
+        session = read_session.get()
+        if session is not None and session.pool is not None:
+            return session.pool
+        min_lsn = session.min_lsn if session is not None else 0
+        pool = self.pool
+        start = next(self._round_robin)
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(start + i) % len(self.replicas)]
+            if replica.healthy and replica.replay_lsn >= min_lsn:
+                replica.reads += 1
+                pool = replica.pool
+                break
+        else:
+            self.primary_reads += 1
+        if session is not None:
+            session.pool = pool
+        return pool
+
+    def _mark_unhealthy(self, pool: asyncpg.Pool) -> None:
+        for replica in self.replicas:
+            if replica.pool is pool:
+                replica.healthy = False
+        session = read_session.get()
+        if session is not None and session.pool is pool:
+            session.pool = self.pool
 
+    async def _check_replicas_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.config.database_replica_health_check_interval_seconds)
+            await self.check_replicas()
+
+    def _replica_addresses(self) -> List[Tuple[str, int]]:
+        addresses = []
+        for item in self.config.database_replica_hosts.split(","):
+            item = item.strip()
+            if not item:
+                continue
+            host, _, port = item.partition(":")
+            addresses.append((host, int(port) if port else self.config.database_port))
+        return addresses
+
+    async def _create_pool(self, host: str, port: int, init, min_size: Optional[int] = None) -> asyncpg.Pool:
+        return await asyncpg.create_pool(
+            host=host,
+            port=port,
+            database=self.config.database_name,
+            user=self.config.database_user,
+            password=self.config.database_password,
+            min_size=self.config.database_pool_min_size if min_size is None else min_size,
+            max_size=self.config.database_pool_max_size,
+            max_inactive_connection_lifetime=self.config.database_pool_max_inactive_connection_lifetime,
+            statement_cache_size=self.config.database_statement_cache_size,
+            timeout=self.config.database_connect_timeout,
+            command_timeout=self.config.database_command_timeout,
+            init=init,
+        )
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Состояние пула для /metrics: waiting > 0 при in_use == max_size означает нехватку соединений
+        """
+        if not self.pool:
+            return {"connected": False}
+        size = self.pool.get_size()
+        idle = self.pool.get_idle_size()
+        return {
+            "connected": True,
+            "min_size": self.pool.get_min_size(),
+            "max_size": self.pool.get_max_size(),
+            "size": size,
+            "in_use": size - idle,
+            "idle": idle,
+            "waiting": self._waiters,
+            "acquire_timeouts": self.acquire_timeouts,
+            "acquire_wait_ms": self.acquire_wait_ms.snapshot(),
+            "acquire_wait_ms_sum": round(self.acquire_wait_ms.sum, 3),
+            "acquire_count": self.acquire_wait_ms.count,
+            "primary_reads": self.primary_reads,
+            "replicas": [
+                {
+                    "host": f"{replica.host}:{replica.port}",
+                    "healthy": replica.healthy,
+                    "replay_lsn": None if replica.replay_lsn == _NOT_IN_RECOVERY_LSN else format_lsn(replica.replay_lsn),
+                    "reads": replica.reads,
+                    "size": replica.pool.get_size(),
+                    "idle": replica.pool.get_idle_size(),
+                }
+                for replica in self.replicas
+            ],
+        }
+
+
+db_connection = DatabaseConnection()
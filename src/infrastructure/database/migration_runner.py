@@ -1,104 +1,289 @@
 import asyncio
+import hashlib
+import re
+import time
 import asyncpg
 from pathlib import Path
+from typing import Dict, List, Optional
 from src.infrastructure.config import settings
 
+# Первая строка миграции, которую нужно выполнять вне транзакции (create index concurrently и т.п.)
+NO_TRANSACTION_MARKER = "-- migrate:no-transaction"
+# Команда миграции вне транзакции, помеченная этой строкой, выполняется для каждой секции
+# таблицы, с подстановкой имени секции вместо {partition}
+EACH_PARTITION_MARKER = re.compile(r"^\s*-- migrate:each-partition\s+(\w+)\s*$", re.MULTILINE)
+# Ключ advisory lock: одновременно миграции применяет только один процесс
+MIGRATION_LOCK_KEY = 7_301_894_215
+LOCK_POLL_INTERVAL_SECONDS = 0.5
+
+_DOLLAR_TAG = re.compile(r"\$(?:[A-Za-z_][A-Za-z0-9_]*)?\$")
+
+
+def split_statements(sql: str) -> List[str]:
+    """
+    Разбить SQL на отдельные команды по ';' с учётом строк, $$-блоков и комментариев.
+    Нужно для миграций вне транзакции: несколько команд одним запросом
+    PostgreSQL выполняет в неявной транзакции.
+    """
+    statements = []
+    current = []
+    i = 0
+    length = len(sql)
+    while i < length:
+        char = sql[i]
+        if sql.startswith("--", i):
+            end = sql.find("\n", i)
+            end = length if end == -1 else end
+            current.append(sql[i:end])
+            i = end
+        elif sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            end = length if end == -1 else end + 2
+            current.append(sql[i:end])
+            i = end
+        elif char == "'":
+            end = i + 1
+            while end < length:
+                if sql[end] == "'" and sql.startswith("''", end):
+                    end += 2
+                elif sql[end] == "'":
+                    break
+                else:
+                    end += 1
+            current.append(sql[i:end + 1])
+            i = end + 1
+        elif char == "$" and _DOLLAR_TAG.match(sql, i):
+            tag = _DOLLAR_TAG.match(sql, i).group()
+            end = sql.find(tag, i + len(tag))
+            end = length if end == -1 else end + len(tag)
+            current.append(sql[i:end])
+            i = end
+        elif char == ";":
+            statements.append("".join(current))
+            current = []
+            i += 1
+        else:
+            current.append(char)
+            i += 1
+    statements.append("".join(current))
+    return [s.strip() for s in statements if _has_code(s)]
+
+
+def _has_code(statement: str) -> bool:
+    lines = [line for line in statement.strip().splitlines() if not line.strip().startswith("--")]
+    return bool("".join(lines).strip())
+
+
+class Migration:
+    def __init__(self, path: Path):
+        self.path = path
+        self.version = path.stem
+        self.sql = path.read_text()
+        self.checksum = hashlib.sha256(self.sql.encode()).hexdigest()
+        self.transactional = not self.sql.lstrip().startswith(NO_TRANSACTION_MARKER)
+
 
 class MigrationRunner:
     def __init__(self, migrations_dir: str = "src/infrastructure/database/migrations"):
         self.migrations_dir = Path(migrations_dir)
         self.migrations_dir.mkdir(parents=True, exist_ok=True)
-    
+
+    def _load_migrations(self) -> List[Migration]:
+        return [Migration(path) for path in sorted(self.migrations_dir.glob("*.sql"))]
+
+    async def _connect(self):
+        return await asyncpg.connect(
+            host=settings.database_host,
+            port=settings.database_port,
+            database=settings.database_name,
+            user=settings.database_user,
+            password=settings.database_password,
+        )
+
     async def _ensure_migrations_table(self, conn):
         await conn.execute("""
             create table if not exists schema_migrations (
                 version varchar(255) primary key,
                 applied_at timestamp default current_timestamp
-            )
+            );
+            alter table schema_migrations add column if not exists checksum varchar(64);
+            alter table schema_migrations add column if not exists duration_ms integer;
         """)
-    
-    async def _get_applied_migrations(self, conn):
-        rows = await conn.fetch("select version from schema_migrations order by version")
-        return {row['version'] for row in rows}
-    
-    async def _get_pending_migrations(self, conn):
-        applied = await self._get_applied_migrations(conn)
-        all_migrations = sorted([
-            f.stem for f in self.migrations_dir.glob("*.sql")
-        ])
-        return [m for m in all_migrations if m not in applied]
-    
+
+    async def _get_applied_migrations(self, conn) -> Optional[Dict[str, Optional[str]]]:
+        """
+        Применённые миграции и их контрольные суммы одним запросом;
+        None, если таблицы (или колонки checksum) ещё нет
+        """
+        try:
+            rows = await conn.fetch("select version, checksum from schema_migrations")
+        except (asyncpg.UndefinedTableError, asyncpg.UndefinedColumnError):
+            return None
+        return {row['version']: row['checksum'] for row in rows}
+
+    @staticmethod
+    def _warn_changed(migrations: List[Migration], applied: Dict[str, Optional[str]]):
+        for migration in migrations:
+            checksum = applied.get(migration.version)
+            if checksum is not None and checksum != migration.checksum:
+                print(f"⚠️  Applied migration was modified: {migration.version}")
+
     async def migrate(self):
-        conn = await asyncpg.connect(
-            host=settings.database_host,
-            port=settings.database_port,
-            database=settings.database_name,
-            user=settings.database_user,
-            password=settings.database_password,
-        )
-        
+        migrations = self._load_migrations()
+        conn = await self._connect()
+
         try:
-            await self._ensure_migrations_table(conn)
-            pending = await self._get_pending_migrations(conn)
-            
-            if not pending:
+            # Быстрый путь: база уже в актуальном состоянии - один запрос, без блокировки.
+            # Записи без checksum (применённые до её появления) один раз идут медленным путём
+            applied = await self._get_applied_migrations(conn)
+            if (
+                applied is not None
+                and None not in applied.values()
+                and all(m.version in applied for m in migrations)
+            ):
+                self._warn_changed(migrations, applied)
                 print("No pending migrations")
                 return
-            
-            for migration_name in pending:
-                print(f"Applying migration: {migration_name}")
-                
-                migration_file = self.migrations_dir / f"{migration_name}.sql"
-                sql = migration_file.read_text()
-                
-                async with conn.transaction():
-                    await conn.execute(sql)
-                    await conn.execute(
-                        "insert into schema_migrations (version) values ($1)",
-                        migration_name
-                    )
-                
-                print(f"✅ Applied: {migration_name}")
-            
-            print(f"\n✅ Successfully applied {len(pending)} migration(s)")
-        
+
+            # Реплики стартуют одновременно: миграции применяет тот, кто взял блокировку,
+            # остальные ждут и после этого видят, что применять нечего
+            await self._lock(conn)
+            try:
+                await self._ensure_migrations_table(conn)
+                await self._backfill_checksums(conn, migrations)
+                applied = await self._get_applied_migrations(conn)
+                self._warn_changed(migrations, applied)
+                pending = [m for m in migrations if m.version not in applied]
+
+                if not pending:
+                    print("No pending migrations")
+                    return
+
+                for migration in pending:
+                    await self._apply(conn, migration)
+
+                print(f"\n✅ Successfully applied {len(pending)} migration(s)")
+            finally:
+                await conn.execute("select pg_advisory_unlock($1)", MIGRATION_LOCK_KEY)
+
         except Exception as e:
             print(f"❌ Migration failed: {e}")
             raise
         finally:
             await conn.close()
-    
-    async def status(self):
-        conn = await asyncpg.connect(
-            host=settings.database_host,
-            port=settings.database_port,
-            database=settings.database_name,
-            user=settings.database_user,
-            password=settings.database_password,
+
+    @staticmethod
+    async def _lock(conn):
+        """
+        Взять advisory lock, опрашивая его, а не ожидая внутри pg_advisory_lock:
+        ожидающий запрос держит снимок, и create index concurrently у владельца
+        блокировки ждал бы его завершения - взаимная блокировка
+        """
+        waiting = False
+        while not await conn.fetchval("select pg_try_advisory_lock($1)", MIGRATION_LOCK_KEY):
+            if not waiting:
+                print("Waiting for another migration run to finish...")
+                waiting = True
+            await asyncio.sleep(LOCK_POLL_INTERVAL_SECONDS)
+
+    async def _apply(self, conn, migration: Migration):
+        mode = "" if migration.transactional else " (no transaction)"
+        print(f"Applying migration: {migration.version}{mode}")
+        started = time.perf_counter()
+
+        if migration.transactional:
+            async with conn.transaction():
+                await conn.execute(migration.sql)
+                await self._record(conn, migration, started)
+        else:
+            # Команды выполняются по одной; при сбое миграция не записывается и будет
+            # запущена заново целиком, поэтому команды в ней должны быть идемпотентными
+            for statement in split_statements(migration.sql):
+                for expanded in await self._expand_partitions(conn, statement):
+                    await conn.execute(expanded)
+            await self._record(conn, migration, started)
+
+        print(f"✅ Applied: {migration.version} ({(time.perf_counter() - started) * 1000:.0f} ms)")
+
+    @staticmethod
+    async def _expand_partitions(conn, statement: str) -> List[str]:
+        """
+        Команда с пометкой -- migrate:each-partition <таблица> - по копии на каждую секцию таблицы
+        (create index concurrently не работает на секционированной таблице целиком)
+        """
+        match = EACH_PARTITION_MARKER.search(statement)
+        if not match:
+            return [statement]
+        partitions = await conn.fetch(
+            """
+            select c.relname
+            from pg_inherits i
+            join pg_class c on c.oid = i.inhrelid
+            where i.inhparent = $1::regclass
+            order by c.relname
+            """,
+            match[1],
         )
-        
+        return [statement.replace("{partition}", row['relname']) for row in partitions]
+
+    @staticmethod
+    async def _record(conn, migration: Migration, started: float):
+        await conn.execute(
+            "insert into schema_migrations (version, checksum, duration_ms) values ($1, $2, $3)",
+            migration.version,
+            migration.checksum,
+            int((time.perf_counter() - started) * 1000),
+        )
+
+    @staticmethod
+    async def _backfill_checksums(conn, migrations: List[Migration]):
+        """
+        Миграциям, применённым до появления колонки checksum, записать суммы текущих файлов
+        """
+        await conn.execute(
+            """
+            update schema_migrations s
+            set checksum = f.checksum
+            from unnest($1::varchar[], $2::varchar[]) as f(version, checksum)
+            where s.version = f.version and s.checksum is null
+            """,
+            [m.version for m in migrations],
+            [m.checksum for m in migrations],
+        )
+
+    async def status(self):
+        conn = await self._connect()
+
         try:
-            await self._ensure_migrations_table(conn)
-            applied = await self._get_applied_migrations(conn)
-            all_migrations = sorted([
-                f.stem for f in self.migrations_dir.glob("*.sql")
-            ])
-            
-            if not all_migrations:
+            migrations = self._load_migrations()
+            if not migrations:
                 print("\n⚠️  No migration files found")
                 print(f"Create SQL files in: {self.migrations_dir}")
                 return
-            
+
+            try:
+                rows = await conn.fetch("select version, checksum, duration_ms from schema_migrations")
+            except (asyncpg.UndefinedTableError, asyncpg.UndefinedColumnError):
+                rows = []
+            applied = {row['version']: row for row in rows}
+
             print("\nMigration Status:")
             print("-" * 70)
-            for migration in all_migrations:
-                status = "✅ Applied" if migration in applied else "⏳ Pending"
-                print(f"{migration:<55} {status}")
+            for migration in migrations:
+                row = applied.get(migration.version)
+                if row is None:
+                    status = "⏳ Pending"
+                elif row['checksum'] and row['checksum'] != migration.checksum:
+                    status = "⚠️  Modified"
+                else:
+                    duration = f" {row['duration_ms']} ms" if row['duration_ms'] is not None else ""
+                    status = f"✅ Applied{duration}"
+                print(f"{migration.version:<55} {status}")
             print("-" * 70)
-            
-            pending_count = len([m for m in all_migrations if m not in applied])
-            print(f"\nTotal: {len(all_migrations)} | Applied: {len(applied)} | Pending: {pending_count}")
-        
+
+            pending_count = len([m for m in migrations if m.version not in applied])
+            print(f"\nTotal: {len(migrations)} | Applied: {len(applied)} | Pending: {pending_count}")
+
         finally:
             await conn.close()
 
@@ -106,7 +291,7 @@ class MigrationRunner:
 async def main():
     import sys
     runner = MigrationRunner()
-    
+
     if len(sys.argv) > 1 and sys.argv[1] == "status":
         await runner.status()
     else:
@@ -115,4 +300,3 @@ async def main():
 
 if __name__ == "__main__":
     asyncio.run(main())
-
@@ -0,0 +1,13 @@
+create table if not exists comments (
+    id uuid primary key,
+    entity_type varchar(255) not null,
+    entity_id varchar(255) not null,
+    author_id varchar(255) not null,
+    text text not null,
+    created_at timestamp not null default current_timestamp,
+    updated_at timestamp not null default current_timestamp
+);
+
+-- Покрывает выборку страницы комментариев сущности в обоих направлениях сортировки
+create index if not exists idx_comments_entity_created
+    on comments(entity_type, entity_id, created_at, id);
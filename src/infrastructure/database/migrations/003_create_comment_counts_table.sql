@@ -0,0 +1,13 @@
+-- Счётчики комментариев по сущностям, поддерживаются репозиторием в той же транзакции, что и запись комментария
+create table if not exists comment_counts (
+    entity_type varchar(255) not null,
+    entity_id varchar(255) not null,
+    count bigint not null default 0,
+    primary key (entity_type, entity_id)
+);
+
+insert into comment_counts (entity_type, entity_id, count)
+select entity_type, entity_id, count(*)
+from comments
+group by entity_type, entity_id
+on conflict (entity_type, entity_id) do update set count = excluded.count;
@@ -0,0 +1,3 @@
+-- Выгрузка комментариев по типу сущности с фильтром по updated_at
+create index if not exists idx_comments_type_updated
+    on comments(entity_type, updated_at, id);
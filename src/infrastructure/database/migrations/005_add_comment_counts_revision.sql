@@ -0,0 +1,10 @@
+-- Валидатор для условных GET: меняется при любом изменении комментариев сущности
+alter table comment_counts add column if not exists revision bigint not null default 0;
+alter table comment_counts add column if not exists last_modified_at timestamptz not null default now();
+
+update comment_counts c
+set last_modified_at = coalesce(
+    (select max(updated_at) from comments
+     where entity_type = c.entity_type and entity_id = c.entity_id)::timestamptz,
+    c.last_modified_at
+);
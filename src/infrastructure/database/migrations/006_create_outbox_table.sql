@@ -0,0 +1,9 @@
+-- Transactional outbox: события пишутся в одной транзакции с изменением данных,
+-- а в Kafka их доставляет отдельный relay
+create table if not exists outbox (
+    id bigserial primary key,
+    topic varchar(255) not null,
+    key varchar(255) not null,
+    payload jsonb not null,
+    created_at timestamptz not null default now()
+);
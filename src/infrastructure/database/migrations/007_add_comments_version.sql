@@ -0,0 +1,2 @@
+-- Версия комментария для оптимистичной блокировки при редактировании
+alter table comments add column if not exists version integer not null default 1;
@@ -0,0 +1,11 @@
+-- Ключи идемпотентности POST /comments/: повтор запроса с тем же ключом возвращает уже созданный комментарий
+create table if not exists comment_idempotency_keys (
+    key varchar(255) primary key,
+    comment_id uuid not null,
+    request_hash varchar(64) not null,
+    created_at timestamptz not null default now()
+);
+
+-- Для удаления ключей старше TTL
+create index if not exists idx_comment_idempotency_keys_created
+    on comment_idempotency_keys(created_at);
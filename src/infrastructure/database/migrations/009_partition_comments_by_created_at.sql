@@ -0,0 +1,47 @@
+-- comments становится секционированной по created_at таблицей: по секции на месяц.
+-- Новые секции заранее создаёт python -m src.infrastructure.database.partition_maintenance,
+-- строки вне созданных секций попадают в comments_default.
+-- Первичный ключ секционированной таблицы обязан включать ключ секционирования.
+alter table comments rename to comments_unpartitioned;
+
+create table comments (
+    id uuid not null,
+    entity_type varchar(255) not null,
+    entity_id varchar(255) not null,
+    author_id varchar(255) not null,
+    text text not null,
+    created_at timestamp not null default current_timestamp,
+    updated_at timestamp not null default current_timestamp,
+    version integer not null default 1,
+    primary key (id, created_at)
+) partition by range (created_at);
+
+create table comments_default partition of comments default;
+
+do $$
+declare
+    month date := date_trunc('month', coalesce(
+        (select min(created_at) from comments_unpartitioned), current_timestamp
+    ));
+    last_month date := date_trunc('month', current_timestamp) + interval '3 months';
+begin
+    while month <= last_month loop
+        execute format(
+            'create table if not exists %I partition of comments for values from (%L) to (%L)',
+            'comments_p' || to_char(month, 'YYYYMM'), month, month + interval '1 month'
+        );
+        month := month + interval '1 month';
+    end loop;
+end $$;
+
+insert into comments (id, entity_type, entity_id, author_id, text, created_at, updated_at, version)
+select id, entity_type, entity_id, author_id, text, created_at, updated_at, version
+from comments_unpartitioned;
+
+drop table comments_unpartitioned;
+
+-- Индексы создаются на родительской таблице и наследуются всеми секциями
+create index if not exists idx_comments_entity_created
+    on comments(entity_type, entity_id, created_at, id);
+create index if not exists idx_comments_type_updated
+    on comments(entity_type, updated_at, id);
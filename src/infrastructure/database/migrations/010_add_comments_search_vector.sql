@@ -0,0 +1,10 @@
+-- Полнотекстовый поиск по тексту комментариев (GET /comments/search).
+-- Конфигурация russian: русские слова приводятся к основе русским стеммером,
+-- латиница - английским. Колонка вычисляется самой БД при вставке и изменении text.
+-- Добавление stored-колонки перезаписывает все секции под эксклюзивной блокировкой.
+alter table comments
+    add column if not exists search_vector tsvector
+    generated always as (to_tsvector('russian', text)) stored;
+
+-- Индекс на родительской таблице создаётся на каждой секции, в том числе будущих
+create index if not exists idx_comments_search_vector on comments using gin (search_vector);
@@ -0,0 +1,19 @@
+-- Ответы на комментарии. path - материализованный путь от корня ветки:
+-- id всех предков и самого комментария без дефисов, по 32 символа на уровень.
+-- С collate "C" сортировка по path - обход дерева в глубину, а поддерево
+-- комментария - диапазон path от его пути до пути || 'g'.
+alter table comments add column if not exists parent_id uuid;
+alter table comments add column if not exists path varchar(1024) collate "C";
+
+update comments set path = replace(id::text, '-', '') where path is null;
+alter table comments alter column path set not null;
+
+-- Поддерево и ветки сущности по порядку обхода
+create index if not exists idx_comments_entity_path
+    on comments(entity_type, entity_id, path);
+-- Первые ответы на комментарий
+create index if not exists idx_comments_parent_created
+    on comments(parent_id, created_at, id) where parent_id is not null;
+-- Страница корневых комментариев сущности
+create index if not exists idx_comments_entity_roots
+    on comments(entity_type, entity_id, created_at, id) where parent_id is null;
@@ -0,0 +1,109 @@
+-- migrate:no-transaction
+-- Мягкое удаление: строка остаётся с deleted_at, пока её не удалит фоновая очистка
+-- (CommentPurger). Индексы путей чтения заменяются частичными - удалённые строки
+-- в них не попадают, и чтение не замедляется, пока они ждут очистки.
+--
+-- Миграция не блокирует запись: каждый индекс строится как idx_..._live
+-- по рецепту для секционированной таблицы (docs/MIGRATIONS.md) - concurrently на каждой
+-- секции, пустой индекс on only comments и attach секций. Старые индексы удаляются
+-- только после того, как новые готовы, и новые получают их имена.
+-- При повторном запуске после сбоя недостроенные индексы удаляются и строятся заново.
+alter table comments add column if not exists deleted_at timestamp;
+
+-- Страница комментариев сущности
+drop index if exists idx_comments_entity_created_live;
+-- migrate:each-partition comments
+drop index concurrently if exists {partition}_entity_created_live;
+-- migrate:each-partition comments
+create index concurrently {partition}_entity_created_live on {partition} (entity_type, entity_id, created_at, id) where deleted_at is null;
+create index idx_comments_entity_created_live on only comments (entity_type, entity_id, created_at, id) where deleted_at is null;
+-- migrate:each-partition comments
+alter index idx_comments_entity_created_live attach partition {partition}_entity_created_live;
+
+-- Выгрузка по типу сущности
+drop index if exists idx_comments_type_updated_live;
+-- migrate:each-partition comments
+drop index concurrently if exists {partition}_type_updated_live;
+-- migrate:each-partition comments
+create index concurrently {partition}_type_updated_live on {partition} (entity_type, updated_at, id) where deleted_at is null;
+create index idx_comments_type_updated_live on only comments (entity_type, updated_at, id) where deleted_at is null;
+-- migrate:each-partition comments
+alter index idx_comments_type_updated_live attach partition {partition}_type_updated_live;
+
+-- Полнотекстовый поиск
+drop index if exists idx_comments_search_vector_live;
+-- migrate:each-partition comments
+drop index concurrently if exists {partition}_search_vector_live;
+-- migrate:each-partition comments
+create index concurrently {partition}_search_vector_live on {partition} using gin (search_vector) where deleted_at is null;
+create index idx_comments_search_vector_live on only comments using gin (search_vector) where deleted_at is null;
+-- migrate:each-partition comments
+alter index idx_comments_search_vector_live attach partition {partition}_search_vector_live;
+
+-- Поддерево и ветки сущности по порядку обхода
+drop index if exists idx_comments_entity_path_live;
+-- migrate:each-partition comments
+drop index concurrently if exists {partition}_entity_path_live;
+-- migrate:each-partition comments
+create index concurrently {partition}_entity_path_live on {partition} (entity_type, entity_id, path) where deleted_at is null;
+create index idx_comments_entity_path_live on only comments (entity_type, entity_id, path) where deleted_at is null;
+-- migrate:each-partition comments
+alter index idx_comments_entity_path_live attach partition {partition}_entity_path_live;
+
+-- Первые ответы на комментарий
+drop index if exists idx_comments_parent_created_live;
+-- migrate:each-partition comments
+drop index concurrently if exists {partition}_parent_created_live;
+-- migrate:each-partition comments
+create index concurrently {partition}_parent_created_live on {partition} (parent_id, created_at, id) where parent_id is not null and deleted_at is null;
+create index idx_comments_parent_created_live on only comments (parent_id, created_at, id) where parent_id is not null and deleted_at is null;
+-- migrate:each-partition comments
+alter index idx_comments_parent_created_live attach partition {partition}_parent_created_live;
+
+-- Страница корневых комментариев сущности
+drop index if exists idx_comments_entity_roots_live;
+-- migrate:each-partition comments
+drop index concurrently if exists {partition}_entity_roots_live;
+-- migrate:each-partition comments
+create index concurrently {partition}_entity_roots_live on {partition} (entity_type, entity_id, created_at, id) where parent_id is null and deleted_at is null;
+create index idx_comments_entity_roots_live on only comments (entity_type, entity_id, created_at, id) where parent_id is null and deleted_at is null;
+-- migrate:each-partition comments
+alter index idx_comments_entity_roots_live attach partition {partition}_entity_roots_live;
+
+-- Новые индексы готовы: старые полные удаляются (удаление индекса - короткая блокировка,
+-- без чтения таблицы), новые занимают их имена. Секции переименовываются до родителя:
+-- пока у родителя имя ..._live, повторный запуск удалит их вместе с ним
+drop index if exists idx_comments_entity_created;
+-- migrate:each-partition comments
+alter index {partition}_entity_created_live rename to {partition}_entity_created;
+alter index idx_comments_entity_created_live rename to idx_comments_entity_created;
+drop index if exists idx_comments_type_updated;
+-- migrate:each-partition comments
+alter index {partition}_type_updated_live rename to {partition}_type_updated;
+alter index idx_comments_type_updated_live rename to idx_comments_type_updated;
+drop index if exists idx_comments_search_vector;
+-- migrate:each-partition comments
+alter index {partition}_search_vector_live rename to {partition}_search_vector;
+alter index idx_comments_search_vector_live rename to idx_comments_search_vector;
+drop index if exists idx_comments_entity_path;
+-- migrate:each-partition comments
+alter index {partition}_entity_path_live rename to {partition}_entity_path;
+alter index idx_comments_entity_path_live rename to idx_comments_entity_path;
+drop index if exists idx_comments_parent_created;
+-- migrate:each-partition comments
+alter index {partition}_parent_created_live rename to {partition}_parent_created;
+alter index idx_comments_parent_created_live rename to idx_comments_parent_created;
+drop index if exists idx_comments_entity_roots;
+-- migrate:each-partition comments
+alter index {partition}_entity_roots_live rename to {partition}_entity_roots;
+alter index idx_comments_entity_roots_live rename to idx_comments_entity_roots;
+
+-- Очередь очистки: только удалённые строки
+drop index if exists idx_comments_deleted_at;
+-- migrate:each-partition comments
+drop index concurrently if exists {partition}_deleted_at;
+-- migrate:each-partition comments
+create index concurrently {partition}_deleted_at on {partition} (deleted_at) where deleted_at is not null;
+create index idx_comments_deleted_at on only comments (deleted_at) where deleted_at is not null;
+-- migrate:each-partition comments
+alter index idx_comments_deleted_at attach partition {partition}_deleted_at;
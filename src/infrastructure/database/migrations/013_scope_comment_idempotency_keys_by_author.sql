@@ -0,0 +1,14 @@
+-- Ключ идемпотентности принадлежит автору: одинаковые ключи разных клиентов не конфликтуют
+alter table comment_idempotency_keys add column if not exists author_id varchar(255);
+
+update comment_idempotency_keys k
+set author_id = c.author_id
+from comments c
+where c.id = k.comment_id and k.author_id is null;
+
+-- Ключи, чьих комментариев уже нет, считаются истёкшими
+delete from comment_idempotency_keys where author_id is null;
+
+alter table comment_idempotency_keys alter column author_id set not null;
+alter table comment_idempotency_keys drop constraint if exists comment_idempotency_keys_pkey;
+alter table comment_idempotency_keys add primary key (author_id, key);
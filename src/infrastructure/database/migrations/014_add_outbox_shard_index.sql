@@ -0,0 +1,6 @@
+-- migrate:no-transaction
+-- Outbox делится на секции по хэшу ключа события: каждую секцию в один момент отправляет
+-- один relay, так события одного ключа уходят по порядку, а разные relay работают параллельно.
+-- Выражение должно совпадать с _SHARD в postgres_outbox_repository.py, иначе индекс не используется
+drop index concurrently if exists idx_outbox_shard;
+create index concurrently idx_outbox_shard on outbox (((hashtext(key) & 2147483647) % 16), id);
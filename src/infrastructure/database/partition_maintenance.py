@@ -0,0 +1,211 @@
+import argparse
+import asyncio
+import re
+from datetime import date
+from typing import List, Optional, Tuple
+
+import asyncpg
+
+from src.infrastructure.config import settings
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+class CommentPartitionMaintenance:
+    """
+    Обслуживание месячных секций таблицы comments:
+    заранее создаёт секции на months_ahead месяцев вперёд и отсоединяет секции
+    старше retention_months месяцев (0 - хранить всё). Отсоединённая секция
+    переносится в схему archive_schema или удаляется, если схема не задана.
+    Запускается по расписанию: python -m src.infrastructure.database.partition_maintenance
+    """
+
+    def __init__(
+            self,
+            months_ahead: int = 3,
+            retention_months: int = 0,
+            archive_schema: Optional[str] = "archive",
+            table: str = "comments",
+    ):
+        self.months_ahead = months_ahead
+        self.retention_months = retention_months
+        self.archive_schema = archive_schema
+        self.table = table
+        self._name_pattern = re.compile(rf"^{re.escape(table)}_p(\d{{4}})(\d{{2}})$")
+
+    def partition_name(self, month: date) -> str:
+        return f"{self.table}_p{month:%Y%m}"
+
+    async def partitions(self, conn) -> List[Tuple[str, date]]:
+        """
+        Месячные секции таблицы по возрастанию: (имя, первый день месяца)
+        """
+        rows = await conn.fetch(
+            """
+            select c.relname
+            from pg_inherits i
+            join pg_class c on c.oid = i.inhrelid
+            join pg_class p on p.oid = i.inhparent
+            where p.relname = $1
+            """,
+            self.table,
+        )
+        result = []
+        for row in rows:
+            match = self._name_pattern.match(row['relname'])
+            if match:
+                result.append((row['relname'], date(int(match[1]), int(match[2]), 1)))
+        return sorted(result, key=lambda item: item[1])
+
+    async def ensure_partitions(self, conn, today: date) -> List[str]:
+        """
+        Создать недостающие секции с текущего месяца на months_ahead вперёд.
+        Строки, уже попавшие в секцию по умолчанию, переносятся в новую секцию.
+        """
+        existing = {name for name, _ in await self.partitions(conn)}
+        current = today.replace(day=1)
+        created = []
+        for offset in range(self.months_ahead + 1):
+            month = _add_months(current, offset)
+            name = self.partition_name(month)
+            if name in existing:
+                continue
+            await self._create_partition(conn, name, month, _add_months(month, 1))
+            created.append(name)
+        return created
+
+    async def detach_expired(self, conn, today: date) -> List[str]:
+        """
+        Отсоединить секции, целиком лежащие раньше чем retention_months месяцев до текущего.
+        Счётчики comment_counts уменьшаются на число уходящих неудалённых комментариев.
+        """
+        if self.retention_months <= 0:
+            return []
+        cutoff = _add_months(today.replace(day=1), -self.retention_months)
+        detached = []
+        for name, month in await self.partitions(conn):
+            if _add_months(month, 1) > cutoff:
+                break
+            async with conn.transaction():
+                await conn.execute(f"alter table {self.table} detach partition {name}")
+                await conn.execute(
+                    f"""
+                    update comment_counts c
+                    set count = greatest(c.count - d.removed, 0),
+                        revision = c.revision + 1,
+                        last_modified_at = now()
+                    from (
+                        select entity_type, entity_id, count(*) as removed
+                        from {name}
+                        where deleted_at is null
+                        group by entity_type, entity_id
+                    ) d
+                    where c.entity_type = d.entity_type and c.entity_id = d.entity_id
+                    """
+                )
+                if self.archive_schema:
+                    await conn.execute(f"create schema if not exists {self.archive_schema}")
+                    await conn.execute(f"alter table {name} set schema {self.archive_schema}")
+                else:
+                    await conn.execute(f"drop table {name}")
+            detached.append(name)
+        return detached
+
+    async def run(self, conn, today: Optional[date] = None) -> None:
+        today = today or date.today()
+        for name in await self.ensure_partitions(conn, today):
+            print(f"✅ Created partition: {name}")
+        for name in await self.detach_expired(conn, today):
+            target = f"{self.archive_schema}.{name}" if self.archive_schema else "dropped"
+            print(f"📦 Detached partition: {name} -> {target}")
+
+    async def status(self, conn) -> None:
+        print("\nComment partitions:")
+        print("-" * 70)
+        for name, _ in await self.partitions(conn):
+            rows = await conn.fetchval(
+                "select reltuples::bigint from pg_class where relname = $1", name
+            )
+            print(f"{name:<40} ~{max(rows, 0)} rows")
+        default_rows = await conn.fetchval(f"select count(*) from {self.table}_default")
+        print("-" * 70)
+        print(f"{self.table}_default: {default_rows} rows (должно быть 0)")
+
+    async def _create_partition(self, conn, name: str, start: date, end: date) -> None:
+        async with conn.transaction():
+            # Секция по умолчанию блокируется до конца транзакции: новые строки диапазона
+            # не появятся в ней между переносом и подключением секции
+            await conn.execute(f"lock table {self.table}_default in access exclusive mode")
+            in_default = await conn.fetchval(
+                f"select exists (select 1 from {self.table}_default where created_at >= $1 and created_at < $2)",
+                start,
+                end,
+            )
+            if not in_default:
+                await conn.execute(
+                    f"create table {name} partition of {self.table} for values from ('{start}') to ('{end}')"
+                )
+                return
+            await conn.execute(
+                f"create table {name} (like {self.table} including defaults including constraints including generated)"
+            )
+            # Генерируемые колонки (search_vector) вычисляются заново - переносить их нельзя
+            columns = await conn.fetchval(
+                """
+                select string_agg(quote_ident(attname), ', ' order by attnum)
+                from pg_attribute
+                where attrelid = $1::regclass and attnum > 0 and not attisdropped and attgenerated = ''
+                """,
+                self.table,
+            )
+            await conn.execute(
+                f"""
+                with moved as (
+                    delete from {self.table}_default
+                    where created_at >= $1 and created_at < $2
+                    returning {columns}
+                )
+                insert into {name} ({columns}) select {columns} from moved
+                """,
+                start,
+                end,
+            )
+            await conn.execute(
+                f"alter table {self.table} attach partition {name} for values from ('{start}') to ('{end}')"
+            )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Maintain monthly partitions of the comments table")
+    parser.add_argument("command", nargs="?", choices=["run", "status"], default="run")
+    parser.add_argument("--months-ahead", type=int, default=settings.comment_partition_months_ahead)
+    parser.add_argument("--retention-months", type=int, default=settings.comment_partition_retention_months)
+    parser.add_argument("--archive-schema", default=settings.comment_partition_archive_schema)
+    args = parser.parse_args()
+
+    maintenance = CommentPartitionMaintenance(
+        months_ahead=args.months_ahead,
+        retention_months=args.retention_months,
+        archive_schema=args.archive_schema or None,
+    )
+    conn = await asyncpg.connect(
+        host=settings.database_host,
+        port=settings.database_port,
+        database=settings.database_name,
+        user=settings.database_user,
+        password=settings.database_password,
+    )
+    try:
+        if args.command == "status":
+            await maintenance.status(conn)
+        else:
+            await maintenance.run(conn)
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
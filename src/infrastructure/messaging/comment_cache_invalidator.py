@@ -0,0 +1,58 @@
+import json
+import logging
+import os
+import socket
+import threading
+from typing import Optional
+from uuid import uuid4
+
+from confluent_kafka import Consumer
+
+from src.infrastructure.cache.comment_page_cache import CommentPageCache
+
+logger = logging.getLogger(__name__)
+
+
+class CommentCacheInvalidator:
+    """
+    Читает comment.changed в фоновом потоке и сбрасывает страницы затронутых сущностей
+    в локальном кэше. У каждого экземпляра приложения своя consumer group,
+    поэтому события получает каждая реплика, а не одна из них.
+    """
+
+    def __init__(self, bootstrap_servers: str, cache: CommentPageCache, topic: str = "comment.changed"):
+        self._cache = cache
+        self._topic = topic
+        self._consumer = Consumer({
+            "bootstrap.servers": bootstrap_servers,
+            "group.id": f"comment-cache-{socket.gethostname()}-{os.getpid()}-{uuid4().hex[:8]}",
+            "auto.offset.reset": "latest",
+            "enable.auto.commit": False,
+        })
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._consumer.subscribe([self._topic])
+        self._thread = threading.Thread(target=self._run, name="comment-cache-invalidator", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self._consumer.close()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            msg = self._consumer.poll(1.0)
+            if msg is None:
+                continue
+            if msg.error():
+                logger.warning("Kafka error in cache invalidator: %s", msg.error())
+                continue
+            try:
+                comment = json.loads(msg.value())["comment"]
+                self._cache.invalidate(comment["entity_type"], comment["entity_id"])
+            except (ValueError, KeyError, TypeError) as e:
+                logger.warning("Skipping malformed comment.changed event: %r", e)
@@ -1,36 +1,135 @@
+import asyncio
 import json
-from confluent_kafka import Producer
+import threading
+from typing import List, Optional, Tuple
+
+from confluent_kafka import KafkaException, Producer
+
+from src.infrastructure.config import settings
 
 
 class KafkaEventProducer:
-    def __init__(self, bootstrap_servers: str):
-        self._producer = Producer({"bootstrap.servers": bootstrap_servers})
+    def __init__(
+            self,
+            bootstrap_servers: str,
+            linger_ms: int = 5,
+            batch_size: int = 64 * 1024,
+            compression_type: str = "lz4",
+            delivery_timeout_ms: int = 30_000,
+    ):
+        self._producer = Producer({
+            "bootstrap.servers": bootstrap_servers,
+            # Сообщения копятся до linger.ms / batch.size и уходят общими produce-запросами
+            "linger.ms": linger_ms,
+            "batch.size": batch_size,
+            "compression.type": compression_type,
+            # Повторные отправки не дублируют и не переставляют сообщения одной партиции
+            "enable.idempotence": True,
+            # Сообщение, не подтверждённое брокером за это время (с учётом ретраев),
+            # завершается ошибкой доставки, а не висит в очереди бесконечно
+            "message.timeout.ms": delivery_timeout_ms,
+        })
+        # Запас сверх таймаута librdkafka: колбэк с ошибкой должен успеть прийти раньше
+        self._delivery_timeout = delivery_timeout_ms / 1000 + 5
+        self._poll_thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def publish_async(self, topic: str, key: str, event: dict) -> asyncio.Future:
+        """
+        Поставить событие в очередь librdkafka без flush.
+        Возвращает future, которая завершится, когда брокер подтвердит доставку
+        (или с KafkaException при ошибке). Колбэки доставки обслуживает отдельный
+        poll-поток, так что event loop не блокируется. Вызывать из потока event loop.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        payload = self._encode(event)
+        if payload is None:
+            future.set_exception(ValueError("Event is not JSON serializable"))
+            return future
+
+        def on_delivery(err, msg):
+            loop.call_soon_threadsafe(self._resolve, future, err, msg)
+
+        self._ensure_poll_thread()
+        try:
+            self._producer.produce(topic=topic, key=key.encode("utf-8"), value=payload, on_delivery=on_delivery)
+        except BufferError as e:
+            # Очередь переполнена - сообщаем вызывающему, не блокируя event loop ожиданием
+            future.set_exception(e)
+        except Exception as e:
+            print("[KAFKA][ERROR] produce failed:", repr(e))
+            future.set_exception(e)
+        return future
+
+    async def publish_many_async(self, topic: str, messages: List[Tuple[str, dict]]) -> bool:
+        """
+        Отправить пачку событий: все сообщения уходят в очередь сразу,
+        результат ждёт подтверждений без flush. True - если доставлены все.
+        Ожидание ограничено таймаутом доставки: не дождавшиеся подтверждения считаются недоставленными
+        """
+        futures = [self.publish_async(topic, key, event) for key, event in messages]
+        try:
+            results = await asyncio.wait_for(
+                asyncio.gather(*futures, return_exceptions=True),
+                timeout=self._delivery_timeout,
+            )
+        except asyncio.TimeoutError:
+            print(f"[KAFKA][ERROR] delivery of {len(futures)} message(s) timed out")
+            return False
+        errors = [r for r in results if isinstance(r, BaseException)]
+        for error in errors:
+            print("[KAFKA][ERROR] delivery failed:", repr(error))
+        return not errors
 
-    def publish(self, topic: str, key: str, event: dict) -> None:
+    def close(self, timeout: float = 10) -> None:
+        """
+        Остановить poll-поток и дождаться доставки того, что ещё в очереди
+        """
+        self._stopped.set()
+        if self._poll_thread:
+            self._poll_thread.join(timeout=timeout)
+            self._poll_thread = None
+        remaining = self._producer.flush(timeout)
+        if remaining:
+            print(f"[KAFKA][ERROR] {remaining} message(s) not delivered on shutdown")
+
+    def _ensure_poll_thread(self) -> None:
+        if self._poll_thread is None:
+            self._stopped.clear()
+            self._poll_thread = threading.Thread(target=self._poll_loop, name="kafka-producer-poll", daemon=True)
+            self._poll_thread.start()
+
+    def _poll_loop(self) -> None:
+        while not self._stopped.is_set():
+            self._producer.poll(0.1)
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, err, msg) -> None:
+        if future.done():
+            return
+        if err is not None:
+            future.set_exception(KafkaException(err))
+        else:
+            future.set_result(msg.offset())
+
+    @staticmethod
+    def _encode(event: dict) -> Optional[bytes]:
         try:
             payload_str = json.dumps(event, ensure_ascii=False)
         except Exception as e:
             print("[KAFKA][ERROR] json.dumps failed:", repr(e))
             print("[KAFKA][ERROR] event type:", type(event))
             print("[KAFKA][ERROR] event value:", event)
-            return
-
-        payload = payload_str.encode("utf-8")
+            return None
+        return payload_str.encode("utf-8")
 
-        def delivery_report(err, msg):
-            if err is not None:
-                print("[KAFKA][ERROR] delivery failed:", err)
-            else:
-                print(f"[KAFKA][OK] delivered to {msg.topic()} [{msg.partition()}] @ offset {msg.offset()}")
 
-        try:
-            print(f"[KAFKA] producing topic={topic} key={key} bytes={len(payload)}")
-            self._producer.produce(
-                topic=topic,
-                key=key.encode("utf-8"),
-                value=payload,
-                callback=delivery_report,
-            )
-            self._producer.flush(10)
-        except Exception as e:
-            print("[KAFKA][ERROR] produce/flush failed:", repr(e))
+def create_event_producer() -> KafkaEventProducer:
+    return KafkaEventProducer(
+        settings.kafka_bootstrap_servers,
+        linger_ms=settings.kafka_linger_ms,
+        batch_size=settings.kafka_batch_size,
+        compression_type=settings.kafka_compression_type,
+        delivery_timeout_ms=settings.kafka_delivery_timeout_ms,
+    )
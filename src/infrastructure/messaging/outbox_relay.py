@@ -0,0 +1,64 @@
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime
+
+from src.infrastructure.messaging.kafka_producer import KafkaEventProducer
+from src.infrastructure.repositories.postgres_outbox_repository import PostgresOutboxRepository
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxRelay:
+    """
+    Переносит события из таблицы outbox в Kafka пачками.
+    Relay можно запускать в каждом процессе или реплике: outbox поделён на секции по ключу
+    события, и каждую секцию в один момент отправляет один relay (см. PostgresOutboxRepository.claim).
+    Доставка at-least-once - при сбое после отправки пачка будет отправлена повторно.
+    published_at события проставляется в момент отправки, occurred_at - время самого изменения.
+    """
+
+    def __init__(
+            self,
+            outbox: PostgresOutboxRepository,
+            producer: KafkaEventProducer,
+            batch_size: int = 500,
+            poll_interval: float = 0.2,
+    ):
+        self.outbox = outbox
+        self.producer = producer
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+
+    async def relay_once(self) -> int:
+        """
+        Отправить одну пачку - события одной секции outbox. Возвращает число отправленных событий
+        """
+        async with self.outbox.claim(self.batch_size) as batch:
+            if not batch.messages:
+                return 0
+            published_at = datetime.utcnow().isoformat()
+            by_topic = defaultdict(list)
+            for message in batch.messages:
+                by_topic[message.topic].append((message.key, {**message.payload, "published_at": published_at}))
+            delivered = True
+            for topic, messages in by_topic.items():
+                delivered &= await self.producer.publish_many_async(topic, messages)
+            if not delivered:
+                logger.warning("Outbox batch of %d events was not fully delivered, will retry", len(batch.messages))
+                return 0
+            batch.mark_sent()
+            return len(batch.messages)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                sent = await self.relay_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Outbox relay iteration failed")
+                sent = 0
+            # Пачка берётся из одной секции - пока что-то отправляется, в других может быть ещё
+            if not sent:
+                await asyncio.sleep(self.poll_interval)
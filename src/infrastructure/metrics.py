@@ -0,0 +1,25 @@
+from bisect import bisect_left
+from typing import Dict, Sequence
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными верхними границами корзин для /metrics.
+    Не потокобезопасна - наблюдения приходят из цикла событий.
+    """
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = sorted(bounds)
+        self._counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> Dict[str, float]:
+        buckets = {f"le_{bound:g}": count for bound, count in zip(self.bounds, self._counts)}
+        buckets["le_inf"] = self._counts[-1]
+        return buckets
@@ -0,0 +1,53 @@
+import asyncio
+import logging
+
+from src.infrastructure.repositories.postgres_comment_repository import PostgresCommentRepository
+
+logger = logging.getLogger(__name__)
+
+
+class CommentPurger:
+    """
+    Физически удаляет мягко удалённые комментарии старше retention_seconds.
+    Строки удаляются пачками по batch_size с паузой batch_pause секунд между ними -
+    скорость очистки ограничена примерно batch_size / batch_pause строк в секунду.
+    Несколько экземпляров не мешают друг другу: строки пачки берутся через SKIP LOCKED.
+    """
+
+    def __init__(
+            self,
+            repo: PostgresCommentRepository,
+            retention_seconds: float = 24 * 60 * 60,
+            batch_size: int = 500,
+            batch_pause: float = 0.5,
+            poll_interval: float = 60.0,
+    ):
+        self.repo = repo
+        self.retention_seconds = retention_seconds
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.poll_interval = poll_interval
+
+    async def purge_once(self) -> int:
+        """
+        Удалять пачки, пока не останется строк старше retention. Возвращает число удалённых
+        """
+        total = 0
+        while True:
+            purged = await self.repo.purge_deleted(self.retention_seconds, self.batch_size)
+            total += purged
+            if purged < self.batch_size:
+                return total
+            await asyncio.sleep(self.batch_pause)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                purged = await self.purge_once()
+                if purged:
+                    logger.info("Purged %d deleted comments", purged)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Comment purge failed")
+            await asyncio.sleep(self.poll_interval)
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from src.domain.entities.comment import Comment
+from src.infrastructure.metrics import Histogram
+from src.infrastructure.repositories.postgres_comment_repository import PostgresCommentRepository
+from src.infrastructure.repositories.postgres_outbox_repository import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _PendingWrite:
+    comment: Comment
+    events: Sequence[OutboxMessage]
+    future: asyncio.Future
+
+
+class CommentWriteBatcher:
+    """
+    Групповая запись комментариев перед PostgresCommentRepository.create.
+    Вставки, пришедшие за window_ms, или max_batch_size вставок уходят в БД одним
+    многострочным INSERT в одной транзакции; каждый вызывающий получает свою строку.
+    Если пачка не записалась, её комментарии пишутся по одному, чтобы ошибка
+    одной вставки не роняла остальные.
+    """
+
+    def __init__(self, repo: PostgresCommentRepository, window_ms: float = 2.0, max_batch_size: int = 100):
+        self.repo = repo
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._pending: List[_PendingWrite] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: set = set()
+        # Верхние границы корзин гистограммы размеров пачек: 1, 2, 4, ... max_batch_size
+        bounds = []
+        bound = 1
+        while bound < max_batch_size:
+            bounds.append(bound)
+            bound *= 2
+        bounds.append(max_batch_size)
+        self.batch_sizes = Histogram(bounds)
+        self.fallbacks = 0
+
+    async def create(
+            self,
+            comment: Comment,
+            events: Sequence[OutboxMessage] = (),
+            idempotency_key: Optional[str] = None,
+            request_hash: Optional[str] = None,
+    ) -> Optional[Comment]:
+        if idempotency_key is not None:
+            # Ключ занимается в транзакции вставки - такие записи идут мимо пачки
+            return await self.repo.create(comment, events, idempotency_key, request_hash)
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(_PendingWrite(comment, events, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    async def get_by_idempotency_key(self, author_id: str, key: str):
+        return await self.repo.get_by_idempotency_key(author_id, key)
+
+    async def release_idempotency_key(self, author_id: str, key: str, comment_id: str) -> None:
+        await self.repo.release_idempotency_key(author_id, key, comment_id)
+
+    async def get_by_id(self, comment_id: str):
+        return await self.repo.get_by_id(comment_id)
+
+    async def close(self) -> None:
+        """
+        Записать накопленное и дождаться незавершённых пачек
+        """
+        self._flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "batches": self.batch_sizes.count,
+            "rows": int(self.batch_sizes.sum),
+            "fallbacks": self.fallbacks,
+            "pending": len(self._pending),
+            "batch_size_histogram": self.batch_sizes.snapshot(),
+        }
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.get_running_loop().create_task(self._write(batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _write(self, batch: List[_PendingWrite]) -> None:
+        self.batch_sizes.observe(len(batch))
+        try:
+            saved = await self.repo.create_batch(
+                [item.comment for item in batch],
+                [event for item in batch for event in item.events],
+            )
+        except Exception as e:
+            if len(batch) == 1:
+                self._resolve(batch[0], exception=e)
+                return
+            logger.warning("Comment batch of %d failed, writing one by one: %r", len(batch), e)
+            self.fallbacks += 1
+            await asyncio.gather(*(self._write_one(item) for item in batch))
+            return
+        for item, comment in zip(batch, saved):
+            self._resolve(item, result=comment)
+
+    async def _write_one(self, item: _PendingWrite) -> None:
+        try:
+            self._resolve(item, result=await self.repo.create(item.comment, item.events))
+        except Exception as e:
+            self._resolve(item, exception=e)
+
+    @staticmethod
+    def _resolve(item: _PendingWrite, result: Optional[Comment] = None, exception: Optional[BaseException] = None):
+        # Вызывающий мог быть отменён (клиент отключился) - его результат просто не нужен
+        if item.future.done():
+            return
+        if exception is not None:
+            item.future.set_exception(exception)
+        else:
+            item.future.set_result(result)
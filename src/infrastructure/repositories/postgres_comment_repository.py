@@ -1,79 +1,731 @@
-from typing import Dict, Optional, List
-from asyncpg import Pool
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Optional, List, Sequence, Tuple
 
-from src.domain.entities.comment import Comment
+from src.domain.entities.comment import PATH_SEGMENT_LENGTH, Comment, CommentsVersion
+from src.domain.ids import uuid7_time
+from src.infrastructure.database.connection import DatabaseConnection
+from src.infrastructure.repositories.postgres_outbox_repository import OutboxMessage, PostgresOutboxRepository
+
+
+# comments секционирована по created_at. Время создания восстанавливается из UUIDv7-id
+# с запасом, чтобы поиск по id затрагивал одну-две секции, а не все
+_ID_TIME_MARGIN = timedelta(days=1)
+
+
+@dataclass
+class IdempotencyRecord:
+    comment_id: str
+    request_hash: str
+    # None - комментарий уже удалён физически (purge, отсоединённая секция)
+    comment: Optional[Comment]
+    # Комментарий мягко удалён: строка ещё есть, но читать её нельзя
+    deleted: bool = False
 
 
 class PostgresCommentRepository:
 
-    def __init__(self, pool: Pool):
-        self.pool = pool
+    def __init__(self, db: DatabaseConnection):
+        self.db = db
 
-    async def create(self, comment: Comment) -> Comment:
+    async def create(
+            self,
+            comment: Comment,
+            events: Sequence[OutboxMessage] = (),
+            idempotency_key: Optional[str] = None,
+            request_hash: Optional[str] = None,
+    ) -> Optional[Comment]:
+        """
+        Вставить комментарий, обновить счётчик и записать события в outbox в одной транзакции.
+        С idempotency_key ключ автора занимается в той же транзакции; если его уже занял другой
+        запрос, ничего не пишется и возвращается None.
+        """
         query = """
-        INSERT INTO comments (id, entity_type, entity_id, author_id, text, created_at, updated_at)
-        VALUES ($1, $2, $3, $4, $5, $6, $7)
-        RETURNING id, entity_type, entity_id, author_id, text, created_at, updated_at
+        INSERT INTO comments (id, entity_type, entity_id, author_id, text, created_at, updated_at, parent_id, path)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+        RETURNING id, entity_type, entity_id, author_id, text, created_at, updated_at, version, parent_id, path
         """
-        async with self.pool.acquire() as conn:
-            row = await conn.fetchrow(
-                query,
-                comment.id,
-                comment.entity_type,
-                comment.entity_id,
-                comment.author_id,
-                comment.text,
-                comment.created_at,
-                comment.updated_at,
-            )
+        async with self.db.acquire() as conn:
+            async with conn.transaction():
+                if idempotency_key is not None:
+                    claimed = await conn.fetchval(
+                        """
+                        INSERT INTO comment_idempotency_keys (author_id, key, comment_id, request_hash)
+                        VALUES ($1, $2, $3, $4)
+                        ON CONFLICT (author_id, key) DO NOTHING
+                        RETURNING key
+                        """,
+                        comment.author_id,
+                        idempotency_key,
+                        comment.id,
+                        request_hash,
+                    )
+                    if claimed is None:
+                        return None
+                row = await conn.fetchrow(
+                    query,
+                    comment.id,
+                    comment.entity_type,
+                    comment.entity_id,
+                    comment.author_id,
+                    comment.text,
+                    comment.created_at,
+                    comment.updated_at,
+                    comment.parent_id,
+                    comment.path,
+                )
+                await self._change_counts(conn, {(comment.entity_type, comment.entity_id): 1})
+                await PostgresOutboxRepository.enqueue(conn, events)
         return self._map_row_to_comment(row)
 
+    async def create_many(self, comments: List[Comment], events: Sequence[OutboxMessage] = ()) -> None:
+        """
+        Вставить пачку комментариев через COPY, обновить счётчики и записать события в outbox -
+        всё в одной транзакции
+        """
+        records = [
+            (c.id, c.entity_type, c.entity_id, c.author_id, c.text, c.created_at, c.updated_at, c.parent_id, c.path)
+            for c in comments
+        ]
+        async with self.db.acquire() as conn:
+            async with conn.transaction():
+                await conn.copy_records_to_table(
+                    "comments",
+                    records=records,
+                    columns=[
+                        "id", "entity_type", "entity_id", "author_id", "text", "created_at", "updated_at",
+                        "parent_id", "path",
+                    ],
+                )
+                await self._change_counts(conn, self._count_deltas(comments))
+                await PostgresOutboxRepository.enqueue(conn, events)
+
+    async def create_batch(self, comments: List[Comment], events: Sequence[OutboxMessage] = ()) -> List[Comment]:
+        """
+        Вставить несколько комментариев одним многострочным INSERT в одной транзакции
+        вместе со счётчиками и outbox. Возвращает сохранённые строки в порядке comments.
+        """
+        query = """
+        INSERT INTO comments (id, entity_type, entity_id, author_id, text, created_at, updated_at, parent_id, path)
+        SELECT * FROM unnest(
+            $1::uuid[], $2::varchar[], $3::varchar[], $4::varchar[], $5::text[], $6::timestamp[], $7::timestamp[],
+            $8::uuid[], $9::varchar[]
+        )
+        RETURNING id, entity_type, entity_id, author_id, text, created_at, updated_at, version, parent_id, path
+        """
+        async with self.db.acquire() as conn:
+            async with conn.transaction():
+                rows = await conn.fetch(
+                    query,
+                    [c.id for c in comments],
+                    [c.entity_type for c in comments],
+                    [c.entity_id for c in comments],
+                    [c.author_id for c in comments],
+                    [c.text for c in comments],
+                    [c.created_at for c in comments],
+                    [c.updated_at for c in comments],
+                    [c.parent_id for c in comments],
+                    [c.path for c in comments],
+                )
+                await self._change_counts(conn, self._count_deltas(comments))
+                await PostgresOutboxRepository.enqueue(conn, events)
+        by_id = {row['id']: self._map_row_to_comment(row) for row in rows}
+        return [by_id[c.id] for c in comments]
+
     async def get_by_id(self, comment_id: str) -> Optional[Comment]:
         query = """
-        SELECT id, entity_type, entity_id, author_id, text, created_at, updated_at
+        SELECT id, entity_type, entity_id, author_id, text, created_at, updated_at, version, parent_id, path
         FROM comments
-        WHERE id = $1
+        WHERE id = $1 AND created_at >= $2 AND created_at < $3 AND deleted_at IS NULL
         """
-        async with self.pool.acquire() as conn:
-            row = await conn.fetchrow(query, comment_id)
+        async with self.db.acquire(readonly=True) as conn:
+            row = await conn.fetchrow(query, comment_id, *self._created_at_bounds(comment_id))
         return self._map_row_to_comment(row)
 
+    async def get_by_idempotency_key(self, author_id: str, key: str) -> Optional[IdempotencyRecord]:
+        """
+        Ключ идемпотентности автора и созданный с ним комментарий - два поиска по первичным ключам,
+        комментарий ищется в секциях по времени из его id
+        """
+        async with self.db.acquire() as conn:
+            claimed = await conn.fetchrow(
+                """
+                SELECT comment_id, request_hash FROM comment_idempotency_keys
+                WHERE author_id = $1 AND key = $2
+                """,
+                author_id,
+                key,
+            )
+            if not claimed:
+                return None
+            row = await conn.fetchrow(
+                """
+                SELECT id, entity_type, entity_id, author_id, text, created_at, updated_at, version, parent_id, path,
+                       deleted_at IS NOT NULL AS deleted
+                FROM comments
+                WHERE id = $1 AND created_at >= $2 AND created_at < $3
+                """,
+                claimed['comment_id'],
+                *self._created_at_bounds(claimed['comment_id']),
+            )
+        return IdempotencyRecord(
+            comment_id=str(claimed['comment_id']),
+            request_hash=claimed['request_hash'],
+            comment=self._map_row_to_comment(row),
+            deleted=bool(row and row['deleted']),
+        )
+
+    async def release_idempotency_key(self, author_id: str, key: str, comment_id: str) -> None:
+        """
+        Освободить ключ, занятый под comment_id; ключ, уже перезанятый другим комментарием, не трогается
+        """
+        query = """
+        DELETE FROM comment_idempotency_keys
+        WHERE author_id = $1 AND key = $2 AND comment_id = $3
+        """
+        async with self.db.acquire() as conn:
+            await conn.execute(query, author_id, key, comment_id)
+
+    async def delete_expired_idempotency_keys(self, ttl_seconds: int, limit: int) -> int:
+        """
+        Удалить до limit ключей идемпотентности старше ttl_seconds. Возвращает число удалённых
+        """
+        query = """
+        DELETE FROM comment_idempotency_keys
+        WHERE (author_id, key) IN (
+            SELECT author_id, key FROM comment_idempotency_keys
+            WHERE created_at < now() - make_interval(secs => $1)
+            ORDER BY created_at
+            LIMIT $2
+        )
+        """
+        async with self.db.acquire() as conn:
+            result = await conn.execute(query, float(ttl_seconds), limit)
+        return int(result.split()[-1])
+
     async def get_by_entity(
             self,
             entity_type: str,
-            entity_id: str
+            entity_id: str,
+            limit: int = 10,
+            offset: int = 0,
+            sort: str = "desc",
+            after: Optional[Tuple[datetime, str]] = None,
     ) -> List[Comment]:
-        query = """
-        SELECT id, entity_type, entity_id, author_id, text, created_at, updated_at
+        """
+        after - позиция (created_at, id), после которой начинается страница.
+        В этом режиме offset не используется, и страница читается
+        диапазонным поиском по индексу независимо от глубины.
+        Отдельное условие на created_at отсекает секции за пределами страницы:
+        сравнение кортежей для этого планировщику не подходит.
+        """
+        direction = "DESC" if sort == "desc" else "ASC"
+        args = [entity_type, entity_id, limit]
+        if after is not None:
+            comparison = "<" if sort == "desc" else ">"
+            keyset = f"AND created_at {comparison}= $4 AND (created_at, id) {comparison} ($4, $5)"
+            offset_clause = ""
+            args.extend(after)
+        else:
+            keyset = ""
+            offset_clause = "OFFSET $4"
+            args.append(offset)
+        query = f"""
+        SELECT id, entity_type, entity_id, author_id, text, created_at, updated_at, version, parent_id, path
         FROM comments
-        WHERE entity_type = $1 AND entity_id = $2
-        ORDER BY created_at ASC
+        WHERE entity_type = $1 AND entity_id = $2 AND deleted_at IS NULL {keyset}
+        ORDER BY created_at {direction}, id {direction}
+        LIMIT $3 {offset_clause}
+        """
+        async with self.db.acquire(readonly=True) as conn:
+            rows = await conn.fetch(query, *args)
+        return [self._map_row_to_comment(row) for row in rows]
+
+    async def get_threads(
+            self,
+            entity_type: str,
+            entity_id: str,
+            limit: int = 10,
+            offset: int = 0,
+            sort: str = "desc",
+            after: Optional[Tuple[datetime, str]] = None,
+            depth: int = 1,
+            replies_limit: int = 3,
+            max_rows: int = 5000,
+    ) -> List[Comment]:
+        """
+        Страница корневых комментариев сущности вместе с ответами - одним запросом.
+        Пагинация корней - как в get_by_entity; у каждого комментария до уровня depth
+        берутся первые replies_limit ответов. Корни идут в порядке sort, за каждым -
+        его ветка в порядке обхода в глубину. Всего не больше max_rows строк (см. _tree_query).
         """
-        async with self.pool.acquire() as conn:
-            rows = await conn.fetch(query, entity_type, entity_id)
+        direction = "DESC" if sort == "desc" else "ASC"
+        args = [entity_type, entity_id, limit, depth, replies_limit, max_rows]
+        if after is not None:
+            comparison = "<" if sort == "desc" else ">"
+            keyset = f"AND created_at {comparison}= $7 AND (created_at, id) {comparison} ($7, $8)"
+            offset_clause = ""
+            args.extend(after)
+        else:
+            keyset = ""
+            offset_clause = "OFFSET $7"
+            args.append(offset)
+        roots = f"""
+            SELECT id, entity_type, entity_id, author_id, text, created_at, updated_at, version, parent_id, path
+            FROM comments
+            WHERE entity_type = $1 AND entity_id = $2 AND parent_id IS NULL AND deleted_at IS NULL {keyset}
+            ORDER BY created_at {direction}, id {direction}
+            LIMIT $3 {offset_clause}
+        """
+        query = self._tree_query(roots, depth="$4", replies_limit="$5", max_rows="$6", direction=direction)
+        async with self.db.acquire(readonly=True) as conn:
+            rows = await conn.fetch(query, *args)
         return [self._map_row_to_comment(row) for row in rows]
 
-    async def update(self, comment: Comment) -> Comment:
+    async def get_subtree(
+            self,
+            comment_id: str,
+            depth: Optional[int] = None,
+            replies_limit: Optional[int] = None,
+            limit: int = 1000,
+    ) -> List[Comment]:
+        """
+        Комментарий и его ответы до depth уровней вниз (None - все), не больше limit строк,
+        в порядке обхода в глубину. Без replies_limit ветка читается одним диапазоном
+        индекса idx_comments_entity_path и усекается по порядку обхода, с ним - рекурсивным
+        запросом, как в get_threads, и усекается по уровням. Пустой список - комментария нет.
+        """
+        if replies_limit is None:
+            query = """
+            WITH root AS (
+                SELECT entity_type, entity_id, path, created_at
+                FROM comments
+                WHERE id = $1 AND created_at >= $2 AND created_at < $3 AND deleted_at IS NULL
+            )
+            SELECT c.id, c.entity_type, c.entity_id, c.author_id, c.text, c.created_at, c.updated_at, c.version,
+                   c.parent_id, c.path
+            FROM root
+            JOIN comments c ON c.entity_type = root.entity_type AND c.entity_id = root.entity_id
+                AND c.path >= root.path AND c.path < root.path || 'g'
+                AND c.created_at >= root.created_at AND c.deleted_at IS NULL
+            WHERE $4::integer IS NULL OR length(c.path) <= length(root.path) + $4 * $5
+            ORDER BY c.path
+            LIMIT $6
+            """
+            args = [comment_id, *self._created_at_bounds(comment_id), depth, PATH_SEGMENT_LENGTH, limit]
+        else:
+            roots = """
+                SELECT id, entity_type, entity_id, author_id, text, created_at, updated_at, version, parent_id, path
+                FROM comments
+                WHERE id = $1 AND created_at >= $2 AND created_at < $3 AND deleted_at IS NULL
+            """
+            query = self._tree_query(roots, depth="$4", replies_limit="$5", max_rows="$6")
+            args = [comment_id, *self._created_at_bounds(comment_id), depth, replies_limit, limit]
+        async with self.db.acquire(readonly=True) as conn:
+            rows = await conn.fetch(query, *args)
+        return [self._map_row_to_comment(row) for row in rows]
+
+    async def get_first_pages(
+            self,
+            keys: List[Tuple[str, str]],
+            limit: int = 10,
+            sort: str = "desc",
+    ) -> Dict[Tuple[str, str], List[Comment]]:
+        """
+        Первые limit комментариев для каждой сущности одним запросом:
+        LATERAL-подзапрос на сущность читает её страницу по индексу.
+        """
+        direction = "DESC" if sort == "desc" else "ASC"
+        query = f"""
+        SELECT c.id, c.entity_type, c.entity_id, c.author_id, c.text, c.created_at, c.updated_at, c.version, c.parent_id, c.path
+        FROM unnest($1::varchar[], $2::varchar[]) WITH ORDINALITY AS k(entity_type, entity_id, ord)
+        CROSS JOIN LATERAL (
+            SELECT id, entity_type, entity_id, author_id, text, created_at, updated_at, version, parent_id, path
+            FROM comments
+            WHERE entity_type = k.entity_type AND entity_id = k.entity_id AND deleted_at IS NULL
+            ORDER BY created_at {direction}, id {direction}
+            LIMIT $3
+        ) c
+        ORDER BY k.ord, c.created_at {direction}, c.id {direction}
+        """
+        entity_types = [entity_type for entity_type, _ in keys]
+        entity_ids = [entity_id for _, entity_id in keys]
+        async with self.db.acquire(readonly=True) as conn:
+            rows = await conn.fetch(query, entity_types, entity_ids, limit)
+
+        pages: Dict[Tuple[str, str], List[Comment]] = {key: [] for key in keys}
+        for row in rows:
+            pages[(row['entity_type'], row['entity_id'])].append(self._map_row_to_comment(row))
+        return pages
+
+    async def iter_by_entity_type(
+            self,
+            entity_type: str,
+            since: Optional[datetime] = None,
+            chunk_size: int = 1000,
+    ) -> AsyncIterator[List[Comment]]:
+        """
+        Все комментарии сущностей типа entity_type пачками по chunk_size.
+        Читает через серверный курсор в одной read-only транзакции,
+        поэтому в памяти одновременно находится не больше одной пачки.
+        """
+        args = [entity_type]
+        since_filter = ""
+        if since is not None:
+            since_filter = "AND updated_at >= $2"
+            args.append(since)
+        query = f"""
+        SELECT id, entity_type, entity_id, author_id, text, created_at, updated_at, version, parent_id, path
+        FROM comments
+        WHERE entity_type = $1 AND deleted_at IS NULL {since_filter}
+        ORDER BY updated_at, id
+        """
+        async with self.db.acquire() as conn:
+            async with conn.transaction(isolation="repeatable_read", readonly=True):
+                cursor = await conn.cursor(query, *args)
+                while True:
+                    rows = await cursor.fetch(chunk_size)
+                    if not rows:
+                        break
+                    yield [self._map_row_to_comment(row) for row in rows]
+
+    async def exists_for_entity(self, entity_type: str, entity_id: str) -> bool:
         query = """
-        UPDATE comments
-        SET text = $1, updated_at = $2
-        WHERE id = $3
-        RETURNING *
+        SELECT EXISTS (
+            SELECT 1 FROM comment_counts
+            WHERE entity_type = $1 AND entity_id = $2 AND count > 0
+        )
         """
-        async with self.pool.acquire() as conn:
-            row = await conn.fetchrow(query, comment.text, comment.updated_at, comment.id)
-        return self._map_row_to_comment(row)
+        async with self.db.acquire(readonly=True) as conn:
+            return await conn.fetchval(query, entity_type, entity_id)
+
+    async def search(
+            self,
+            text: str,
+            limit: int = 20,
+            entity_type: Optional[str] = None,
+            author_id: Optional[str] = None,
+            created_from: Optional[datetime] = None,
+            created_to: Optional[datetime] = None,
+            after: Optional[Tuple[float, datetime, str]] = None,
+    ) -> List[Tuple[Comment, float]]:
+        """
+        Полнотекстовый поиск по GIN-индексу search_vector, по убыванию релевантности.
+        text - запрос в синтаксисе websearch_to_tsquery: слова, "фраза", or, -исключение.
+        after - позиция (rank, created_at, id), после которой начинается страница.
+        Диапазон created_from..created_to отсекает секции за его пределами.
+        """
+        conditions = ["search_vector @@ q", "deleted_at IS NULL"]
+        args: list = [text, limit]
+        for column, operator, value in (
+                ("entity_type", "=", entity_type),
+                ("author_id", "=", author_id),
+                ("created_at", ">=", created_from),
+                ("created_at", "<", created_to),
+        ):
+            if value is not None:
+                args.append(value)
+                conditions.append(f"{column} {operator} ${len(args)}")
+        keyset = ""
+        if after is not None:
+            args.extend(after)
+            n = len(args)
+            keyset = f"WHERE (rank, created_at, id) < (${n - 2}::real, ${n - 1}, ${n})"
+        query = f"""
+        SELECT id, entity_type, entity_id, author_id, text, created_at, updated_at, version, parent_id, path, rank
+        FROM (
+            SELECT id, entity_type, entity_id, author_id, text, created_at, updated_at, version, parent_id, path,
+                   ts_rank(search_vector, q) AS rank
+            FROM comments, websearch_to_tsquery('russian', $1) AS q
+            WHERE {" AND ".join(conditions)}
+        ) matched
+        {keyset}
+        ORDER BY rank DESC, created_at DESC, id DESC
+        LIMIT $2
+        """
+        async with self.db.acquire(readonly=True) as conn:
+            rows = await conn.fetch(query, *args)
+        return [(self._map_row_to_comment(row), row['rank']) for row in rows]
+
+    async def update_text(
+            self,
+            comment_id: str,
+            entity_type: str,
+            entity_id: str,
+            text: str,
+            updated_at: datetime,
+            expected_version: Optional[int] = None,
+            event: Optional[OutboxMessage] = None,
+    ) -> Tuple[Optional[Comment], bool]:
+        """
+        Изменить текст комментария одним запросом без явной транзакции: условный UPDATE
+        по id, сущности и версии, сдвиг версии счётчиков сущности и запись события в outbox.
+        В payload события поле comment заполняется из обновлённой строки.
+        Если UPDATE ничего не изменил, строка перечитывается отдельным запросом: снимок первого
+        видит версию до параллельного изменения, из-за которого условие не сошлось.
+
+        Возвращает (комментарий, True) при успехе, (текущий комментарий, False) при
+        несовпадении версии и (None, False), если комментария у этой сущности нет.
+        """
+        query = """
+        WITH updated AS (
+            UPDATE comments
+            SET text = $4, updated_at = $5, version = version + 1
+            WHERE id = $1 AND entity_type = $2 AND entity_id = $3
+              AND created_at >= $10 AND created_at < $11 AND deleted_at IS NULL
+              AND ($6::integer IS NULL OR version = $6)
+            RETURNING id, entity_type, entity_id, author_id, text, created_at, updated_at, version, parent_id, path
+        ), counted AS (
+            UPDATE comment_counts c
+            SET revision = c.revision + 1, last_modified_at = now()
+            FROM updated u
+            WHERE c.entity_type = u.entity_type AND c.entity_id = u.entity_id
+        ), queued AS (
+            INSERT INTO outbox (topic, key, payload)
+            SELECT $7, $8, $9::jsonb || jsonb_build_object('comment', jsonb_build_object(
+                'id', u.id::text,
+                'entity_type', u.entity_type,
+                'entity_id', u.entity_id,
+                'author_id', u.author_id,
+                'text', u.text,
+                'created_at', u.created_at,
+                'updated_at', u.updated_at,
+                'version', u.version,
+                'parent_id', u.parent_id::text
+            ))
+            FROM updated u
+            WHERE $7::varchar IS NOT NULL
+        )
+        SELECT * FROM updated
+        """
+        current_query = """
+        SELECT id, entity_type, entity_id, author_id, text, created_at, updated_at, version, parent_id, path
+        FROM comments
+        WHERE id = $1 AND entity_type = $2 AND entity_id = $3
+          AND created_at >= $4 AND created_at < $5 AND deleted_at IS NULL
+        """
+        bounds = self._created_at_bounds(comment_id)
+        async with self.db.acquire() as conn:
+            row = await conn.fetchrow(
+                query,
+                comment_id,
+                entity_type,
+                entity_id,
+                text,
+                updated_at,
+                expected_version,
+                event.topic if event else None,
+                event.key if event else None,
+                json.dumps(event.payload, ensure_ascii=False) if event else None,
+                *bounds,
+            )
+            if row:
+                return self._map_row_to_comment(row), True
+            row = await conn.fetchrow(current_query, comment_id, entity_type, entity_id, *bounds)
+        if not row:
+            return None, False
+        return self._map_row_to_comment(row), False
+
+    async def soft_delete(
+            self,
+            comment_id: str,
+            deleted_at: datetime,
+            event: OutboxMessage,
+    ) -> Optional[Tuple[str, str, int]]:
+        """
+        Пометить удалённым комментарий вместе с его веткой ответов - одним запросом:
+        UPDATE по диапазону path, уменьшение счётчика сущности и по событию в outbox
+        на каждый удалённый комментарий (поле comment payload заполняется из строки,
+        key - id комментария). Строки физически удаляет purge_deleted.
+        Возвращает (entity_type, entity_id, число удалённых) или None, если комментария нет.
+        """
+        query = """
+        WITH target AS (
+            SELECT entity_type, entity_id, path, created_at
+            FROM comments
+            WHERE id = $1 AND created_at >= $2 AND created_at < $3 AND deleted_at IS NULL
+        ), deleted AS (
+            UPDATE comments c
+            SET deleted_at = $4
+            FROM target t
+            WHERE c.entity_type = t.entity_type AND c.entity_id = t.entity_id
+              AND c.path >= t.path AND c.path < t.path || 'g'
+              AND c.created_at >= t.created_at AND c.deleted_at IS NULL
+            RETURNING c.id, c.entity_type, c.entity_id, c.author_id, c.text, c.created_at, c.updated_at,
+                      c.version, c.parent_id, c.deleted_at
+        ), counted AS (
+            UPDATE comment_counts c
+            SET count = GREATEST(c.count - d.removed, 0),
+                revision = c.revision + 1,
+                last_modified_at = now()
+            FROM (
+                SELECT entity_type, entity_id, count(*) AS removed FROM deleted GROUP BY entity_type, entity_id
+            ) d
+            WHERE c.entity_type = d.entity_type AND c.entity_id = d.entity_id
+        ), queued AS (
+            INSERT INTO outbox (topic, key, payload)
+            SELECT $5, d.id::text, $6::jsonb || jsonb_build_object('comment', jsonb_build_object(
+                'id', d.id::text,
+                'entity_type', d.entity_type,
+                'entity_id', d.entity_id,
+                'author_id', d.author_id,
+                'text', d.text,
+                'created_at', d.created_at,
+                'updated_at', d.updated_at,
+                'version', d.version,
+                'parent_id', d.parent_id::text,
+                'deleted_at', d.deleted_at
+            ))
+            FROM deleted d
+        )
+        SELECT entity_type, entity_id, count(*) AS removed
+        FROM deleted
+        GROUP BY entity_type, entity_id
+        """
+        async with self.db.acquire() as conn:
+            row = await conn.fetchrow(
+                query,
+                comment_id,
+                *self._created_at_bounds(comment_id),
+                deleted_at,
+                event.topic,
+                json.dumps(event.payload, ensure_ascii=False),
+            )
+        if not row:
+            return None
+        return row['entity_type'], row['entity_id'], row['removed']
+
+    async def purge_deleted(self, older_than_seconds: float, limit: int) -> int:
+        """
+        Физически удалить до limit комментариев, помеченных удалёнными раньше чем
+        older_than_seconds назад. Небольшие пачки держат блокировки и объём WAL
+        короткими. Возвращает число удалённых строк.
+        """
+        query = """
+        DELETE FROM comments
+        WHERE (id, created_at) IN (
+            SELECT id, created_at FROM comments
+            WHERE deleted_at IS NOT NULL AND deleted_at < now() - make_interval(secs => $1)
+            ORDER BY deleted_at
+            LIMIT $2
+            FOR UPDATE SKIP LOCKED
+        )
+        """
+        async with self.db.acquire() as conn:
+            result = await conn.execute(query, float(older_than_seconds), limit)
+        return int(result.split()[-1])
+
+    async def get_counts(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], int]:
+        """
+        Количество комментариев для набора сущностей (entity_type, entity_id) одним запросом
+        по первичному ключу comment_counts. Сущности без комментариев получают 0.
+        """
+        query = """
+        SELECT k.entity_type, k.entity_id, COALESCE(c.count, 0) AS count
+        FROM unnest($1::varchar[], $2::varchar[]) AS k(entity_type, entity_id)
+        LEFT JOIN comment_counts c
+            ON c.entity_type = k.entity_type AND c.entity_id = k.entity_id
+        """
+        entity_types = [entity_type for entity_type, _ in keys]
+        entity_ids = [entity_id for _, entity_id in keys]
+        async with self.db.acquire(readonly=True) as conn:
+            rows = await conn.fetch(query, entity_types, entity_ids)
+        return {(row['entity_type'], row['entity_id']): row['count'] for row in rows}
+
+    async def get_version(self, entity_type: str, entity_id: str) -> Optional[CommentsVersion]:
+        """
+        Версия комментариев сущности - один поиск по первичному ключу comment_counts
+        """
+        query = """
+        SELECT count, revision, last_modified_at
+        FROM comment_counts
+        WHERE entity_type = $1 AND entity_id = $2
+        """
+        async with self.db.acquire(readonly=True) as conn:
+            row = await conn.fetchrow(query, entity_type, entity_id)
+        if not row:
+            return None
+        return CommentsVersion(
+            count=row['count'],
+            revision=row['revision'],
+            last_modified_at=row['last_modified_at'],
+        )
+
+    @staticmethod
+    async def _change_counts(conn, deltas: Dict[Tuple[str, str], int]) -> None:
+        """
+        Изменить счётчики сущностей на delta и сдвинуть их версии.
+        Ключи сортируются, чтобы параллельные транзакции блокировали строки в одном порядке.
+        """
+        keys = sorted(deltas)
+        await conn.execute(
+            """
+            INSERT INTO comment_counts (entity_type, entity_id, count, revision, last_modified_at)
+            SELECT entity_type, entity_id, delta, 1, now()
+            FROM unnest($1::varchar[], $2::varchar[], $3::bigint[]) AS d(entity_type, entity_id, delta)
+            ON CONFLICT (entity_type, entity_id)
+            DO UPDATE SET count = comment_counts.count + EXCLUDED.count,
+                          revision = comment_counts.revision + 1,
+                          last_modified_at = now()
+            """,
+            [entity_type for entity_type, _ in keys],
+            [entity_id for _, entity_id in keys],
+            [deltas[key] for key in keys],
+        )
+
+    @staticmethod
+    def _tree_query(roots: str, depth: str, replies_limit: str, max_rows: str, direction: str = "ASC") -> str:
+        """
+        Рекурсивный запрос: корни из подзапроса roots и первые replies_limit ответов
+        каждого комментария до уровня depth (NULL - без ограничения). Ответы узла
+        читаются LATERAL-подзапросом по индексу idx_comments_parent_created; ответ
+        создаётся не раньше родителя, и условие на created_at отсекает старые секции.
+        Рекурсия выдаёт строки уровень за уровнем, и LIMIT max_rows до сортировки
+        останавливает её: при усечении отбрасываются самые глубокие ответы, а у каждой
+        оставшейся строки есть её родитель.
+        """
+        return f"""
+        WITH RECURSIVE tree AS (
+            SELECT roots.*, 0 AS level, roots.created_at AS root_created_at, roots.id AS root_id
+            FROM ({roots}) roots
+            UNION ALL
+            SELECT r.*, t.level + 1, t.root_created_at, t.root_id
+            FROM tree t
+            CROSS JOIN LATERAL (
+                SELECT id, entity_type, entity_id, author_id, text, created_at, updated_at, version, parent_id, path
+                FROM comments
+                WHERE parent_id = t.id AND created_at >= t.created_at AND deleted_at IS NULL
+                ORDER BY created_at, id
+                LIMIT {replies_limit}
+            ) r
+            WHERE {depth}::integer IS NULL OR t.level < {depth}
+        )
+        SELECT id, entity_type, entity_id, author_id, text, created_at, updated_at, version, parent_id, path
+        FROM (SELECT * FROM tree LIMIT {max_rows}) tree
+        ORDER BY root_created_at {direction}, root_id {direction}, path
+        """
+
+    @staticmethod
+    def _created_at_bounds(comment_id) -> Tuple[datetime, datetime]:
+        """
+        Диапазон created_at комментария по его id; для id без времени (UUIDv4) - без ограничений
+        """
+        created_at = uuid7_time(comment_id)
+        if created_at is None:
+            return datetime.min, datetime.max
+        return created_at - _ID_TIME_MARGIN, created_at + _ID_TIME_MARGIN
+
+    @staticmethod
+    def _count_deltas(comments: List[Comment]) -> Dict[Tuple[str, str], int]:
+        deltas: Dict[Tuple[str, str], int] = {}
+        for c in comments:
+            key = (c.entity_type, c.entity_id)
+            deltas[key] = deltas.get(key, 0) + 1
+        return deltas
 
     @staticmethod
     def _map_row_to_comment(row) -> Optional[Comment]:
         if not row:
             return None
-        return Comment(
-            id=row['id'],
-            entity_type=row['entity_type'],
-            entity_id=row['entity_id'],
-            author_id=row['author_id'],
-            text=row['text'],
-            created_at=row['created_at'],
-            updated_at=row['updated_at']
-        )
+        return Comment.from_record(row)
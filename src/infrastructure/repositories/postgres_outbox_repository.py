@@ -0,0 +1,107 @@
+import json
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional, Sequence
+
+from src.infrastructure.database.connection import DatabaseConnection
+
+# Outbox делится на секции по хэшу ключа события (см. миграцию 014): секцию отправляет
+# один relay за раз - владелец advisory-блокировки (OUTBOX_LOCK_CLASS, номер секции)
+OUTBOX_SHARDS = 16
+OUTBOX_LOCK_CLASS = 611_405_288
+_SHARD = f"((hashtext(key) & 2147483647) % {OUTBOX_SHARDS})"
+
+@dataclass
+class OutboxMessage:
+    topic: str
+    key: str
+    payload: dict
+    id: Optional[int] = None
+
+
+class PostgresOutboxRepository:
+
+    def __init__(self, db: DatabaseConnection):
+        self.db = db
+        self._next_shard = 0
+
+    @staticmethod
+    async def enqueue(conn, messages: Sequence[OutboxMessage]) -> None:
+        """
+        Записать события в outbox на соединении вызывающего - в его транзакции
+        """
+        if not messages:
+            return
+        await conn.execute(
+            """
+            INSERT INTO outbox (topic, key, payload)
+            SELECT * FROM unnest($1::varchar[], $2::varchar[], $3::jsonb[])
+            """,
+            [m.topic for m in messages],
+            [m.key for m in messages],
+            [json.dumps(m.payload, ensure_ascii=False) for m in messages],
+        )
+
+    @asynccontextmanager
+    async def claim(self, limit: int) -> AsyncIterator["OutboxBatch"]:
+        """
+        Взять до limit самых старых событий одной секции outbox. Секцию держит сессионная
+        advisory-блокировка: события одного ключа попадают в одну секцию и уходят в Kafka
+        строго по порядку, а relay в разных процессах берут разные секции параллельно.
+        Если все непустые секции заняты, пачка пустая. Строки читаются и удаляются короткими
+        запросами без открытой транзакции, так что отправка в Kafka не держит ни снимок, ни
+        блокировки строк. Если вызывающий отметил пачку отправленной, строки удаляются на выходе.
+        """
+        async with self.db.acquire() as conn:
+            pending = await conn.fetch(
+                f"""
+                SELECT shard FROM generate_series(0, {OUTBOX_SHARDS - 1}) AS shard
+                WHERE EXISTS (SELECT 1 FROM outbox WHERE {_SHARD} = shard)
+                """
+            )
+            # Секции перебираются с разных мест, чтобы relay реже сталкивались на одной
+            shards = [row['shard'] for row in pending]
+            self._next_shard = (self._next_shard + 1) % OUTBOX_SHARDS
+            shards.sort(key=lambda shard: (shard - self._next_shard) % OUTBOX_SHARDS)
+            for shard in shards:
+                if not await conn.fetchval("SELECT pg_try_advisory_lock($1, $2)", OUTBOX_LOCK_CLASS, shard):
+                    continue
+                rows = await conn.fetch(
+                    f"""
+                    SELECT id, topic, key, payload::text AS payload
+                    FROM outbox
+                    WHERE {_SHARD} = $1
+                    ORDER BY id
+                    LIMIT $2
+                    """,
+                    shard,
+                    limit,
+                )
+                if not rows:
+                    # Секцию успел опустошить предыдущий владелец
+                    await conn.execute("SELECT pg_advisory_unlock($1, $2)", OUTBOX_LOCK_CLASS, shard)
+                    continue
+                batch = OutboxBatch([
+                    OutboxMessage(topic=row['topic'], key=row['key'], payload=json.loads(row['payload']), id=row['id'])
+                    for row in rows
+                ])
+                # Блокировку секции снимает сброс соединения при возврате в пул,
+                # а при обрыве соединения - сервер; явный unlock в finally мог бы
+                # упасть на сломанном соединении и скрыть исходную ошибку
+                yield batch
+                if batch.sent:
+                    await conn.execute(
+                        "DELETE FROM outbox WHERE id = ANY($1::bigint[])",
+                        [m.id for m in batch.messages],
+                    )
+                return
+        yield OutboxBatch([])
+
+
+@dataclass
+class OutboxBatch:
+    messages: List[OutboxMessage]
+    sent: bool = False
+
+    def mark_sent(self) -> None:
+        self.sent = True
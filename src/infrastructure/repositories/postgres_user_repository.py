@@ -1,4 +1,5 @@
-from typing import List, Optional
+import json
+from typing import AsyncIterable, AsyncIterator, List, Optional, Tuple
 
 from src.domain.entities.user import User
 from src.domain.repositories.user_repository import UserRepository
@@ -20,17 +21,70 @@ class PostgresUserRepository(UserRepository):
             updated_at=row['updated_at']
         )
     
-    async def create(self, user: User) -> User:
+    async def create(self, user: User) -> Optional[User]:
         row = await self.db.fetchrow(
             """
             insert into users (email, name)
             values ($1, $2)
+            on conflict (email) do nothing
             returning id, email, name, created_at, updated_at
             """,
             user.email, user.name
         )
         return self._map_row_to_user(row)
-    
+
+    async def import_many(
+            self, rows: AsyncIterable[Tuple[int, str, str]], max_reported_conflicts: int = 1000
+    ) -> Tuple[int, int, List[Tuple[int, str, str]]]:
+        """
+        Строки потоком уходят бинарным COPY во временную таблицу, затем одним
+        insert ... on conflict переносятся в users. Всё в одной транзакции.
+        Из повторов email внутри импорта вставляется первая строка.
+        """
+        async with self.db.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    """
+                    create temp table users_import (
+                        line integer not null,
+                        email varchar(255) not null,
+                        name varchar(255) not null
+                    ) on commit drop
+                    """
+                )
+                await conn.copy_records_to_table(
+                    "users_import", records=rows, columns=["line", "email", "name"]
+                )
+                summary = await conn.fetchrow(
+                    """
+                    with incoming as (
+                        select distinct on (email) line, email, name
+                        from users_import
+                        order by email, line
+                    ), inserted as (
+                        insert into users (email, name)
+                        select email, name from incoming order by line
+                        on conflict (email) do nothing
+                        returning email
+                    ), conflicts as (
+                        select i.line, i.email,
+                               case when i.line <> f.line then 'duplicate in import'
+                                    else 'already exists' end as reason
+                        from users_import i
+                        join incoming f on f.email = i.email
+                        left join inserted ins on ins.email = i.email and i.line = f.line
+                        where ins.email is null
+                    )
+                    select (select count(*) from inserted) as created,
+                           (select count(*) from conflicts) as conflict_count,
+                           (select coalesce(json_agg(c order by c.line), '[]')
+                            from (select * from conflicts order by line limit $1) c)::text as conflicts
+                    """,
+                    max_reported_conflicts,
+                )
+        conflicts = [(c['line'], c['email'], c['reason']) for c in json.loads(summary['conflicts'])]
+        return summary['created'], summary['conflict_count'], conflicts
+
     async def get_by_id(self, user_id: int) -> Optional[User]:
         row = await self.db.fetchrow(
             """
@@ -38,7 +92,8 @@ class PostgresUserRepository(UserRepository):
             from users
             where id = $1
             """,
-            user_id
+            user_id,
+            readonly=True,
         )
         return self._map_row_to_user(row)
     
@@ -53,17 +108,50 @@ class PostgresUserRepository(UserRepository):
         )
         return self._map_row_to_user(row)
     
-    async def get_all(self, limit: int = 100, offset: int = 0) -> List[User]:
-        rows = await self.db.fetch(
-            """
-            select id, email, name, created_at, updated_at
-            from users
-            order by id
-            limit $1 offset $2
-            """,
-            limit, offset
-        )
+    async def get_all(self, limit: int = 100, offset: int = 0, after_id: Optional[int] = None) -> List[User]:
+        """
+        С after_id страница читается диапазоном первичного ключа (id > after_id) -
+        её стоимость не зависит от глубины, в отличие от offset
+        """
+        if after_id is not None:
+            rows = await self.db.fetch(
+                """
+                select id, email, name, created_at, updated_at
+                from users
+                where id > $2
+                order by id
+                limit $1
+                """,
+                limit, after_id,
+                readonly=True,
+            )
+        else:
+            rows = await self.db.fetch(
+                """
+                select id, email, name, created_at, updated_at
+                from users
+                order by id
+                limit $1 offset $2
+                """,
+                limit, offset,
+                readonly=True,
+            )
         return [self._map_row_to_user(row) for row in rows]
+
+    async def iter_all(self, chunk_size: int = 1000) -> AsyncIterator[List[User]]:
+        """
+        Обход всей таблицы пачками по первичному ключу: каждая пачка - отдельный
+        короткий запрос, без долгой транзакции и серверного курсора на время выгрузки
+        """
+        after_id = 0
+        while True:
+            users = await self.get_all(limit=chunk_size, after_id=after_id)
+            if not users:
+                return
+            yield users
+            if len(users) < chunk_size:
+                return
+            after_id = users[-1].id
     
     async def update(self, user: User) -> Optional[User]:
         row = await self.db.fetchrow(
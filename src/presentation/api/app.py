@@ -1,8 +1,10 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 from src.infrastructure.database.connection import db_connection
+from src.presentation.api.container import Container
+from src.presentation.api.session_consistency import SESSION_LSN_HEADER, add_session_consistency
 from src.presentation.api.routes.users import router as users_router
 from src.presentation.api.routes.comments import router as comments_router
 
@@ -11,7 +13,13 @@ from src.presentation.api.routes.comments import router as comments_router
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await db_connection.connect()
+    container = Container(db_connection)
+    app.state.container = container
+    await container.start()
+
     yield
+
+    await container.close()
     await db_connection.disconnect()
 
 
@@ -31,8 +39,13 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", SESSION_LSN_HEADER],
     )
 
+    # Чтения с реплик с учётом собственных записей клиента
+    if db_connection.config.database_replica_hosts:
+        add_session_consistency(app, db_connection)
+
     # Подключение маршрутов пользователей
     app.include_router(users_router)
 
@@ -44,6 +57,17 @@ def create_app() -> FastAPI:
     async def health_check():
         return {"status": "ok"}
 
+    # Внутренние метрики
+    @app.get("/metrics")
+    async def metrics(request: Request):
+        container = request.app.state.container
+        batcher = container.comment_write_batcher
+        return {
+            "database_pool": container.db.stats(),
+            "comment_cache": container.cache.stats() if container.cache else None,
+            "comment_write_batcher": batcher.stats() if batcher else None,
+        }
+
     return app
 
 
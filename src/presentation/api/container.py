@@ -0,0 +1,173 @@
+import asyncio
+import logging
+from contextlib import suppress
+from typing import Optional
+
+from src.application.use_cases.comment_use_cases import (
+    CreateCommentUseCase,
+    BulkCreateCommentsUseCase,
+    GetCommentsUseCase,
+    GetCommentsBatchUseCase,
+    GetCommentCountsUseCase,
+    ExportCommentsUseCase,
+    SearchCommentsUseCase,
+    UpdateCommentUseCase,
+    DeleteCommentUseCase,
+)
+from src.application.use_cases.user_use_cases import (
+    CreateUserUseCase,
+    GetUserUseCase,
+    GetAllUsersUseCase,
+    UpdateUserUseCase,
+    DeleteUserUseCase,
+    ImportUsersUseCase,
+    ExportUsersUseCase,
+)
+from src.infrastructure.cache.comment_page_cache import CommentPageCache, comment_page_cache
+from src.infrastructure.cache.idempotency_cache import IdempotencyCache
+from src.infrastructure.config import Settings, settings
+from src.infrastructure.database.connection import DatabaseConnection
+from src.infrastructure.messaging.comment_cache_invalidator import CommentCacheInvalidator
+from src.infrastructure.messaging.kafka_producer import KafkaEventProducer, create_event_producer
+from src.infrastructure.messaging.outbox_relay import OutboxRelay
+from src.infrastructure.repositories.comment_purger import CommentPurger
+from src.infrastructure.repositories.comment_write_batcher import CommentWriteBatcher
+from src.infrastructure.repositories.postgres_comment_repository import PostgresCommentRepository
+from src.infrastructure.repositories.postgres_outbox_repository import PostgresOutboxRepository
+from src.infrastructure.repositories.postgres_user_repository import PostgresUserRepository
+
+logger = logging.getLogger(__name__)
+
+
+class Container:
+    """
+    Долгоживущие объекты приложения: репозитории, use case'ы, Kafka-продюсер и фоновые задачи.
+    Создаётся один раз в lifespan после подключения к БД и кладётся в app.state.container;
+    зависимости маршрутов берут готовые объекты отсюда. В тестах контейнер можно собрать
+    без фоновых задач (start не вызывать) или подменить через dependency_overrides[get_container].
+    """
+
+    def __init__(
+            self,
+            db: DatabaseConnection,
+            config: Settings = settings,
+            producer: Optional[KafkaEventProducer] = None,
+            cache: Optional[CommentPageCache] = None,
+    ):
+        self.db = db
+        self.config = config
+        self.producer = producer
+        self.cache = cache if cache is not None else (comment_page_cache if config.comment_cache_enabled else None)
+
+        # ---------- USERS ----------
+        self.user_repository = PostgresUserRepository(db)
+        self.create_user_use_case = CreateUserUseCase(self.user_repository)
+        self.get_user_use_case = GetUserUseCase(self.user_repository)
+        self.get_all_users_use_case = GetAllUsersUseCase(self.user_repository)
+        self.update_user_use_case = UpdateUserUseCase(self.user_repository)
+        self.delete_user_use_case = DeleteUserUseCase(self.user_repository)
+        self.import_users_use_case = ImportUsersUseCase(
+            self.user_repository, max_reported_issues=config.user_import_max_reported_issues
+        )
+        self.export_users_use_case = ExportUsersUseCase(
+            self.user_repository, chunk_size=config.user_export_chunk_size
+        )
+
+        # ---------- COMMENTS ----------
+        self.comment_repository = PostgresCommentRepository(db)
+        self.outbox_repository = PostgresOutboxRepository(db)
+        self.comment_write_batcher: Optional[CommentWriteBatcher] = None
+        if config.comment_write_batching_enabled:
+            self.comment_write_batcher = CommentWriteBatcher(
+                self.comment_repository,
+                window_ms=config.comment_write_batch_window_ms,
+                max_batch_size=config.comment_write_batch_max_size,
+            )
+        self.idempotency_cache: Optional[IdempotencyCache] = None
+        if config.comment_idempotency_cache_max_entries > 0:
+            self.idempotency_cache = IdempotencyCache(
+                max_entries=config.comment_idempotency_cache_max_entries,
+                ttl_seconds=config.comment_idempotency_ttl_seconds,
+            )
+        self.create_comment_use_case = CreateCommentUseCase(
+            self.comment_write_batcher or self.comment_repository, self.cache, self.idempotency_cache
+        )
+        self.bulk_create_comments_use_case = BulkCreateCommentsUseCase(self.comment_repository, self.cache)
+        self.get_comments_use_case = GetCommentsUseCase(self.comment_repository, self.cache)
+        self.get_comments_batch_use_case = GetCommentsBatchUseCase(self.comment_repository)
+        self.export_comments_use_case = ExportCommentsUseCase(
+            self.comment_repository, chunk_size=config.comment_export_chunk_size
+        )
+        self.get_comment_counts_use_case = GetCommentCountsUseCase(self.comment_repository)
+        self.search_comments_use_case = SearchCommentsUseCase(self.comment_repository)
+        self.update_comment_use_case = UpdateCommentUseCase(self.comment_repository, self.cache)
+        self.delete_comment_use_case = DeleteCommentUseCase(self.comment_repository, self.cache)
+
+        self._invalidator: Optional[CommentCacheInvalidator] = None
+        self._relay_task: Optional[asyncio.Task] = None
+        self._idempotency_cleanup_task: Optional[asyncio.Task] = None
+        self._purge_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """
+        Запустить фоновые задачи: сброс кэша по событиям других реплик, relay outbox -> Kafka,
+        удаление просроченных ключей идемпотентности и очистку удалённых комментариев
+        """
+        if self.cache and self.config.comment_cache_invalidation_enabled:
+            self._invalidator = CommentCacheInvalidator(self.config.kafka_bootstrap_servers, self.cache)
+            self._invalidator.start()
+
+        if self.config.outbox_relay_enabled:
+            if self.producer is None:
+                self.producer = create_event_producer()
+            relay = OutboxRelay(
+                self.outbox_repository,
+                self.producer,
+                batch_size=self.config.outbox_batch_size,
+                poll_interval=self.config.outbox_poll_interval_seconds,
+            )
+            self._relay_task = asyncio.create_task(relay.run())
+
+        self._idempotency_cleanup_task = asyncio.create_task(self._cleanup_idempotency_keys())
+
+        if self.config.comment_purge_enabled:
+            purger = CommentPurger(
+                self.comment_repository,
+                retention_seconds=self.config.comment_purge_retention_seconds,
+                batch_size=self.config.comment_purge_batch_size,
+                batch_pause=self.config.comment_purge_batch_pause_seconds,
+                poll_interval=self.config.comment_purge_interval_seconds,
+            )
+            self._purge_task = asyncio.create_task(purger.run())
+
+    async def close(self) -> None:
+        for task in (self._relay_task, self._idempotency_cleanup_task, self._purge_task):
+            if task:
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+        self._relay_task = self._idempotency_cleanup_task = self._purge_task = None
+        if self.comment_write_batcher:
+            await self.comment_write_batcher.close()
+        if self.producer:
+            # flush только при остановке - в работе доставка асинхронная
+            self.producer.close()
+            self.producer = None
+        if self._invalidator:
+            self._invalidator.stop()
+            self._invalidator = None
+
+    async def _cleanup_idempotency_keys(self) -> None:
+        """
+        Периодически удалять ключи идемпотентности старше TTL небольшими пачками
+        """
+        while True:
+            try:
+                while await self.comment_repository.delete_expired_idempotency_keys(
+                    self.config.comment_idempotency_ttl_seconds,
+                    self.config.comment_idempotency_cleanup_batch_size,
+                ) == self.config.comment_idempotency_cleanup_batch_size:
+                    pass
+            except Exception:
+                logger.exception("Idempotency keys cleanup failed")
+            await asyncio.sleep(self.config.comment_idempotency_cleanup_interval_seconds)
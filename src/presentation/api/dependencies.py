@@ -1,76 +1,75 @@
-from fastapi import Depends
+from fastapi import Depends, Request
 
-from src.application.use_cases.user_use_cases import (
-    CreateUserUseCase,
-    GetUserUseCase,
-    GetAllUsersUseCase,
-    UpdateUserUseCase,
-    DeleteUserUseCase,
-)
+from src.presentation.api.container import Container
 
-from src.application.use_cases.comment_use_cases import (
-    CreateCommentUseCase,
-    GetCommentsUseCase,
-    UpdateCommentUseCase,
-)
 
-from src.infrastructure.database.connection import db_connection
-from src.infrastructure.repositories.postgres_user_repository import PostgresUserRepository
-from src.infrastructure.repositories.postgres_comment_repository import PostgresCommentRepository
-from src.infrastructure.messaging.kafka_producer import KafkaEventProducer
+def get_container(request: Request) -> Container:
+    return request.app.state.container
 
 
-# ---------- KAFKA ----------
-
-def get_event_producer() -> KafkaEventProducer:
-    return KafkaEventProducer(bootstrap_servers="localhost:9092")
+# ---------- USERS ----------
 
+def get_create_user_use_case(container: Container = Depends(get_container)):
+    return container.create_user_use_case
 
-# ---------- USERS ----------
 
-def get_user_repository():
-    return PostgresUserRepository(db_connection.pool)
+def get_get_user_use_case(container: Container = Depends(get_container)):
+    return container.get_user_use_case
 
 
-def get_create_user_use_case():
-    return CreateUserUseCase(get_user_repository())
+def get_get_all_users_use_case(container: Container = Depends(get_container)):
+    return container.get_all_users_use_case
 
 
-def get_get_user_use_case():
-    return GetUserUseCase(get_user_repository())
+def get_update_user_use_case(container: Container = Depends(get_container)):
+    return container.update_user_use_case
 
 
-def get_get_all_users_use_case():
-    return GetAllUsersUseCase(get_user_repository())
+def get_delete_user_use_case(container: Container = Depends(get_container)):
+    return container.delete_user_use_case
 
 
-def get_update_user_use_case():
-    return UpdateUserUseCase(get_user_repository())
+def get_import_users_use_case(container: Container = Depends(get_container)):
+    return container.import_users_use_case
 
 
-def get_delete_user_use_case():
-    return DeleteUserUseCase(get_user_repository())
+def get_export_users_use_case(container: Container = Depends(get_container)):
+    return container.export_users_use_case
 
 
 # ---------- COMMENTS ----------
 
-def get_comment_repository():
-    return PostgresCommentRepository(db_connection.pool)
+def get_create_comment_use_case(container: Container = Depends(get_container)):
+    return container.create_comment_use_case
+
+
+def get_bulk_create_comments_use_case(container: Container = Depends(get_container)):
+    return container.bulk_create_comments_use_case
+
+
+def get_get_comments_use_case(container: Container = Depends(get_container)):
+    return container.get_comments_use_case
+
+
+def get_get_comments_batch_use_case(container: Container = Depends(get_container)):
+    return container.get_comments_batch_use_case
+
+
+def get_export_comments_use_case(container: Container = Depends(get_container)):
+    return container.export_comments_use_case
+
+
+def get_get_comment_counts_use_case(container: Container = Depends(get_container)):
+    return container.get_comment_counts_use_case
 
 
-def get_create_comment_use_case(
-        repo=Depends(get_comment_repository),
-        producer=Depends(get_event_producer),
-):
-    return CreateCommentUseCase(repo, producer)
+def get_search_comments_use_case(container: Container = Depends(get_container)):
+    return container.search_comments_use_case
 
 
-def get_get_comments_use_case():
-    return GetCommentsUseCase(get_comment_repository())
+def get_update_comment_use_case(container: Container = Depends(get_container)):
+    return container.update_comment_use_case
 
 
-def get_update_comment_use_case(
-    repo = Depends(get_comment_repository),
-    producer = Depends(get_event_producer),
-):
-    return UpdateCommentUseCase(repo, producer)
+def get_delete_comment_use_case(container: Container = Depends(get_container)):
+    return container.delete_comment_use_case
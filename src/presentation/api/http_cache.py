@@ -0,0 +1,65 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Request
+
+
+def make_etag(revision: int, count: int, *params) -> str:
+    """
+    Слабый ETag по версии данных и параметрам запроса, определяющим содержимое ответа
+    """
+    digest = hashlib.blake2b(repr(params).encode("utf-8"), digest_size=6).hexdigest()
+    return f'W/"{revision}-{count}-{digest}"'
+
+
+def validator_headers(etag: str, last_modified: datetime) -> Dict[str, str]:
+    headers = {
+        "ETag": etag,
+        # Клиент может хранить ответ, но обязан перепроверять его при каждом запросе
+        "Cache-Control": "no-cache",
+    }
+    if _settled(last_modified):
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    """
+    Проверка If-None-Match / If-Modified-Since по RFC 9110:
+    при наличии If-None-Match заголовок If-Modified-Since игнорируется
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        return _weak(etag) in {_weak(tag.strip()) for tag in if_none_match.split(",")}
+
+    if_modified_since = _parse_http_date(request.headers.get("if-modified-since"))
+    if if_modified_since is None or not _settled(last_modified):
+        return False
+    return last_modified.replace(microsecond=0) <= if_modified_since
+
+
+def _settled(last_modified: datetime) -> bool:
+    """
+    HTTP-дата точна до секунды: пока секунда последней записи не закончилась, следующая
+    запись получит ту же дату, и If-Modified-Since вернул бы 304 на устаревшую копию.
+    До этого момента Last-Modified не выдаётся и не проверяется - остаётся только ETag
+    """
+    return last_modified.replace(microsecond=0) + timedelta(seconds=1) <= datetime.now(timezone.utc)
+
+
+def _weak(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
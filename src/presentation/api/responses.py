@@ -0,0 +1,59 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+from src.application.use_cases.comment_use_cases import BulkCreateResult
+from src.domain.entities.comment import Comment
+from src.presentation.schemas.comment_schemas import CommentOutSchema
+
+# Быстрый путь сериализации комментариев.
+# response_model у маршрутов остаётся для OpenAPI, но ответ собирается сразу в байты:
+# доменные объекты не валидируются повторно через CommentOutSchema и не проходят
+# через jsonable_encoder. Набор полей берётся из CommentOutSchema.
+_COMMENT_FIELDS = set(CommentOutSchema.model_fields)
+
+
+@dataclass
+class CommentBatchItem:
+    entity_type: str
+    entity_id: str
+    comments: List[Comment]
+    next_cursor: Optional[str]
+
+
+_comment_adapter = TypeAdapter(Comment)
+_comment_list_adapter = TypeAdapter(List[Comment])
+_batch_adapter = TypeAdapter(List[CommentBatchItem])
+_bulk_result_adapter = TypeAdapter(BulkCreateResult)
+
+
+def dump_comment(comment: Comment) -> bytes:
+    return _comment_adapter.dump_json(comment, include=_COMMENT_FIELDS)
+
+
+def dump_comments(comments: List[Comment]) -> bytes:
+    return _comment_list_adapter.dump_json(comments, include={"__all__": _COMMENT_FIELDS})
+
+
+def comment_response(comment: Comment, status_code: int = 200) -> Response:
+    return Response(dump_comment(comment), status_code=status_code, media_type="application/json")
+
+
+def comments_response(comments: List[Comment], headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(dump_comments(comments), headers=headers, media_type="application/json")
+
+
+def comment_batch_response(items: List[CommentBatchItem]) -> Response:
+    include = {"entity_type": True, "entity_id": True, "next_cursor": True,
+               "comments": {"__all__": _COMMENT_FIELDS}}
+    body = _batch_adapter.dump_json(items, include={"__all__": include})
+    return Response(body, media_type="application/json")
+
+
+def bulk_create_response(result: BulkCreateResult) -> Response:
+    body = _bulk_result_adapter.dump_json(
+        result, include={"created": {"__all__": _COMMENT_FIELDS}, "errors": True}
+    )
+    return Response(body, media_type="application/json")
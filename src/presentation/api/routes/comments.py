@@ -1,66 +1,279 @@
-from typing import List
+from contextlib import aclosing
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
 
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
 
 from src.application.use_cases.comment_use_cases import (
+    MAX_REPLY_DEPTH,
     CreateCommentUseCase,
+    BulkCreateCommentsUseCase,
     GetCommentsUseCase,
+    GetCommentsBatchUseCase,
+    GetCommentCountsUseCase,
+    ExportCommentsUseCase,
+    SearchCommentsUseCase,
     UpdateCommentUseCase,
+    DeleteCommentUseCase,
 )
+from src.domain.entities.comment import Comment
 from src.domain.exceptions import (
+    CommentDeleted,
     CommentNotFound,
     CommentValidationError,
+    CommentVersionConflict,
     EntityNotFound,
+    IdempotencyKeyConflict,
+    IdempotencyKeyReused,
+    InvalidCursor,
+    ParentCommentNotFound,
 )
 from src.presentation.schemas.comment_schemas import (
     CommentCreateSchema,
     CommentUpdateSchema,
     CommentOutSchema,
+    CommentCountSchema,
+    CommentBatchRequestSchema,
+    CommentBatchItemSchema,
+    CommentBulkCreateSchema,
+    CommentBulkCreateResultSchema,
 )
+from src.presentation.api.responses import (
+    CommentBatchItem,
+    bulk_create_response,
+    comment_batch_response,
+    comment_response,
+    comments_response,
+    dump_comment,
+)
+from src.presentation.api.http_cache import is_not_modified, make_etag, validator_headers
+from src.presentation.api.session_consistency import read_only
 from src.presentation.api.dependencies import (
     get_create_comment_use_case,
+    get_bulk_create_comments_use_case,
     get_get_comments_use_case,
+    get_get_comments_batch_use_case,
+    get_get_comment_counts_use_case,
+    get_export_comments_use_case,
+    get_search_comments_use_case,
     get_update_comment_use_case,
+    get_delete_comment_use_case,
 )
 
 router = APIRouter(prefix="/comments", tags=["comments"])
 
+MAX_COUNT_ENTITIES = 200
+MAX_SEARCH_LIMIT = 100
+MAX_REPLIES_LIMIT = 100
+MAX_THREAD_SIZE = 5000
+MAX_PAGE_SIZE = 100
+
 
 @router.post("/", response_model=CommentOutSchema)
 async def create_comment(
     payload: CommentCreateSchema,
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255),
     use_case: CreateCommentUseCase = Depends(get_create_comment_use_case),
 ):
     try:
-        return await use_case.execute(
+        comment = await use_case.execute(
             entity_type=payload.entity_type,
             entity_id=payload.entity_id,
             author_id=payload.author_id,
             text=payload.text,
+            idempotency_key=idempotency_key,
+            parent_id=payload.parent_id,
         )
     except CommentValidationError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except (CommentNotFound, ParentCommentNotFound) as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except CommentDeleted as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IdempotencyKeyConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return comment_response(comment)
+
+
+@router.post("/bulk", response_model=CommentBulkCreateResultSchema)
+async def bulk_create_comments(
+    payload: CommentBulkCreateSchema,
+    use_case: BulkCreateCommentsUseCase = Depends(get_bulk_create_comments_use_case),
+):
+    result = await use_case.execute(payload.comments)
+    return bulk_create_response(result)
 
 
 @router.get("/", response_model=List[CommentOutSchema])
 async def get_comments(
+    request: Request,
     entity_type: str = Query(...),
     entity_id: str = Query(...),
     page: int = Query(1, ge=1),
-    limit: int = Query(10, ge=1),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
     sort: str = Query("desc", pattern="^(asc|desc)$"),
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor предыдущей страницы"),
+    depth: Optional[int] = Query(
+        None, ge=0, le=MAX_REPLY_DEPTH,
+        description="Страница корневых комментариев с ответами до этого уровня; без него - все комментарии подряд",
+    ),
+    replies_limit: int = Query(3, ge=1, le=MAX_REPLIES_LIMIT, description="Сколько первых ответов брать на каждом уровне"),
     use_case: GetCommentsUseCase = Depends(get_get_comments_use_case),
 ):
+    params = dict(
+        entity_type=entity_type,
+        entity_id=entity_id,
+        page=page,
+        limit=limit,
+        sort=sort,
+        cursor=cursor,
+        depth=depth,
+        replies_limit=replies_limit,
+    )
     try:
-        return await use_case.execute(
+        # Валидатор читается до страницы: если между ними придёт запись, клиент получит более
+        # новые данные со старым ETag и перезапросит их - в кэш такая страница не попадает
+        version = await use_case.get_version(**params)
+        headers = {}
+        if version and version.count:
+            etag = make_etag(version.revision, version.count, sort, page, limit, cursor, depth, replies_limit)
+            headers = validator_headers(etag, version.last_modified_at)
+            if is_not_modified(request, etag, version.last_modified_at):
+                return Response(status_code=304, headers=headers)
+
+        result = await use_case.execute(**params, version=version)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except EntityNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    if result.next_cursor:
+        headers["X-Next-Cursor"] = result.next_cursor
+    if result.truncated:
+        headers["X-Truncated"] = "true"
+    return comments_response(result.items, headers=headers)
+
+
+@router.post("/batch", response_model=List[CommentBatchItemSchema])
+@read_only
+async def get_comments_batch(
+    payload: CommentBatchRequestSchema,
+    use_case: GetCommentsBatchUseCase = Depends(get_get_comments_batch_use_case),
+):
+    pages = await use_case.execute(
+        keys=[(entity.entity_type, entity.entity_id) for entity in payload.entities],
+        limit=payload.limit,
+        sort=payload.sort,
+    )
+    return comment_batch_response([
+        CommentBatchItem(
             entity_type=entity_type,
             entity_id=entity_id,
-            page=page,
+            comments=page.items,
+            next_cursor=page.next_cursor,
+        )
+        for (entity_type, entity_id), page in pages.items()
+    ])
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}}},
+)
+async def export_comments(
+    entity_type: str = Query(...),
+    since: Optional[datetime] = Query(None, description="Только комментарии с updated_at >= since"),
+    use_case: ExportCommentsUseCase = Depends(get_export_comments_use_case),
+):
+    return StreamingResponse(
+        _to_ndjson(use_case.execute(entity_type=entity_type, since=since)),
+        media_type="application/x-ndjson",
+    )
+
+
+async def _to_ndjson(chunks: AsyncIterator[List[Comment]]) -> AsyncIterator[bytes]:
+    # При обрыве соединения ответ закрывают через aclose - сразу закрываем и чтение из БД,
+    # чтобы транзакция с серверным курсором и соединение вернулись в пул, а не ждали сборщика мусора
+    async with aclosing(chunks):
+        async for comments in chunks:
+            yield b"".join(dump_comment(comment) + b"\n" for comment in comments)
+
+
+@router.get("/count", response_model=List[CommentCountSchema])
+async def get_comment_counts(
+    entity: List[str] = Query(..., description="Сущность в формате entity_type:entity_id, можно повторять"),
+    use_case: GetCommentCountsUseCase = Depends(get_get_comment_counts_use_case),
+):
+    if len(entity) > MAX_COUNT_ENTITIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_COUNT_ENTITIES} entities per request")
+
+    keys = []
+    for value in entity:
+        entity_type, sep, entity_id = value.partition(":")
+        if not sep or not entity_type or not entity_id:
+            raise HTTPException(status_code=400, detail=f"Invalid entity: {value}")
+        keys.append((entity_type, entity_id))
+
+    counts = await use_case.execute(keys)
+    return [
+        CommentCountSchema(entity_type=entity_type, entity_id=entity_id, count=counts[(entity_type, entity_id)])
+        for entity_type, entity_id in dict.fromkeys(keys)
+    ]
+
+
+@router.get("/search", response_model=List[CommentOutSchema])
+async def search_comments(
+    q: str = Query(..., description='Запрос: слова, "точная фраза", or, -исключение'),
+    entity_type: Optional[str] = Query(None),
+    author_id: Optional[str] = Query(None),
+    created_from: Optional[datetime] = Query(None, description="Только комментарии с created_at >= created_from"),
+    created_to: Optional[datetime] = Query(None, description="Только комментарии с created_at < created_to"),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_LIMIT),
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor предыдущей страницы"),
+    use_case: SearchCommentsUseCase = Depends(get_search_comments_use_case),
+):
+    try:
+        result = await use_case.execute(
+            query=q,
             limit=limit,
-            sort=sort,
+            entity_type=entity_type,
+            author_id=author_id,
+            created_from=created_from,
+            created_to=created_to,
+            cursor=cursor,
         )
-    except EntityNotFound as e:
+    except (CommentValidationError, InvalidCursor) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    headers = {"X-Next-Cursor": result.next_cursor} if result.next_cursor else {}
+    return comments_response(result.items, headers=headers)
+
+
+@router.get("/{comment_id}/thread", response_model=List[CommentOutSchema])
+async def get_comment_thread(
+    comment_id: str,
+    depth: Optional[int] = Query(None, ge=0, description="Сколько уровней ответов брать; без него - все"),
+    replies_limit: Optional[int] = Query(
+        None, ge=1, le=MAX_REPLIES_LIMIT, description="Сколько первых ответов брать на каждом уровне; без него - все"
+    ),
+    limit: int = Query(1000, ge=1, le=MAX_THREAD_SIZE),
+    use_case: GetCommentsUseCase = Depends(get_get_comments_use_case),
+):
+    """
+    Комментарий и его ветка в порядке обхода в глубину, одним запросом.
+    Если ветка не поместилась в limit, ответ усечён и содержит заголовок X-Truncated: true
+    """
+    try:
+        thread = await use_case.get_thread(comment_id, depth=depth, replies_limit=replies_limit, limit=limit)
+    except CommentValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except CommentNotFound as e:
         raise HTTPException(status_code=404, detail=str(e))
+    return comments_response(thread.items, headers={"X-Truncated": "true"} if thread.truncated else None)
 
 
 @router.put("/", response_model=CommentOutSchema)
@@ -69,11 +282,33 @@ async def update_comment(
     use_case: UpdateCommentUseCase = Depends(get_update_comment_use_case),
 ):
     try:
-        return await use_case.execute(
+        comment = await use_case.execute(
             comment_id=payload.comment_id,
             entity_type=payload.entity_type,
             entity_id=payload.entity_id,
             new_text=payload.new_text,
+            version=payload.version,
         )
-    except (CommentNotFound, CommentValidationError, EntityNotFound) as e:
+    except CommentValidationError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except CommentNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except CommentVersionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return comment_response(comment)
+
+
+@router.delete("/{comment_id}", status_code=204)
+async def delete_comment(
+    comment_id: str,
+    use_case: DeleteCommentUseCase = Depends(get_delete_comment_use_case),
+):
+    """
+    Удалить комментарий вместе с ответами на него. Строки помечаются удалёнными
+    и сразу пропадают из чтения, физически их удаляет фоновая очистка.
+    """
+    try:
+        await use_case.execute(comment_id)
+    except CommentNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return Response(status_code=204)
@@ -1,13 +1,19 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from dataclasses import asdict
+from typing import AsyncIterator, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 
 from src.application.use_cases.user_use_cases import (
+    MAX_USERS_PAGE_SIZE,
     CreateUserUseCase,
     GetUserUseCase,
     GetAllUsersUseCase,
     UpdateUserUseCase,
     DeleteUserUseCase,
+    ImportUsersUseCase,
+    ExportUsersUseCase,
 )
+from src.domain.entities.user import User
 from src.domain.exceptions import EntityAlreadyExists, EntityNotFound, ValidationError
 from src.presentation.api.dependencies import (
     get_create_user_use_case,
@@ -15,12 +21,16 @@ from src.presentation.api.dependencies import (
     get_get_all_users_use_case,
     get_update_user_use_case,
     get_delete_user_use_case,
+    get_import_users_use_case,
+    get_export_users_use_case,
 )
 from src.presentation.schemas.user_schemas import (
     UserCreateRequest,
     UserUpdateRequest,
     UserResponse,
+    UserImportResponse,
 )
+from src.presentation.csv_stream import iter_csv_rows, iter_file_chunks, spool
 
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -46,6 +56,56 @@ async def create_user(
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
 
 
+@router.post(
+    "/import",
+    response_model=UserImportResponse,
+    openapi_extra={
+        "requestBody": {
+            "content": {"text/csv": {"schema": {"type": "string"}}},
+            "required": True,
+        }
+    },
+)
+async def import_users(
+    request: Request,
+    use_case: ImportUsersUseCase = Depends(get_import_users_use_case),
+):
+    """
+    Массовый импорт из CSV (email,name; строка заголовка необязательна).
+    Тело сначала целиком принимается во временный файл, затем потоком копируется в БД:
+    транзакция импорта не зависит от скорости загрузки. Существующие email не перезаписываются,
+    а возвращаются в issues.
+    """
+    max_memory_size = request.app.state.container.config.user_import_spool_max_memory_bytes
+    try:
+        with await spool(request.stream(), max_memory_size) as upload:
+            result = await use_case.execute(iter_csv_rows(iter_file_chunks(upload), header=("email", "name")))
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="CSV must be UTF-8")
+    return UserImportResponse(**asdict(result))
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}}},
+)
+async def export_users(
+    use_case: ExportUsersUseCase = Depends(get_export_users_use_case),
+):
+    """
+    Все пользователи по возрастанию id, по одному JSON-объекту на строку
+    """
+    return StreamingResponse(_to_ndjson(use_case.execute()), media_type="application/x-ndjson")
+
+
+async def _to_ndjson(chunks: AsyncIterator[List[User]]) -> AsyncIterator[bytes]:
+    async for users in chunks:
+        yield "".join(
+            UserResponse.model_validate(user).model_dump_json() + "\n" for user in users
+        ).encode("utf-8")
+
+
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: int,
@@ -66,11 +126,14 @@ async def get_user(
 
 @router.get("/", response_model=List[UserResponse])
 async def get_all_users(
-    limit: int = 100,
-    offset: int = 0,
+    limit: int = Query(100, ge=1, le=MAX_USERS_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    after_id: Optional[int] = Query(
+        None, description="id последнего пользователя предыдущей страницы; с ним offset не используется"
+    ),
     use_case: GetAllUsersUseCase = Depends(get_get_all_users_use_case),
 ):
-    users = await use_case.execute(limit=limit, offset=offset)
+    users = await use_case.execute(limit=limit, offset=offset, after_id=after_id)
     return [
         UserResponse(
             id=user.id,
@@ -0,0 +1,68 @@
+from typing import Callable, TypeVar
+
+from fastapi import FastAPI, Request
+from starlette.routing import Match
+
+from src.infrastructure.database.connection import DatabaseConnection, ReadSession, parse_lsn, read_session
+
+# Токен сессии: LSN основного сервера после записи клиента. Клиент возвращает его
+# в следующих запросах, и чтение не уходит на реплику, которая его ещё не применила.
+SESSION_LSN_HEADER = "X-Session-LSN"
+
+_SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+_Endpoint = TypeVar("_Endpoint", bound=Callable)
+
+
+def read_only(endpoint: _Endpoint) -> _Endpoint:
+    """
+    Пометить обработчик не-GET маршрута, который только читает (POST с телом-запросом):
+    его чтения идут на реплики, а токен сессии он не выдаёт
+    """
+    endpoint.read_only = True
+    return endpoint
+
+
+def add_session_consistency(app: FastAPI, db: DatabaseConnection) -> None:
+    """
+    Подключить маршрутизацию чтений по ReadSession; нужна только при настроенных репликах
+    """
+
+    @app.middleware("http")
+    async def session_consistency(request: Request, call_next):
+        if not db.replicas:
+            return await call_next(request)
+
+        writes = request.method not in _SAFE_METHODS and not _is_read_only(request)
+        if writes:
+            # Чтения внутри записи (проверки перед update/delete) - только с основного сервера
+            session = ReadSession(pool=db.pool)
+        else:
+            session = ReadSession(min_lsn=_parse_token(request.headers.get(SESSION_LSN_HEADER)))
+
+        token = read_session.set(session)
+        try:
+            response = await call_next(request)
+        finally:
+            read_session.reset(token)
+
+        if writes and response.status_code < 400:
+            response.headers[SESSION_LSN_HEADER] = await db.current_lsn()
+        return response
+
+
+def _parse_token(value) -> int:
+    if not value:
+        return 0
+    try:
+        return parse_lsn(value)
+    except ValueError:
+        return 0
+
+
+def _is_read_only(request: Request) -> bool:
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return getattr(getattr(route, "endpoint", None), "read_only", False)
+    return False
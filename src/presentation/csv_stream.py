@@ -0,0 +1,67 @@
+import csv
+import tempfile
+from typing import AsyncIterable, AsyncIterator, BinaryIO, List, Optional, Sequence, Tuple
+
+CHUNK_SIZE = 64 * 1024
+
+
+async def iter_csv_rows(
+        chunks: AsyncIterable[bytes], header: Sequence[str] = ()
+) -> AsyncIterator[Tuple[int, Optional[List[str]]]]:
+    """
+    Разобрать CSV из потока байтов построчно, не держа весь файл в памяти.
+    Возвращает пары (номер строки файла, поля); пустые строки пропускаются,
+    первая строка пропускается, если совпадает с header.
+    Поля с переводом строки внутри кавычек не поддерживаются: такая строка,
+    как и любая другая с неверными кавычками, возвращается с полями None.
+    """
+    buffer = b""
+    line_number = 0
+    expected_header = [column.lower() for column in header]
+
+    def parse(raw: bytes):
+        nonlocal line_number
+        line_number += 1
+        text = raw.decode("utf-8-sig" if line_number == 1 else "utf-8").rstrip("\r")
+        if not text.strip():
+            return None
+        try:
+            row = next(csv.reader([text], strict=True))
+        except csv.Error:
+            return line_number, None
+        if line_number == 1 and [cell.strip().lower() for cell in row] == expected_header:
+            return None
+        return line_number, row
+
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for raw in lines:
+            parsed = parse(raw)
+            if parsed:
+                yield parsed
+    if buffer:
+        parsed = parse(buffer)
+        if parsed:
+            yield parsed
+
+
+async def spool(chunks: AsyncIterable[bytes], max_memory_size: int) -> BinaryIO:
+    """
+    Дочитать поток целиком во временный файл: до max_memory_size байт в памяти, дальше на диске.
+    Файл возвращается перемотанным в начало, закрыть его должен вызывающий
+    """
+    file = tempfile.SpooledTemporaryFile(max_size=max_memory_size)
+    try:
+        async for chunk in chunks:
+            file.write(chunk)
+    except BaseException:
+        file.close()
+        raise
+    file.seek(0)
+    return file
+
+
+async def iter_file_chunks(file: BinaryIO, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    while chunk := file.read(chunk_size):
+        yield chunk
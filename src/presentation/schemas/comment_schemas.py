@@ -1,13 +1,16 @@
 from datetime import datetime
+from typing import Any, List, Optional
 from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 
 class CommentCreateSchema(BaseModel):
     entity_type: str
     entity_id: str
     author_id: str
     text: str
+    # Комментарий той же сущности, на который это ответ
+    parent_id: Optional[str] = None
 
 
 class CommentUpdateSchema(BaseModel):
@@ -15,9 +18,13 @@ class CommentUpdateSchema(BaseModel):
     entity_type: str
     entity_id: str
     new_text: str
+    # Версия, которую видел клиент; без неё изменение применяется безусловно
+    version: Optional[int] = Field(None, ge=1)
 
 
 class CommentOutSchema(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: UUID
     entity_type: str
     entity_id: str
@@ -25,4 +32,46 @@ class CommentOutSchema(BaseModel):
     text: str
     created_at: datetime
     updated_at: datetime
+    version: int
+    parent_id: Optional[UUID] = None
+
+
+
+class CommentCountSchema(BaseModel):
+    entity_type: str
+    entity_id: str
+    count: int
+
+
+class EntityKeySchema(BaseModel):
+    entity_type: str
+    entity_id: str
+
+
+class CommentBatchRequestSchema(BaseModel):
+    entities: List[EntityKeySchema] = Field(..., min_length=1, max_length=100)
+    limit: int = Field(10, ge=1, le=100)
+    sort: str = Field("desc", pattern="^(asc|desc)$")
+
+
+class CommentBatchItemSchema(BaseModel):
+    entity_type: str
+    entity_id: str
+    comments: List[CommentOutSchema]
+    next_cursor: Optional[str] = None
+
+
+class CommentBulkCreateSchema(BaseModel):
+    # Элементы в формате CommentCreateSchema. Форма каждого проверяется отдельно,
+    # чтобы один кривой элемент попал в errors, а не отклонил всю пачку
+    comments: List[Any] = Field(..., min_length=1, max_length=5000)
+
+
+class CommentBulkErrorSchema(BaseModel):
+    index: int
+    error: str
+
 
+class CommentBulkCreateResultSchema(BaseModel):
+    created: List[CommentOutSchema]
+    errors: List[CommentBulkErrorSchema]
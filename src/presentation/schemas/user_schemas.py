@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, EmailStr, ConfigDict
 
 
@@ -22,3 +22,16 @@ class UserResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
+
+class UserImportIssueResponse(BaseModel):
+    line: int
+    email: str
+    reason: str
+
+
+class UserImportResponse(BaseModel):
+    total: int
+    created: int
+    conflicts: int
+    invalid: int
+    issues: List[UserImportIssueResponse]
@@ -2,30 +2,56 @@ import pytest_asyncio
 from httpx import AsyncClient, ASGITransport
 from fastapi import FastAPI
 
+from src.infrastructure.cache.comment_page_cache import comment_page_cache
 from src.infrastructure.database.connection import db_connection
+from src.presentation.api.container import Container
 from src.presentation.api.routes.users import router as users_router
+from src.presentation.api.routes.comments import router as comments_router
+
+
+class FakeEventProducer:
+    def __init__(self):
+        self.published = []
+
+    async def publish_many_async(self, topic: str, messages) -> bool:
+        for key, event in messages:
+            self.published.append((topic, key, event))
+        return True
 
 
 @pytest_asyncio.fixture(scope="function")
-async def client():
+async def event_producer():
+    return FakeEventProducer()
+
+
+@pytest_asyncio.fixture(scope="function")
+async def app():
     if db_connection.pool:
         db_connection.pool = None
     
     await db_connection.connect()
+    comment_page_cache.clear()
     
     app = FastAPI(title="Test App")
     app.include_router(users_router)
+    app.include_router(comments_router)
+    # Контейнер без фоновых задач: relay и консьюмер кэша в тестах не запускаются
+    app.state.container = Container(db_connection)
     
     pool = db_connection.pool
     async with pool.acquire() as conn:
-        await conn.execute("truncate table users cascade;")
+        await conn.execute("truncate table users, comments, comment_counts, outbox, comment_idempotency_keys cascade;")
+    
+    yield app
     
+    async with pool.acquire() as conn:
+        await conn.execute("truncate table users, comments, comment_counts, outbox, comment_idempotency_keys cascade;")
+
+
+@pytest_asyncio.fixture(scope="function")
+async def client(app):
     async with AsyncClient(
         transport=ASGITransport(app=app),
         base_url="http://test"
     ) as ac:
         yield ac
-    
-    async with pool.acquire() as conn:
-        await conn.execute("truncate table users cascade;")
-
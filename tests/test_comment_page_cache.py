@@ -0,0 +1,65 @@
+from src.infrastructure.cache.comment_page_cache import CommentPageCache
+
+
+def _cache(**kwargs) -> CommentPageCache:
+    options = {"max_entries": 10, "max_bytes": 1000, "ttl_seconds": 60.0}
+    options.update(kwargs)
+    return CommentPageCache(**options)
+
+
+def test_get_put_counts_hits_and_misses():
+    cache = _cache()
+    key = ("post", "1", "desc", 10)
+
+    assert cache.get(key) is None
+    cache.put(key, "page", 10, cache.generation("post", "1"))
+    assert cache.get(key) == "page"
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["bytes"]) == (1, 1, 1, 10)
+
+
+def test_evicts_least_recently_used_by_entries_and_bytes():
+    cache = _cache(max_entries=2, max_bytes=100)
+    for entity_id in ("1", "2"):
+        cache.put(("post", entity_id, "desc", 10), entity_id, 40, cache.generation("post", entity_id))
+    cache.get(("post", "1", "desc", 10))
+
+    cache.put(("post", "3", "desc", 10), "3", 40, cache.generation("post", "3"))
+    assert cache.get(("post", "2", "desc", 10)) is None
+    assert cache.get(("post", "1", "desc", 10)) == "1"
+
+    cache.put(("post", "4", "desc", 10), "4", 90, cache.generation("post", "4"))
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["evictions"] == 3
+
+
+def test_expired_entry_is_a_miss():
+    cache = _cache(ttl_seconds=0)
+    key = ("post", "1", "desc", 10)
+    cache.put(key, "page", 10, cache.generation("post", "1"))
+
+    assert cache.get(key) is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_invalidate_drops_all_pages_of_entity():
+    cache = _cache()
+    for limit in (10, 20):
+        cache.put(("post", "1", "desc", limit), "page", 10, cache.generation("post", "1"))
+    cache.put(("post", "2", "desc", 10), "other", 10, cache.generation("post", "2"))
+
+    cache.invalidate("post", "1")
+    assert cache.get(("post", "1", "desc", 10)) is None
+    assert cache.get(("post", "1", "desc", 20)) is None
+    assert cache.get(("post", "2", "desc", 10)) == "other"
+
+
+def test_put_after_concurrent_invalidation_is_ignored():
+    cache = _cache()
+    key = ("post", "1", "desc", 10)
+    generation = cache.generation("post", "1")
+
+    cache.invalidate("post", "1")
+    cache.put(key, "stale", 10, generation)
+    assert cache.get(key) is None
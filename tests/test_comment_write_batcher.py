@@ -0,0 +1,74 @@
+import asyncio
+from datetime import datetime
+from uuid import UUID
+
+import asyncpg
+
+from src.domain.entities.comment import Comment
+from src.domain.ids import uuid7
+from src.infrastructure.database.connection import db_connection
+from src.infrastructure.repositories.comment_write_batcher import CommentWriteBatcher
+from src.infrastructure.repositories.postgres_comment_repository import PostgresCommentRepository
+
+
+def _comment(text: str, comment_id: UUID = None, now: datetime = None) -> Comment:
+    now = now or datetime.now()
+    return Comment(
+        id=comment_id or uuid7(now),
+        entity_type="post",
+        entity_id="1",
+        author_id="author",
+        text=text,
+        created_at=now,
+        updated_at=now,
+    )
+
+
+async def test_concurrent_creates_share_one_batch(client):
+    repo = PostgresCommentRepository(db_connection)
+    batcher = CommentWriteBatcher(repo, window_ms=50, max_batch_size=100)
+
+    comments = [_comment(f"comment {i}") for i in range(10)]
+    saved = await asyncio.gather(*(batcher.create(c) for c in comments))
+
+    assert [s.text for s in saved] == [c.text for c in comments]
+    stats = batcher.stats()
+    assert stats["batches"] == 1
+    assert stats["rows"] == 10
+    assert stats["batch_size_histogram"]["le_16"] == 1
+    assert await repo.get_counts([("post", "1")]) == {("post", "1"): 10}
+
+
+async def test_full_batch_is_written_without_waiting_for_window(client):
+    repo = PostgresCommentRepository(db_connection)
+    batcher = CommentWriteBatcher(repo, window_ms=60_000, max_batch_size=3)
+
+    saved = await asyncio.wait_for(
+        asyncio.gather(*(batcher.create(_comment(f"comment {i}")) for i in range(3))), timeout=5
+    )
+    assert len(saved) == 3
+    assert batcher.stats()["batch_size_histogram"]["le_3"] == 1
+
+
+async def test_failed_batch_falls_back_to_single_inserts(client):
+    repo = PostgresCommentRepository(db_connection)
+    batcher = CommentWriteBatcher(repo, window_ms=50, max_batch_size=100)
+
+    # Повтор той же записи: первичный ключ секционированной таблицы - (id, created_at)
+    now = datetime.now()
+    duplicate_id = uuid7(now)
+    results = await asyncio.gather(
+        batcher.create(_comment("first", duplicate_id, now)),
+        batcher.create(_comment("second", duplicate_id, now)),
+        batcher.create(_comment("third")),
+        return_exceptions=True,
+    )
+
+    # Какая из двух копий вставится первой, порядок одиночных вставок не гарантирует
+    saved = [result for result in results if isinstance(result, Comment)]
+    failed = [result for result in results if not isinstance(result, Comment)]
+    assert len(failed) == 1 and isinstance(failed[0], asyncpg.UniqueViolationError)
+    assert {comment.id for comment in saved} == {duplicate_id, results[2].id}
+    assert {comment.text for comment in saved} - {"first", "second"} == {"third"}
+    assert batcher.stats()["fallbacks"] == 1
+    assert await repo.get_counts([("post", "1")]) == {("post", "1"): 2}
@@ -0,0 +1,797 @@
+import asyncio
+import base64
+import hashlib
+import json
+import warnings
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from httpx import AsyncClient
+from starlette.requests import Request
+
+from src.application.use_cases import comment_use_cases
+from src.domain.ids import uuid7
+from src.infrastructure.database.connection import db_connection
+from src.infrastructure.messaging.outbox_relay import OutboxRelay
+from src.infrastructure.repositories.comment_purger import CommentPurger
+from src.infrastructure.repositories.postgres_outbox_repository import (
+    _SHARD, OUTBOX_LOCK_CLASS, PostgresOutboxRepository,
+)
+from src.presentation.api.responses import dump_comments
+from src.presentation.api.http_cache import is_not_modified, validator_headers
+from src.presentation.api.routes.comments import _to_ndjson
+
+
+async def _create_comments(client: AsyncClient, count: int, entity_id: str = "1"):
+    created = []
+    for i in range(count):
+        response = await client.post("/comments/", json={
+            "entity_type": "post",
+            "entity_id": entity_id,
+            "author_id": "author",
+            "text": f"comment {i}",
+        })
+        assert response.status_code == 200
+        created.append(response.json())
+    return created
+
+
+async def _relay_outbox(event_producer) -> int:
+    """
+    Отправить всё, что relay может взять сейчас: за один проход он берёт одну секцию outbox
+    """
+    relay = OutboxRelay(PostgresOutboxRepository(db_connection), event_producer)
+    total = 0
+    while sent := await relay.relay_once():
+        total += sent
+    return total
+
+
+async def test_create_comment(client: AsyncClient, event_producer):
+    response = await client.post("/comments/", json={
+        "entity_type": "post",
+        "entity_id": "1",
+        "author_id": "author",
+        "text": "Hello",
+    })
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["text"] == "Hello"
+    assert "id" in data
+
+    assert await _relay_outbox(event_producer) == 1
+    topic, key, event = event_producer.published[0]
+    assert (topic, key, event["action"]) == ("comment.changed", data["id"], "created")
+    assert event["published_at"] >= event["occurred_at"]
+    assert await _relay_outbox(event_producer) == 0
+
+
+async def test_create_comment_empty_text(client: AsyncClient):
+    response = await client.post("/comments/", json={
+        "entity_type": "post",
+        "entity_id": "1",
+        "author_id": "author",
+        "text": "   ",
+    })
+    assert response.status_code == 400
+
+
+async def test_get_comments_paginated(client: AsyncClient):
+    created = await _create_comments(client, 5)
+
+    response = await client.get(
+        "/comments/", params={"entity_type": "post", "entity_id": "1", "limit": 2, "page": 2}
+    )
+    assert response.status_code == 200
+    assert [c["id"] for c in response.json()] == [created[2]["id"], created[1]["id"]]
+
+    response = await client.get(
+        "/comments/",
+        params={"entity_type": "post", "entity_id": "1", "limit": 2, "sort": "asc"},
+    )
+    assert [c["id"] for c in response.json()] == [created[0]["id"], created[1]["id"]]
+
+
+async def test_get_comments_page_out_of_range(client: AsyncClient):
+    await _create_comments(client, 1)
+
+    response = await client.get(
+        "/comments/", params={"entity_type": "post", "entity_id": "1", "page": 5}
+    )
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+async def test_get_comments_entity_not_found(client: AsyncClient):
+    response = await client.get("/comments/", params={"entity_type": "post", "entity_id": "404"})
+    assert response.status_code == 404
+
+
+async def test_update_comment(client: AsyncClient):
+    created = (await _create_comments(client, 1))[0]
+
+    response = await client.put("/comments/", json={
+        "comment_id": created["id"],
+        "entity_type": "post",
+        "entity_id": "1",
+        "new_text": "Edited",
+    })
+    assert response.status_code == 200
+    assert response.json()["text"] == "Edited"
+    assert response.json()["version"] == 2
+
+
+async def test_update_comment_version_conflict(client: AsyncClient, event_producer):
+    created = (await _create_comments(client, 1))[0]
+    assert created["version"] == 1
+    payload = {"comment_id": created["id"], "entity_type": "post", "entity_id": "1", "version": 1}
+
+    response = await client.put("/comments/", json={**payload, "new_text": "First"})
+    assert response.status_code == 200
+    assert response.json()["version"] == 2
+
+    response = await client.put("/comments/", json={**payload, "new_text": "Second"})
+    assert response.status_code == 409
+
+    await _relay_outbox(event_producer)
+    updates = [event for _, _, event in event_producer.published if event["action"] == "updated"]
+    assert len(updates) == 1
+    assert updates[0]["comment"]["text"] == "First"
+    assert updates[0]["comment"]["version"] == 2
+    assert updates[0]["comment"]["author_id"] == "author"
+
+
+async def test_version_conflict_reports_version_after_concurrent_update(app, client: AsyncClient):
+    created = (await _create_comments(client, 1))[0]
+    repo = app.state.container.comment_repository
+
+    async with db_connection.pool.acquire() as conn:
+        transaction = conn.transaction()
+        await transaction.start()
+        await conn.execute("UPDATE comments SET version = version + 1 WHERE id = $1", created["id"])
+        # Условный UPDATE ждёт блокировку строки, а его снимок ещё видит версию 1
+        update = asyncio.create_task(
+            repo.update_text(created["id"], "post", "1", "Late", datetime.now(), expected_version=1)
+        )
+        await asyncio.sleep(0.2)
+        await transaction.commit()
+        comment, applied = await update
+
+    assert not applied
+    assert comment.version == 2
+
+
+async def test_update_comment_not_found(client: AsyncClient):
+    created = (await _create_comments(client, 1))[0]
+    payload = {"comment_id": created["id"], "entity_type": "post", "new_text": "Edited"}
+
+    response = await client.put("/comments/", json={**payload, "entity_id": "2"})
+    assert response.status_code == 404
+
+    response = await client.put("/comments/", json={**payload, "entity_id": "1", "comment_id": "missing"})
+    assert response.status_code == 404
+
+
+async def test_get_comments_cursor_pagination(client: AsyncClient):
+    created = await _create_comments(client, 5)
+    params = {"entity_type": "post", "entity_id": "1", "limit": 2}
+
+    seen = []
+    response = await client.get("/comments/", params=params)
+    while True:
+        assert response.status_code == 200
+        seen.extend(c["id"] for c in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        response = await client.get("/comments/", params={**params, "cursor": cursor})
+
+    assert seen == [c["id"] for c in reversed(created)]
+
+
+async def test_get_comments_invalid_cursor(client: AsyncClient):
+    await _create_comments(client, 1)
+
+    response = await client.get(
+        "/comments/", params={"entity_type": "post", "entity_id": "1", "cursor": "garbage"}
+    )
+    assert response.status_code == 400
+
+    # Корректный base64 и JSON, но id - число, а не строка
+    for position in (["2026-01-01T00:00:00", 5], [5, "0190a6b1-0000-7000-8000-000000000000"]):
+        cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+        response = await client.get(
+            "/comments/", params={"entity_type": "post", "entity_id": "1", "cursor": cursor}
+        )
+        assert response.status_code == 400
+
+
+async def test_get_comment_counts(client: AsyncClient):
+    await _create_comments(client, 3, entity_id="1")
+    await _create_comments(client, 1, entity_id="2")
+
+    response = await client.get(
+        "/comments/count", params={"entity": ["post:1", "post:2", "post:3"]}
+    )
+    assert response.status_code == 200
+    assert response.json() == [
+        {"entity_type": "post", "entity_id": "1", "count": 3},
+        {"entity_type": "post", "entity_id": "2", "count": 1},
+        {"entity_type": "post", "entity_id": "3", "count": 0},
+    ]
+
+
+async def test_get_comment_counts_invalid_entity(client: AsyncClient):
+    response = await client.get("/comments/count", params={"entity": "post"})
+    assert response.status_code == 400
+
+
+async def test_get_comments_batch(client: AsyncClient):
+    first = await _create_comments(client, 3, entity_id="1")
+    second = await _create_comments(client, 1, entity_id="2")
+
+    response = await client.post("/comments/batch", json={
+        "entities": [
+            {"entity_type": "post", "entity_id": "1"},
+            {"entity_type": "post", "entity_id": "2"},
+            {"entity_type": "post", "entity_id": "3"},
+        ],
+        "limit": 2,
+    })
+    assert response.status_code == 200
+
+    data = response.json()
+    assert [(item["entity_id"], len(item["comments"])) for item in data] == [("1", 2), ("2", 1), ("3", 0)]
+    assert [c["id"] for c in data[0]["comments"]] == [first[2]["id"], first[1]["id"]]
+    assert data[0]["next_cursor"] is not None
+    assert data[1]["comments"][0]["id"] == second[0]["id"]
+    assert data[1]["next_cursor"] is None
+
+
+async def test_get_comments_first_page_invalidated_on_create(client: AsyncClient):
+    await _create_comments(client, 1)
+    params = {"entity_type": "post", "entity_id": "1"}
+
+    assert len((await client.get("/comments/", params=params)).json()) == 1
+    assert len((await client.get("/comments/", params=params)).json()) == 1
+
+    await _create_comments(client, 1)
+    assert len((await client.get("/comments/", params=params)).json()) == 2
+
+
+async def test_export_comments_ndjson(client: AsyncClient):
+    created = await _create_comments(client, 3, entity_id="1")
+    created += await _create_comments(client, 2, entity_id="2")
+
+    response = await client.get("/comments/export", params={"entity_type": "post"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["id"] for line in lines] == [c["id"] for c in created]
+
+    since = created[3]["updated_at"]
+    response = await client.get("/comments/export", params={"entity_type": "post", "since": since})
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [
+        c["id"] for c in created[3:]
+    ]
+
+    # Тот же момент со смещением: приводится к UTC до запроса к БД
+    shifted = (datetime.fromisoformat(since) + timedelta(hours=3)).isoformat() + "+03:00"
+    response = await client.get("/comments/export", params={"entity_type": "post", "since": shifted})
+    assert response.status_code == 200
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [
+        c["id"] for c in created[3:]
+    ]
+
+
+async def test_export_stream_closes_source_when_closed():
+    closed = []
+
+    async def chunks():
+        try:
+            yield []
+            yield []
+        finally:
+            closed.append(True)
+
+    stream = _to_ndjson(chunks())
+    await stream.__anext__()
+    await stream.aclose()
+    assert closed == [True]
+
+
+async def test_get_comments_conditional_get(client: AsyncClient):
+    created = (await _create_comments(client, 2))[0]
+    params = {"entity_type": "post", "entity_id": "1"}
+    async with db_connection.pool.acquire() as conn:
+        await conn.execute("UPDATE comment_counts SET last_modified_at = now() - interval '1 minute'")
+
+    response = await client.get("/comments/", params=params)
+    etag = response.headers["ETag"]
+    last_modified = response.headers["Last-Modified"]
+
+    response = await client.get("/comments/", params=params, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    response = await client.get("/comments/", params=params, headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+    other_page = await client.get(
+        "/comments/", params={**params, "limit": 1}, headers={"If-None-Match": etag}
+    )
+    assert other_page.status_code == 200
+
+    await client.put("/comments/", json={
+        "comment_id": created["id"],
+        "entity_type": "post",
+        "entity_id": "1",
+        "new_text": "Edited",
+    })
+    response = await client.get("/comments/", params=params, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_last_modified_is_withheld_within_the_write_second():
+    written_at = datetime.now(timezone.utc)
+    assert "Last-Modified" not in validator_headers('W/"1"', written_at)
+
+    # Вторая запись в ту же секунду не должна прятаться за If-Modified-Since
+    since = format_datetime(written_at, usegmt=True)
+    request = Request({"type": "http", "headers": [(b"if-modified-since", since.encode())]})
+    assert not is_not_modified(request, 'W/"2"', written_at)
+
+    settled = written_at - timedelta(seconds=2)
+    assert "Last-Modified" in validator_headers('W/"1"', settled)
+    assert is_not_modified(request, 'W/"1"', settled)
+
+
+async def test_cached_first_page_is_revalidated_without_database(app, client: AsyncClient, monkeypatch):
+    await _create_comments(client, 2)
+    params = {"entity_type": "post", "entity_id": "1"}
+    etag = (await client.get("/comments/", params=params)).headers["ETag"]
+
+    async def unavailable(*args, **kwargs):
+        raise AssertionError("version read from the database")
+
+    monkeypatch.setattr(app.state.container.comment_repository, "get_version", unavailable)
+    response = await client.get("/comments/", params=params, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    response = await client.get("/comments/", params=params)
+    assert response.status_code == 200
+    assert response.headers["ETag"] == etag
+
+
+async def test_page_read_across_a_write_is_not_cached(app, client: AsyncClient):
+    await _create_comments(client, 1)
+    params = {"entity_type": "post", "entity_id": "1"}
+    etag = (await client.get("/comments/", params=params)).headers["ETag"]
+
+    # Запись приходит между чтением версии и чтением страницы
+    use_case = app.state.container.get_comments_use_case
+    version = await use_case.get_version("post", "1")
+    await _create_comments(client, 1)
+    result = await use_case.execute("post", "1", version=version)
+    assert len(result.items) == 2
+
+    response = await client.get("/comments/", params=params, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+
+async def test_invalid_cursor_is_rejected_before_validators(client: AsyncClient):
+    await _create_comments(client, 1)
+    params = {"entity_type": "post", "entity_id": "1"}
+    etag = (await client.get("/comments/", params=params)).headers["ETag"]
+
+    response = await client.get(
+        "/comments/", params={**params, "cursor": "garbage"}, headers={"If-None-Match": "*"}
+    )
+    assert response.status_code == 400
+    response = await client.get(
+        "/comments/", params={**params, "cursor": "garbage"}, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 400
+
+
+async def test_comments_serialize_without_warnings(app, client: AsyncClient):
+    root = (await _create_comments(client, 1))[0]
+    reply = await _reply(client, root["id"], "reply")
+    comments = [
+        await app.state.container.comment_repository.get_by_id(comment["id"]) for comment in (root, reply)
+    ]
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        body = json.loads(dump_comments(comments))
+    assert [(c["id"], c["parent_id"]) for c in body] == [(root["id"], None), (reply["id"], root["id"])]
+
+
+async def test_bulk_create_comments(client: AsyncClient, event_producer):
+    items = [
+        {"entity_type": "post", "entity_id": "1", "author_id": "bot", "text": f"imported {i}"}
+        for i in range(3)
+    ]
+    items.insert(1, {"entity_type": "post", "entity_id": "1", "author_id": "bot", "text": " "})
+    items.append({"entity_type": "post", "entity_id": "2", "author_id": "bot", "text": "other"})
+    items.append({"entity_type": "post", "entity_id": "1", "author_id": "bot", "text": "broken\x00text"})
+    items.append({"entity_type": "post", "entity_id": "1", "text": "no author"})
+    items.append({"entity_type": "post", "entity_id": 1, "author_id": "bot", "text": "numeric id"})
+    items.append("not an object")
+
+    response = await client.post("/comments/bulk", json={"comments": items})
+    assert response.status_code == 200
+
+    data = response.json()
+    assert len(data["created"]) == 4
+    assert [(error["index"], error["error"]) for error in data["errors"][2:]] == [
+        (6, "author_id is required"), (7, "entity_id must be a string"), (8, "Item must be an object"),
+    ]
+    assert [error["index"] for error in data["errors"][:2]] == [1, 5]
+    assert await _relay_outbox(event_producer) == 4
+
+    counts = await client.get("/comments/count", params={"entity": ["post:1", "post:2"]})
+    assert [c["count"] for c in counts.json()] == [3, 1]
+
+
+async def test_relays_split_outbox_by_shard(client: AsyncClient, event_producer):
+    created = await _create_comments(client, 8)
+
+    # Секцию первого комментария держит другой relay - её события ждут, остальные уходят
+    async with db_connection.pool.acquire() as conn:
+        shard = await conn.fetchval(f"SELECT {_SHARD} FROM outbox WHERE key = $1", created[0]["id"])
+        blocked = {row["key"] for row in await conn.fetch(f"SELECT key FROM outbox WHERE {_SHARD} = $1", shard)}
+        await conn.execute("SELECT pg_advisory_lock($1, $2)", OUTBOX_LOCK_CLASS, shard)
+        try:
+            await _relay_outbox(event_producer)
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1, $2)", OUTBOX_LOCK_CLASS, shard)
+
+    ids = [c["id"] for c in created]
+    assert {key for _, key, _ in event_producer.published} == set(ids) - blocked
+    await _relay_outbox(event_producer)
+    assert sorted(key for _, key, _ in event_producer.published) == sorted(ids)
+
+
+async def test_outbox_keeps_undelivered_events(client: AsyncClient, event_producer):
+    await _create_comments(client, 2)
+    async def undelivered(topic, messages):
+        return False
+
+    event_producer.publish_many_async = undelivered
+
+    assert await _relay_outbox(event_producer) == 0
+    async with db_connection.pool.acquire() as conn:
+        assert await conn.fetchval("select count(*) from outbox") == 2
+
+
+async def test_create_comment_idempotency_key(app, client: AsyncClient, event_producer):
+    payload = {"entity_type": "post", "entity_id": "1", "author_id": "author", "text": "Hello"}
+    headers = {"Idempotency-Key": "retry-1"}
+
+    first = await client.post("/comments/", json=payload, headers=headers)
+    retry = await client.post("/comments/", json=payload, headers=headers)
+    assert first.status_code == retry.status_code == 200
+    assert retry.json()["id"] == first.json()["id"]
+
+    # Повтор на другой реплике - мимо локального кэша, через таблицу
+    app.state.container.idempotency_cache = None
+    app.state.container.create_comment_use_case.idempotency_cache = None
+    retry = await client.post("/comments/", json=payload, headers=headers)
+    assert retry.json()["id"] == first.json()["id"]
+
+    reused = await client.post("/comments/", json={**payload, "text": "Other"}, headers=headers)
+    assert reused.status_code == 422
+
+    # Хэш запроса без parent_id - тот же, что сохранялся до появления ответов
+    legacy_hash = hashlib.blake2b("\x00".join(("post", "1", "author", "Hello")).encode(), digest_size=16).hexdigest()
+    async with db_connection.pool.acquire() as conn:
+        assert await conn.fetchval(
+            "select request_hash from comment_idempotency_keys where key = 'retry-1'"
+        ) == legacy_hash
+
+    assert await _relay_outbox(event_producer) == 1
+    counts = await client.get("/comments/count", params={"entity": "post:1"})
+    assert counts.json()[0]["count"] == 1
+
+
+async def test_expired_idempotency_keys_are_deleted(app, client: AsyncClient):
+    payload = {"entity_type": "post", "entity_id": "1", "author_id": "author", "text": "Hello"}
+    await client.post("/comments/", json=payload, headers={"Idempotency-Key": "old"})
+    await client.post("/comments/", json=payload, headers={"Idempotency-Key": "fresh"})
+    async with db_connection.pool.acquire() as conn:
+        await conn.execute(
+            "update comment_idempotency_keys set created_at = now() - interval '2 days' where key = 'old'"
+        )
+
+    repo = app.state.container.comment_repository
+    assert await repo.delete_expired_idempotency_keys(24 * 60 * 60, 100) == 1
+    assert await repo.get_by_idempotency_key("author", "old") is None
+    assert await repo.get_by_idempotency_key("author", "fresh") is not None
+
+
+async def test_idempotency_keys_are_scoped_by_author(client: AsyncClient):
+    payload = {"entity_type": "post", "entity_id": "1", "text": "Hello"}
+    headers = {"Idempotency-Key": "shared"}
+
+    first = await client.post("/comments/", json={**payload, "author_id": "alice"}, headers=headers)
+    second = await client.post("/comments/", json={**payload, "author_id": "bob"}, headers=headers)
+    assert first.status_code == second.status_code == 200
+    assert first.json()["id"] != second.json()["id"]
+
+
+async def test_idempotent_retry_of_deleted_comment_is_gone(client: AsyncClient):
+    payload = {"entity_type": "post", "entity_id": "1", "author_id": "author", "text": "Hello"}
+    headers = {"Idempotency-Key": "deleted"}
+
+    first = (await client.post("/comments/", json=payload, headers=headers)).json()
+    assert (await client.delete(f"/comments/{first['id']}")).status_code == 204
+
+    # Запоздавший повтор не воскрешает удалённый комментарий - ни из кэша, ни из таблицы
+    retry = await client.post("/comments/", json=payload, headers=headers)
+    assert retry.status_code == 410
+    retry = await client.post("/comments/", json=payload, headers=headers)
+    assert retry.status_code == 410
+
+    counts = await client.get("/comments/count", params={"entity": "post:1"})
+    assert counts.json()[0]["count"] == 0
+
+
+async def test_orphaned_idempotency_key_creates_new_comment(app, client: AsyncClient):
+    payload = {"entity_type": "post", "entity_id": "1", "author_id": "author", "text": "Hello"}
+    headers = {"Idempotency-Key": "orphan"}
+    app.state.container.create_comment_use_case.idempotency_cache = None
+
+    first = (await client.post("/comments/", json=payload, headers=headers)).json()
+    # Комментарий удалён физически, а ключ ещё не истёк
+    async with db_connection.pool.acquire() as conn:
+        await conn.execute("delete from comments where id = $1", first["id"])
+
+    retry = await client.post("/comments/", json=payload, headers=headers)
+    assert retry.status_code == 200
+    assert retry.json()["id"] != first["id"]
+
+    again = await client.post("/comments/", json=payload, headers=headers)
+    assert again.json()["id"] == retry.json()["id"]
+
+
+async def test_idempotency_key_orphaned_concurrently_is_claimed_again(app, client: AsyncClient, monkeypatch):
+    payload = {"entity_type": "post", "entity_id": "1", "author_id": "author", "text": "Hello"}
+    use_case = app.state.container.create_comment_use_case
+    create = use_case.repo.create
+
+    async def create_after_orphan(comment, **kwargs):
+        # Ключ успевает занять запрос, чей комментарий затем удалён физически
+        monkeypatch.setattr(use_case.repo, "create", create)
+        async with db_connection.pool.acquire() as conn:
+            await conn.execute(
+                "insert into comment_idempotency_keys (author_id, key, comment_id, request_hash) "
+                "values ('author', 'race', $1, 'x')",
+                uuid7(datetime.now()),
+            )
+        return await create(comment, **kwargs)
+
+    monkeypatch.setattr(use_case.repo, "create", create_after_orphan)
+    response = await client.post("/comments/", json=payload, headers={"Idempotency-Key": "race"})
+    assert response.status_code == 200
+    again = await client.post("/comments/", json=payload, headers={"Idempotency-Key": "race"})
+    assert again.json()["id"] == response.json()["id"]
+
+
+async def test_unresolved_idempotency_key_is_a_conflict(app, client: AsyncClient, monkeypatch):
+    use_case = app.state.container.create_comment_use_case
+
+    async def nothing(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(use_case.repo, "create", nothing)
+    monkeypatch.setattr(use_case, "_find_by_idempotency_key", nothing)
+    response = await client.post(
+        "/comments/",
+        json={"entity_type": "post", "entity_id": "1", "author_id": "author", "text": "Hello"},
+        headers={"Idempotency-Key": "stuck"},
+    )
+    assert response.status_code == 409
+
+
+async def test_search_comments(client: AsyncClient):
+    texts = [
+        ("post", "alice", "Great article about relational databases"),
+        ("post", "bob", "Liked the article, but too little about indexes"),
+        ("video", "alice", "Nice video on indexes and databases"),
+        ("post", "carol", "Nothing interesting here"),
+    ]
+    for entity_type, author_id, text in texts:
+        response = await client.post("/comments/", json={
+            "entity_type": entity_type, "entity_id": "1", "author_id": author_id, "text": text,
+        })
+        assert response.status_code == 200
+
+    # Стемминг: "database" находит "databases"
+    response = await client.get("/comments/search", params={"q": "database"})
+    assert response.status_code == 200
+    assert [c["author_id"] for c in response.json()] == ["alice", "alice"]
+
+    response = await client.get("/comments/search", params={"q": "indexes", "entity_type": "post"})
+    assert [c["author_id"] for c in response.json()] == ["bob"]
+
+    response = await client.get("/comments/search", params={"q": "article -indexes"})
+    assert [c["author_id"] for c in response.json()] == ["alice"]
+
+    response = await client.get("/comments/search", params={"q": "indexes", "author_id": "alice"})
+    assert [c["entity_type"] for c in response.json()] == ["video"]
+
+    # Границы со смещением приводятся к UTC, а не роняют запрос
+    response = await client.get("/comments/search", params={
+        "q": "database", "created_from": "2000-01-01T00:00:00+03:00", "created_to": "2100-01-01T00:00:00Z",
+    })
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+    response = await client.get("/comments/search", params={"q": "   "})
+    assert response.status_code == 400
+
+
+async def test_search_comments_cursor_pagination(client: AsyncClient):
+    for i in range(5):
+        await client.post("/comments/", json={
+            "entity_type": "post", "entity_id": "1", "author_id": "author",
+            "text": "search " * (i + 1) + f"number {i}",
+        })
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"q": "search", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get("/comments/search", params=params)
+        assert response.status_code == 200
+        seen.extend(c["text"] for c in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    # Больше совпадений - выше релевантность; каждый результат ровно один раз
+    assert seen == ["search " * (i + 1) + f"number {i}" for i in reversed(range(5))]
+
+    response = await client.get("/comments/search", params={"q": "search", "cursor": "broken"})
+    assert response.status_code == 400
+
+    # Валидный JSON, но id - число
+    cursor = base64.urlsafe_b64encode(json.dumps([0.5, "2026-01-01T00:00:00", 5]).encode()).decode()
+    response = await client.get("/comments/search", params={"q": "search", "cursor": cursor})
+    assert response.status_code == 400
+
+
+async def _reply(client: AsyncClient, parent_id: str, text: str, entity_id: str = "1"):
+    response = await client.post("/comments/", json={
+        "entity_type": "post", "entity_id": entity_id, "author_id": "author", "text": text, "parent_id": parent_id,
+    })
+    assert response.status_code == 200
+    return response.json()
+
+
+async def test_comment_threads(client: AsyncClient):
+    a, b = await _create_comments(client, 2)
+    a1 = await _reply(client, a["id"], "a1")
+    a1x = await _reply(client, a1["id"], "a1x")
+    await _reply(client, a["id"], "a2")
+    await _reply(client, a["id"], "a3")
+    await _reply(client, b["id"], "b1")
+    assert a1["parent_id"] == a["id"]
+
+    # Без depth - все комментарии сущности подряд, как раньше
+    response = await client.get("/comments/", params={"entity_type": "post", "entity_id": "1", "limit": 100})
+    assert len(response.json()) == 7
+
+    params = {"entity_type": "post", "entity_id": "1", "sort": "asc", "depth": 1, "replies_limit": 2}
+    response = await client.get("/comments/", params=params)
+    assert [c["text"] for c in response.json()] == ["comment 0", "a1", "a2", "comment 1", "b1"]
+
+    # Страница из одного корня с его веткой, затем следующий корень по курсору
+    params.update(depth=2, limit=1)
+    response = await client.get("/comments/", params=params)
+    assert [c["text"] for c in response.json()] == ["comment 0", "a1", "a1x", "a2"]
+    response = await client.get("/comments/", params={**params, "cursor": response.headers["X-Next-Cursor"]})
+    assert [c["text"] for c in response.json()] == ["comment 1", "b1"]
+    assert "X-Next-Cursor" not in response.headers
+
+    response = await client.get(f"/comments/{a['id']}/thread")
+    assert [c["text"] for c in response.json()] == ["comment 0", "a1", "a1x", "a2", "a3"]
+    response = await client.get(f"/comments/{a['id']}/thread", params={"depth": 1})
+    assert [c["text"] for c in response.json()] == ["comment 0", "a1", "a2", "a3"]
+    response = await client.get(f"/comments/{a['id']}/thread", params={"replies_limit": 1})
+    assert [c["text"] for c in response.json()] == ["comment 0", "a1", "a1x"]
+    response = await client.get(f"/comments/{a1x['id']}/thread")
+    assert [c["text"] for c in response.json()] == ["a1x"]
+    assert "X-Truncated" not in response.headers
+
+
+async def test_thread_truncation_is_reported(client: AsyncClient, monkeypatch):
+    (root,) = await _create_comments(client, 1)
+    first = await _reply(client, root["id"], "first")
+    await _reply(client, first["id"], "nested")
+    await _reply(client, root["id"], "second")
+
+    response = await client.get(f"/comments/{root['id']}/thread", params={"limit": 2})
+    assert [c["text"] for c in response.json()] == ["comment 0", "first"]
+    assert response.headers["X-Truncated"] == "true"
+    response = await client.get(f"/comments/{root['id']}/thread", params={"limit": 2, "replies_limit": 5})
+    assert [c["text"] for c in response.json()] == ["comment 0", "first"]
+    assert response.headers["X-Truncated"] == "true"
+    response = await client.get(f"/comments/{root['id']}/thread", params={"limit": 4})
+    assert "X-Truncated" not in response.headers
+
+    # Страница веток ограничена по числу строк: отбрасываются самые глубокие ответы
+    monkeypatch.setattr(comment_use_cases, "MAX_THREAD_PAGE_ROWS", 3)
+    params = {"entity_type": "post", "entity_id": "1", "depth": 5, "sort": "asc"}
+    response = await client.get("/comments/", params=params)
+    assert [c["text"] for c in response.json()] == ["comment 0", "first", "second"]
+    assert response.headers["X-Truncated"] == "true"
+
+    response = await client.get("/comments/", params={**params, "limit": 1000})
+    assert response.status_code == 422
+
+
+async def test_reply_validation(client: AsyncClient):
+    (root,) = await _create_comments(client, 1)
+
+    response = await client.post("/comments/", json={
+        "entity_type": "post", "entity_id": "2", "author_id": "author", "text": "x", "parent_id": root["id"],
+    })
+    assert response.status_code == 404
+    assert response.json()["detail"] == f"Родительский комментарий {root['id']} не найден у post:2"
+
+    response = await client.post("/comments/", json={
+        "entity_type": "post", "entity_id": "1", "author_id": "author", "text": "x", "parent_id": "nope",
+    })
+    assert response.status_code == 400
+
+    response = await client.get("/comments/00000000-0000-7000-8000-000000000000/thread")
+    assert response.status_code == 404
+
+
+async def test_delete_comment_with_replies(client: AsyncClient, event_producer):
+    root, other = await _create_comments(client, 2)
+    reply = await _reply(client, root["id"], "reply")
+    await _reply(client, reply["id"], "nested reply")
+
+    response = await client.delete(f"/comments/{root['id']}")
+    assert response.status_code == 204
+
+    response = await client.get("/comments/", params={"entity_type": "post", "entity_id": "1"})
+    assert [c["id"] for c in response.json()] == [other["id"]]
+    response = await client.get("/comments/count", params={"entity": "post:1"})
+    assert response.json()[0]["count"] == 1
+    assert (await client.get(f"/comments/{reply['id']}/thread")).status_code == 404
+    response = await client.get("/comments/search", params={"q": "reply"})
+    assert response.json() == []
+
+    assert (await client.delete(f"/comments/{root['id']}")).status_code == 404
+    assert (await client.delete("/comments/missing")).status_code == 404
+    response = await client.put("/comments/", json={
+        "comment_id": root["id"], "entity_type": "post", "entity_id": "1", "new_text": "Edited",
+    })
+    assert response.status_code == 404
+
+    await _relay_outbox(event_producer)
+    deleted = [event for _, _, event in event_producer.published if event["action"] == "deleted"]
+    assert sorted(event["comment"]["text"] for event in deleted) == ["comment 0", "nested reply", "reply"]
+    assert all(event["comment"]["deleted_at"] for event in deleted)
+
+
+async def test_purge_deleted_comments(app, client: AsyncClient):
+    created = await _create_comments(client, 5)
+    for comment in created[:3]:
+        await client.delete(f"/comments/{comment['id']}")
+
+    repo = app.state.container.comment_repository
+    # Недавно удалённые строки ждут retention
+    assert await CommentPurger(repo, retention_seconds=3600).purge_once() == 0
+    assert await CommentPurger(repo, retention_seconds=0, batch_size=2, batch_pause=0).purge_once() == 3
+
+    async with db_connection.pool.acquire() as conn:
+        assert await conn.fetchval("SELECT count(*) FROM comments") == 2
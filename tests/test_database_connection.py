@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from src.infrastructure.config import Settings
+from src.infrastructure.database.connection import DatabaseConnection, ReadSession, parse_lsn, read_session
+from src.presentation.api.session_consistency import SESSION_LSN_HEADER, add_session_consistency, read_only
+
+
+async def _set_application_name(connection):
+    await connection.execute("set application_name = 'comments-test'")
+
+
+async def test_init_hook_runs_for_pool_connections():
+    db = DatabaseConnection()
+    await db.connect(init=_set_application_name)
+    try:
+        row = await db.fetchrow("select current_setting('application_name') as name")
+        assert row['name'] == "comments-test"
+    finally:
+        await db.disconnect()
+
+
+async def test_pool_stats_report_usage_and_waiters():
+    db = DatabaseConnection()
+    await db.connect()
+    try:
+        async with db.acquire() as connection:
+            await connection.execute("select 1")
+            stats = db.stats()
+            assert stats["in_use"] == 1
+            assert stats["waiting"] == 0
+
+        assert db.stats()["in_use"] == 0
+        assert db.stats()["acquire_count"] == 1
+        assert sum(db.stats()["acquire_wait_ms"].values()) == 1
+    finally:
+        await db.disconnect()
+    assert db.stats() == {"connected": False}
+
+
+async def test_acquire_timeout_is_counted():
+    db = DatabaseConnection()
+    await db.connect()
+    try:
+        held = [await db.pool.acquire() for _ in range(db.pool.get_max_size())]
+        with pytest.raises(asyncio.TimeoutError):
+            async with db.acquire(timeout=0.05):
+                pass
+        assert db.stats()["acquire_timeouts"] == 1
+        for connection in held:
+            await db.pool.release(connection)
+    finally:
+        await db.disconnect()
+
+
+async def test_reads_go_to_caught_up_replica():
+    # Локальный сервер в роли реплики: не в режиме восстановления, т.е. применил любой LSN
+    db = DatabaseConnection(Settings(database_replica_hosts="localhost"))
+    await db.connect()
+    try:
+        replica = db.replicas[0]
+        assert replica.healthy
+
+        session = ReadSession(min_lsn=parse_lsn(await db.current_lsn()))
+        token = read_session.set(session)
+        try:
+            await db.fetchrow("select 1", readonly=True)
+            assert session.pool is replica.pool
+        finally:
+            read_session.reset(token)
+        assert replica.reads == 1
+
+        # Реплика ещё не применила LSN клиента - чтение с основного сервера
+        replica.replay_lsn = 1
+        session = ReadSession(min_lsn=2)
+        token = read_session.set(session)
+        try:
+            await db.fetchrow("select 1", readonly=True)
+            assert session.pool is db.pool
+        finally:
+            read_session.reset(token)
+        assert db.stats()["primary_reads"] == 1
+
+        await db.check_replicas()
+        assert replica.replay_lsn > 2
+    finally:
+        await db.disconnect()
+
+
+async def test_writes_return_session_lsn_token():
+    db = DatabaseConnection(Settings(database_replica_hosts="localhost"))
+    await db.connect()
+    app = FastAPI()
+    add_session_consistency(app, db)
+
+    @app.post("/write")
+    async def write():
+        return {}
+
+    @app.post("/search")
+    @read_only
+    async def search():
+        await db.fetchrow("select 1", readonly=True)
+        return {"replica": read_session.get().pool is db.replicas[0].pool}
+
+    @app.get("/read")
+    async def read():
+        await db.fetchrow("select 1", readonly=True)
+        return {"replica": read_session.get().pool is db.replicas[0].pool}
+
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/write")
+            lsn = response.headers[SESSION_LSN_HEADER]
+            assert parse_lsn(lsn) > 0
+
+            response = await client.get("/read", headers={SESSION_LSN_HEADER: lsn})
+            assert response.json() == {"replica": True}
+            assert SESSION_LSN_HEADER not in response.headers
+
+            # POST только для чтения: чтения идут на реплику, токен не выдаётся
+            response = await client.post("/search", headers={SESSION_LSN_HEADER: lsn})
+            assert response.json() == {"replica": True}
+            assert SESSION_LSN_HEADER not in response.headers
+    finally:
+        await db.disconnect()
+
+
+async def test_unreachable_replica_does_not_block_startup():
+    db = DatabaseConnection(Settings(database_replica_hosts="127.0.0.1:1"))
+    await asyncio.wait_for(db.connect(), timeout=5)
+    try:
+        assert not db.replicas[0].healthy
+        await db.fetchrow("select 1", readonly=True)
+        assert db.stats()["primary_reads"] == 1
+    finally:
+        await db.disconnect()
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+
+import pytest
+from confluent_kafka import KafkaException
+
+from src.infrastructure.messaging.kafka_producer import KafkaEventProducer
+
+# Порт, на котором никто не слушает: брокер недоступен, доставка завершается по message.timeout.ms
+UNREACHABLE_BROKER = "127.0.0.1:1"
+
+
+async def test_delivery_error_resolves_future_from_poll_thread():
+    producer = KafkaEventProducer(UNREACHABLE_BROKER, delivery_timeout_ms=300)
+    try:
+        future = producer.publish_async("comments", "key", {"event": "created"})
+        assert not future.done()
+        assert any(t.name == "kafka-producer-poll" for t in threading.enumerate())
+
+        with pytest.raises(KafkaException):
+            await asyncio.wait_for(future, timeout=10)
+    finally:
+        producer.close(timeout=1)
+    assert not any(t.name == "kafka-producer-poll" for t in threading.enumerate())
+
+
+async def test_publish_many_async_reports_undelivered_batch():
+    producer = KafkaEventProducer(UNREACHABLE_BROKER, delivery_timeout_ms=300)
+    try:
+        delivered = await producer.publish_many_async(
+            "comments",
+            [("1", {"n": 1}), ("2", {"n": 2})],
+        )
+    finally:
+        producer.close(timeout=1)
+    assert delivered is False
+
+
+async def test_publish_many_async_waits_no_longer_than_delivery_timeout():
+    producer = KafkaEventProducer(UNREACHABLE_BROKER, delivery_timeout_ms=300)
+    # Колбэки доставки не приходят вовсе: ожидание обрывается собственным таймаутом
+    producer._delivery_timeout = 0.2
+    producer._ensure_poll_thread = lambda: None
+    try:
+        delivered = await asyncio.wait_for(
+            producer.publish_many_async("comments", [("1", {"n": 1})]),
+            timeout=5,
+        )
+    finally:
+        producer.close(timeout=1)
+    assert delivered is False
+
+
+async def test_unserializable_event_fails_without_produce():
+    producer = KafkaEventProducer(UNREACHABLE_BROKER)
+    try:
+        future = producer.publish_async("comments", "key", {"value": object()})
+        with pytest.raises(ValueError):
+            await future
+    finally:
+        producer.close(timeout=1)
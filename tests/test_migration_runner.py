@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest_asyncio
+
+from src.infrastructure.database.connection import db_connection
+from src.infrastructure.database.migration_runner import MigrationRunner, split_statements
+
+
+@pytest_asyncio.fixture
+async def migrations_dir(client, tmp_path):
+    yield tmp_path
+    async with db_connection.pool.acquire() as conn:
+        await conn.execute("drop table if exists migration_runner_test")
+        await conn.execute("delete from schema_migrations where version like '9%_runner_test%'")
+
+
+def test_split_statements_respects_quotes_and_dollar_blocks():
+    sql = """
+    -- migrate:no-transaction
+    create index concurrently if not exists idx_a on a(x);
+    insert into t values ('a;b', 'it''s');
+    do $$ begin perform 1; end $$;
+    /* ; */ select 1
+    """
+    assert split_statements(sql) == [
+        "-- migrate:no-transaction\n    create index concurrently if not exists idx_a on a(x)",
+        "insert into t values ('a;b', 'it''s')",
+        "do $$ begin perform 1; end $$",
+        "/* ; */ select 1",
+    ]
+
+
+async def test_concurrent_runners_apply_each_migration_once(migrations_dir):
+    (migrations_dir / "901_runner_test_table.sql").write_text(
+        "create table migration_runner_test (id integer, value text);"
+    )
+    (migrations_dir / "902_runner_test_index.sql").write_text(
+        "-- migrate:no-transaction\n"
+        "create index concurrently if not exists idx_migration_runner_test on migration_runner_test(value);\n"
+        "insert into migration_runner_test values (1, 'a;b');\n"
+    )
+    runner = MigrationRunner(str(migrations_dir))
+
+    await asyncio.gather(*(runner.migrate() for _ in range(3)))
+
+    async with db_connection.pool.acquire() as conn:
+        rows = await conn.fetch(
+            "select version, checksum, duration_ms from schema_migrations where version like '9%_runner_test%' order by version"
+        )
+        assert [row['version'] for row in rows] == ["901_runner_test_table", "902_runner_test_index"]
+        assert all(len(row['checksum']) == 64 and row['duration_ms'] is not None for row in rows)
+        assert await conn.fetchval("select count(*) from migration_runner_test") == 1
+        assert await conn.fetchval(
+            "select indisvalid from pg_index where indexrelid = 'idx_migration_runner_test'::regclass"
+        )
+
+
+async def test_each_partition_statement_runs_per_partition(migrations_dir):
+    (migrations_dir / "903_runner_test_partitioned.sql").write_text(
+        "-- migrate:no-transaction\n"
+        "create table migration_runner_test (id integer, value text) partition by range (id);\n"
+        "create table migration_runner_test_a partition of migration_runner_test for values from (0) to (10);\n"
+        "create table migration_runner_test_b partition of migration_runner_test for values from (10) to (20);\n"
+        "-- migrate:each-partition migration_runner_test\n"
+        "create index concurrently {partition}_value on {partition} (value);\n"
+        "create index idx_migration_runner_test on only migration_runner_test (value);\n"
+        "-- migrate:each-partition migration_runner_test\n"
+        "alter index idx_migration_runner_test attach partition {partition}_value;\n"
+    )
+    await MigrationRunner(str(migrations_dir)).migrate()
+
+    async with db_connection.pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            select c.relname from pg_inherits i join pg_class c on c.oid = i.inhrelid
+            where i.inhparent = 'idx_migration_runner_test'::regclass order by c.relname
+            """
+        )
+        assert [row['relname'] for row in rows] == ["migration_runner_test_a_value", "migration_runner_test_b_value"]
+        assert await conn.fetchval(
+            "select indisvalid from pg_index where indexrelid = 'idx_migration_runner_test'::regclass"
+        )
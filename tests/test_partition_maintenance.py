@@ -0,0 +1,78 @@
+from datetime import date, datetime
+
+import pytest_asyncio
+
+from src.domain.ids import uuid7, uuid7_time
+from src.infrastructure.database.connection import db_connection
+from src.infrastructure.database.partition_maintenance import CommentPartitionMaintenance
+
+# Отдельная секционированная таблица, чтобы не трогать секции comments
+TABLE = "comments_maintenance_test"
+
+
+@pytest_asyncio.fixture
+async def conn(client):
+    async with db_connection.pool.acquire() as conn:
+        await conn.execute(f"create table {TABLE} (like comments including defaults including generated) partition by range (created_at)")
+        await conn.execute(f"create table {TABLE}_default partition of {TABLE} default")
+        try:
+            yield conn
+        finally:
+            await conn.execute(f"drop table if exists {TABLE} cascade")
+            await conn.execute("drop schema if exists test_archive cascade")
+
+
+async def _insert(conn, created_at: datetime):
+    comment_id = uuid7(created_at)
+    await conn.execute(
+        f"""
+        insert into {TABLE} (id, entity_type, entity_id, author_id, text, created_at, updated_at, path)
+        values ($1, 'post', '1', 'author', 'text', $2, $2, $3)
+        """,
+        comment_id,
+        created_at,
+        comment_id.hex,
+    )
+    await conn.execute(
+        """
+        insert into comment_counts (entity_type, entity_id, count) values ('post', '1', 1)
+        on conflict (entity_type, entity_id) do update set count = comment_counts.count + 1
+        """
+    )
+
+
+def test_uuid7_carries_creation_time():
+    created_at = datetime(2026, 10, 18, 12, 30, 15, 123456)
+    comment_id = uuid7(created_at)
+    assert comment_id.version == 7
+    assert uuid7_time(str(comment_id)) == datetime(2026, 10, 18, 12, 30, 15, 123000)
+    assert uuid7_time("00000000-0000-4000-8000-000000000000") is None
+    assert uuid7_time("not-a-uuid") is None
+
+
+async def test_ensure_partitions_moves_rows_from_default(conn):
+    maintenance = CommentPartitionMaintenance(months_ahead=2, table=TABLE)
+    await _insert(conn, datetime(2030, 2, 10))
+
+    created = await maintenance.ensure_partitions(conn, date(2030, 1, 20))
+
+    assert created == [f"{TABLE}_p203001", f"{TABLE}_p203002", f"{TABLE}_p203003"]
+    assert await conn.fetchval(f"select count(*) from {TABLE}_default") == 0
+    assert await conn.fetchval(f"select count(*) from {TABLE}_p203002") == 1
+    assert await maintenance.ensure_partitions(conn, date(2030, 1, 20)) == []
+
+
+async def test_detach_expired_archives_and_updates_counts(conn):
+    maintenance = CommentPartitionMaintenance(
+        months_ahead=2, retention_months=1, archive_schema="test_archive", table=TABLE
+    )
+    await maintenance.ensure_partitions(conn, date(2030, 1, 1))
+    await _insert(conn, datetime(2030, 1, 5))
+    await _insert(conn, datetime(2030, 3, 5))
+
+    detached = await maintenance.detach_expired(conn, date(2030, 3, 10))
+
+    assert detached == [f"{TABLE}_p203001"]
+    assert [name for name, _ in await maintenance.partitions(conn)] == [f"{TABLE}_p203002", f"{TABLE}_p203003"]
+    assert await conn.fetchval(f"select count(*) from test_archive.{TABLE}_p203001") == 1
+    assert await conn.fetchval("select count from comment_counts where entity_type = 'post' and entity_id = '1'") == 1
@@ -1,3 +1,5 @@
+import json
+
 from httpx import AsyncClient
 
 
@@ -115,3 +117,77 @@ async def test_delete_user_not_found(client: AsyncClient):
     response = await client.delete("/users/999999")
     assert response.status_code == 404
 
+
+
+async def test_import_users(client: AsyncClient):
+    await client.post("/users/", json={"email": "existing@example.com", "name": "Existing"})
+    csv_body = (
+        "email,name\n"
+        "first@example.com,First\n"
+        "existing@example.com,Existing Again\n"
+        "second@example.com,\"Second, Jr.\"\n"
+        "first@example.com,First Duplicate\n"
+        "not-an-email,Broken\n"
+        "nul@example.com,Bro\x00ken\n"
+        "quote@example.com,\"Unterminated\n"
+    )
+    response = await client.post(
+        "/users/import", content=csv_body.encode(), headers={"Content-Type": "text/csv"}
+    )
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["total"] == 7
+    assert data["created"] == 2
+    assert data["conflicts"] == 2
+    assert data["invalid"] == 3
+    assert [(issue["line"], issue["reason"]) for issue in data["issues"]] == [
+        (3, "already exists"),
+        (5, "duplicate in import"),
+        (6, "Invalid email"),
+        (7, "Line contains NUL characters"),
+        (8, "Malformed CSV line"),
+    ]
+
+    users = (await client.get("/users/")).json()
+    names = {user["email"]: user["name"] for user in users}
+    assert names["first@example.com"] == "First"
+    assert names["second@example.com"] == "Second, Jr."
+    assert names["existing@example.com"] == "Existing"
+
+
+async def test_get_users_after_id(client: AsyncClient):
+    for i in range(5):
+        await client.post("/users/", json={"email": f"page{i}@example.com", "name": f"User {i}"})
+
+    seen = []
+    after_id = None
+    while True:
+        params = {"limit": 2}
+        if after_id is not None:
+            params["after_id"] = after_id
+        page = (await client.get("/users/", params=params)).json()
+        if not page:
+            break
+        seen.extend(user["email"] for user in page)
+        after_id = page[-1]["id"]
+
+    assert seen == [f"page{i}@example.com" for i in range(5)]
+
+    response = await client.get("/users/", params={"limit": 100_000})
+    assert response.status_code == 422
+
+
+async def test_export_users_ndjson(app, client: AsyncClient):
+    for i in range(3):
+        await client.post("/users/", json={"email": f"export{i}@example.com", "name": f"User {i}"})
+
+    response = await client.get("/users/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [user["email"] for user in lines] == [f"export{i}@example.com" for i in range(3)]
+
+    # Пачки по первичному ключу: последняя неполная пачка завершает обход
+    chunks = [users async for users in app.state.container.user_repository.iter_all(chunk_size=2)]
+    assert [len(users) for users in chunks] == [2, 1]